@@ -1,5 +1,7 @@
 '''Define the standard application of ASyH.'''
+import math
 import pathlib
+import time
 
 import sdmetrics.reports.single_table
 # from sdv.metrics.tabular import KSComplement, CSTest, CorrelationSimilarity
@@ -9,8 +11,15 @@ from ASyH.metadata import Metadata
 from ASyH.pipelines \
     import CopulaGANPipeline, TVAEPipeline, CPARPipeline, \
     CTGANPipeline, GaussianCopulaPipeline, ForestFlowPipeline
-from ASyH.utils import Utils
-from ASyH.dispatch import concurrent_dispatch
+from ASyH.utils import Utils, fingerprint
+from ASyH.hook import PreprocessHook
+from ASyH.dispatch import dispatch, worker_plan, FINISHED
+from ASyH.mixture_cache import SharedNormalizers
+from ASyH.processing import compatible, derive_processor, supported
+from ASyH.metrics.real_statistics import precompute
+from ASyH.metrics import quality
+from ASyH.sampling import BOOTSTRAP_SAMPLES, overlapping
+from ASyH.instrumentation import write_chrome_trace, write_json
 
 # import pudb
 # from pudb.remote import set_trace
@@ -18,6 +27,21 @@ from ASyH.dispatch import concurrent_dispatch
 # import ASyH.metrics
 
 
+# share of a pipeline's time budget reserved for training the model, the rest
+# is left for preprocessing, sampling and scoring:
+TRAINING_BUDGET_SHARE = 0.7
+
+
+def sdmetrics_quality(input_data, synth_data):
+    '''Overall score of the SDMetrics quality report.'''
+    report = sdmetrics.reports.single_table.QualityReport()
+    report.generate(input_data.data,
+                    synth_data.data,
+                    input_data.metadata.metadata,
+                    verbose=False)
+    return report.get_score()
+
+
 class Application:
     '''The standard application of ASyH.'''
 
@@ -29,6 +53,17 @@ class Application:
     @property
     def results(self):
         return self._results
+
+    @property
+    def tied(self):
+        '''Models whose score is not significantly different from the one of
+        the best model, by the confidence intervals of sampled scoring.'''
+        return self._tied
+
+    @property
+    def tournament(self):
+        '''Results of the candidate models per successive-halving round.'''
+        return self._tournament
     
     def model2pipeline(self, model):
         map_model2pipeline = {
@@ -45,7 +80,25 @@ class Application:
     def __init__(self, preprocess=False, 
                  models=None, 
                  constraints=None,
-                 longitudinal=False):
+                 longitudinal=False,
+                 max_workers=None,
+                 threads_per_worker=None,
+                 cpu_affinity=False,
+                 selection='full',
+                 halving_eta=2,
+                 halving_subsample=True,
+                 halving_min_rows=1000,
+                 time_budget=None,
+                 pipeline_time_budget=None,
+                 share_data=False,
+                 mixture_cache=None,
+                 quality_scorer='native',
+                 scoring_rows=None,
+                 scoring_bootstrap=BOOTSTRAP_SAMPLES,
+                 scoring_confidence=0.95,
+                 scoring_workers=1,
+                 scoring_executor='thread',
+                 scoring_timeout=None):
         '''
         Initialize the application with a list of models
         and a flag for preprocessing.
@@ -53,6 +106,46 @@ class Application:
         Args:
             preprocess (bool): True if preprocessing is desired.
             models (list): A list of models to train.
+            max_workers (int): Maximum number of pipelines trained at the
+                same time (default: one per model, at most one per CPU).
+            threads_per_worker (int): Number of torch/BLAS threads per
+                pipeline (default: available CPUs divided by the workers).
+            cpu_affinity (bool): True to pin each worker to its own CPUs.
+            selection (str): 'full' trains all models to full epochs before
+                selecting the best, 'successive_halving' drops poor models
+                after training them with a reduced budget first.
+            halving_eta (int): Only the best 1/halving_eta models proceed to
+                the next successive-halving round with halving_eta times the
+                budget.
+            halving_subsample (bool): True to reduce the number of rows along
+                with the epochs in successive-halving rounds.
+            halving_min_rows (int): Minimal number of rows for subsampling.
+            time_budget (float): Wall-clock time in seconds for a complete
+                training run; pipelines still running are stopped then.
+            pipeline_time_budget (float): Wall-clock time in seconds for a
+                single pipeline; it is stopped if running longer.
+            share_data (bool): True to hand the input data to the pipelines
+                in shared memory instead of copying it into every worker.
+            mixture_cache (MixtureCache): Cache of fitted per-column mixture
+                models to reuse across runs (default: no caching).
+            quality_scorer (str): 'native' scores the pipelines with ASyH's
+                implementation of the SDMetrics quality score
+                (ASyH.metrics.quality), 'sdmetrics' with the SDMetrics
+                QualityReport itself.
+            scoring_rows (int): Number of rows to sample and score per
+                pipeline, against a stratified subsample of the input data
+                (default: a synthetic table of the input's size).
+            scoring_bootstrap (int): Number of half-samples of the synthetic
+                rows scored for the confidence intervals of sampled scores
+                (0 for none), each costing about half a scoring.
+            scoring_confidence (float): Confidence level of these intervals.
+            scoring_workers (int): Number of scoring functions run
+                concurrently in each pipeline (default: one after another).
+            scoring_executor (str): 'thread' or 'process', what the
+                concurrent scoring functions run in.
+            scoring_timeout (float): Seconds after which a scoring function,
+                run in a process of its own then, is stopped and left out of
+                the score.
 
         Returns:
             None
@@ -65,6 +158,42 @@ class Application:
         self.input_data = None
         self.metadata = None
         self._longitudinal = longitudinal
+        self.max_workers = max_workers
+        self.threads_per_worker = threads_per_worker
+        self.cpu_affinity = cpu_affinity
+        self.selection = selection
+        self.halving_eta = halving_eta
+        self.halving_subsample = halving_subsample
+        self.halving_min_rows = halving_min_rows
+        self.time_budget = time_budget
+        self.pipeline_time_budget = pipeline_time_budget
+        self.share_data = share_data
+        self.mixture_cache = mixture_cache
+        self.quality_scorer = quality_scorer
+        self.scoring_rows = scoring_rows
+        self.scoring_bootstrap = scoring_bootstrap
+        self.scoring_confidence = scoring_confidence
+        self.scoring_workers = scoring_workers
+        self.scoring_executor = scoring_executor
+        self.scoring_timeout = scoring_timeout
+        self._tied = []
+        self._result_models = []
+        self._deadline = None
+        self._tournament = []
+        # preprocessing run once for all pipelines, and its results by
+        # fingerprint of input data and preprocessing functions:
+        self._preprocessing_hook = PreprocessHook()
+        self._preprocessing_hook.add(Utils.convert_all_dates)
+        self._preprocessing_hook.add(Utils.impute)
+        self._prepared = {}
+
+        assert self.selection in ['full', 'successive_halving'], \
+            f'Unknown selection mode {self.selection} specified'
+        assert self.halving_eta >= 2, 'halving_eta should be at least 2'
+        assert self.quality_scorer in ['native', 'sdmetrics'], \
+            f'Unknown quality scorer {self.quality_scorer} specified'
+        assert self.scoring_executor in ['thread', 'process'], \
+            f'Unknown scoring executor {self.scoring_executor} specified'
 
         if self.models is not None:
             assert isinstance(self.models, list), \
@@ -80,6 +209,26 @@ class Application:
             self.models = ['TVAE', 'CTGAN', 'CopulaGAN', 'GaussianCopula', 'ForestFlowModel']
 
 
+    def add_preprocessing(self, preprocess_function):
+        '''Add a function to the preprocessing which is run once for all
+        pipelines before they are dispatched.  Model-specific steps can still
+        be added to single pipelines with Pipeline.add_preprocessing().'''
+        self._preprocessing_hook.add(preprocess_function)
+
+
+    def _prepare(self, input_data):
+        '''Return input_data after the shared preprocessing, reusing the
+        result of an earlier run on the same data with the same functions.'''
+        key = fingerprint(input_data, self._preprocessing_hook.functions)
+        if key not in self._prepared:
+            # preprocessing functions may modify the data frame in place:
+            data = Data(input_data.data.copy(), metadata=input_data.metadata)
+            self._prepared[key] = self._preprocessing_hook.execute(data)
+        else:
+            print("Reusing the preprocessed input data")
+        return self._prepared[key]
+
+
     def _add_scoring(self, scoring_function, pipelines=None):
         '''Add a scoring function to all pipelines.'''
         if pipelines is None:
@@ -104,12 +253,54 @@ class Application:
             pipeline.add_postprocessing(postprocess_function)
 
 
+    def instrumentations(self):
+        '''The ASyH.instrumentation.Instrumentation of each finished pipeline
+        of the last training run, by model (and successive-halving round).'''
+        runs = {}
+        for round_ in self._tournament:
+            for model, result in round_['results'].items():
+                if result.instrumentation is not None:
+                    runs[f'{model} (fidelity {round_["fidelity"]:.3f})'] = result.instrumentation
+        for model, result in zip(self._result_models, self._results):
+            if result.instrumentation is not None:
+                runs[model] = result.instrumentation
+        return runs
+
+
+    def export_instrumentation(self, path, trace_format='json'):
+        '''Write the instrumentations() to the file path, as JSON records
+        (trace_format='json') or as Chrome trace ('chrome').'''
+        assert trace_format in ['json', 'chrome'], \
+            f'Unknown trace format {trace_format} specified'
+        if trace_format == 'json':
+            write_json(self.instrumentations(), path)
+        else:
+            write_chrome_trace(self.instrumentations(), path)
+
+
     def _select_best(self, results, pipelines=None):
-        '''Select the best-scoring model'''
+        '''Select the best-scoring model among the finished pipelines.'''
         if pipelines is None:
             return None
-        best_score = results.index(max(results))
+        finished = [i for i, result in enumerate(results)
+                    if result.status == FINISHED]
+        if not finished:
+            raise RuntimeError('ASyH.App.Application: no pipeline finished: '
+                               + str([result.status for result in results]))
+        best_score = max(finished, key=lambda i: results[i].score)
         self._best = pipelines[best_score].model
+        self._tied = []
+        if results[best_score].interval is not None:
+            self._tied = [pipelines[i].model.model_type for i in finished
+                          if i != best_score and results[i].interval is not None
+                          and overlapping(results[i].interval, results[best_score].interval)]
+            if self._tied:
+                print(f'{self._best.model_type} is statistically tied with {self._tied}')
+        if not self._best.trained:
+            # the pipeline's child process did not hand back a fitted model,
+            # the model will be trained on the first call of synthesize().
+            Warning(f'ASyH.App.Application: best model {self._best.model_type} '
+                    'has not been trained by the dispatcher.')
         return self._best
 
 
@@ -157,57 +348,288 @@ class Application:
         return self.train(input_data, metadata)
 
 
-    def train(self, input_data, metadata):
-        """Train each model in its own pipeline using input_data and metadata,
-        score, select and return the best scoring model.
-        """
-        input_data.set_metadata(metadata)
-
-        print(f"Used models are: {self.models} ...")
-
-        if self.models is not None:
+    def _create_pipelines(self, models, input_data, prepared_data):
+        '''Create one pipeline per model name, using prepared_data, the
+        preprocessed input_data, unless the pipeline does its own
+        preprocessing.'''
+        if models is not None:
             # pipelines = [self.model2pipeline(model)(input_data, override_args={'constraints':self.constraints}) for model in self.models]
-            pipelines = []
-            for model in self.models:
+            pipeline_classes = []
+            for model in models:
                 print(f"Creating pipeline for model {model} ...")
-                pipelines.append(self.model2pipeline(model)(input_data,
-                                                            override_args={'constraints':self.constraints}))
+                pipeline_classes.append(self.model2pipeline(model))
         else:
-            pipelines = [pipe(input_data, override_args={'constraints':self.constraints}) \
-                          for pipe in [TVAEPipeline, 
-                                       CTGANPipeline, 
-                                       CopulaGANPipeline, 
-                                       GaussianCopulaPipeline]]
+            pipeline_classes = [TVAEPipeline,
+                                CTGANPipeline,
+                                CopulaGANPipeline,
+                                GaussianCopulaPipeline]
+        return [pipe(prepared_data if pipe.preprocessed_input else input_data,
+                     override_args={'constraints':self.constraints})
+                for pipe in pipeline_classes]
 
-        print(f"Running pipelines: {pipelines} ...")
-        
+
+    def _configure_pipelines(self, pipelines):
+        '''Add the standard scoring hooks to the pipelines.'''
         # TODO: Implement postprocessing function
         # def postprocess_function(synth_data):
         #     pass
         #     ...
         #     return post_data
 
-        def sdmetrics_quality(input_data, synth_data):
-            report = sdmetrics.reports.single_table.QualityReport()
-            report.generate(input_data.data,
-                            synth_data.data,
-                            input_data.metadata.metadata,
-                            verbose=False)
-            return report.get_score()
-
-        self._add_preprocessing(Utils.convert_all_dates, pipelines=pipelines)
-        self._add_preprocessing(Utils.impute, pipelines=pipelines)
+        # the standard preprocessing is run once for all pipelines, see
+        # _prepare()
         # self._add_preprocessing(self._preprocess_impute, pipelines=pipelines)
-        print("Added preprocessing hooks")
 
         # TODO: Implement the postprocessing function that could be used by CTABGAN pipeline
         # self._add_postprocessing(postprocess_function, pipelines)
 
-        self._add_scoring(sdmetrics_quality, pipelines=pipelines)
+        if self.quality_scorer == 'native':
+            self._add_scoring(quality.quality_score, pipelines=pipelines)
+        else:
+            self._add_scoring(sdmetrics_quality, pipelines=pipelines)
         print("Added scoring hooks")
+        for pipeline in pipelines:
+            if hasattr(pipeline, 'set_scoring_concurrency'):
+                pipeline.set_scoring_concurrency(self.scoring_workers,
+                                                 executor=self.scoring_executor,
+                                                 timeout=self.scoring_timeout)
+        if self.scoring_rows is not None:
+            for pipeline in pipelines:
+                if hasattr(pipeline, 'set_scoring_sample'):
+                    pipeline.set_scoring_sample(self.scoring_rows,
+                                                bootstrap_samples=self.scoring_bootstrap,
+                                                confidence_level=self.scoring_confidence)
 
+        for pipeline in pipelines:
+            pipeline.model.set_mixture_cache(self.mixture_cache)
+        self._share_normalizers(pipelines)
+        self._share_data_processor(pipelines)
+        self._share_real_statistics(pipelines)
+
+
+    def _share_real_statistics(self, pipelines):
+        '''Compute the statistics of the real data used by the scoring
+        functions once, before the pipelines are dispatched; they are handed
+        to the pipelines with their input data.  Only the statistics of the
+        scoring functions with a precompute attribute are computed (see
+        ASyH.metrics.real_statistics).'''
+        inputs = []  # (data, scoring functions)
+        for pipeline in pipelines:
+            data = pipeline.scoring_data() if hasattr(pipeline, 'scoring_data') \
+                else pipeline.input_data
+            functions = [function for function in getattr(pipeline, 'scoring_functions', [])
+                         if getattr(function, 'precompute', None) is not None]
+            for other, other_functions in inputs:
+                if data is other:
+                    other_functions.extend(function for function in functions
+                                           if function not in other_functions)
+                    break
+            else:
+                inputs.append((data, functions))
+        inputs = [(data, functions) for data, functions in inputs if functions]
+        if not inputs:
+            return
+        print("Computing the statistics of the real data ...")
+        for data, functions in inputs:
+            try:
+                precompute(data, functions)
+            except Exception as error:  # left to the scoring functions to report
+                Warning(f'ASyH.App.Application: computing the real statistics failed: {error}')
+
+
+    def _share_data_processor(self, pipelines):
+        '''Fit the SDV data processor (rdt HyperTransformer, formatters and
+        constraints) once and hand it to the SDV-based models; models with
+        other transformers for some sdtypes get a copy in which only these
+        columns are refitted.'''
+        sharing = [pipeline for pipeline in pipelines
+                   if getattr(pipeline.model, 'shares_data_processor', False)]
+        if len(sharing) < 2:
+            return
+        if not supported():
+            Warning('ASyH.App.Application: the installed rdt version is not supported '
+                    'for sharing the data processor, the models fit their own.')
+            return
+        data = sharing[0].input_data
+        sharing = [pipeline for pipeline in sharing if pipeline.input_data is data]
+        processors = [pipeline.model.create_data_processor(data) for pipeline in sharing]
+        base = processors[0]
+        print("Fitting the shared data processor ...")
+        try:
+            base.fit(data.data)
+        except Exception as error:  # left to the pipelines to report
+            Warning(f'ASyH.App.Application: fitting the shared data processor failed: {error}')
+            return
+        sharing[0].model.set_data_processor(base)
+        for pipeline, processor in zip(sharing[1:], processors[1:]):
+            # models with other formatters or constraints fit their own:
+            if compatible(base, processor):
+                pipeline.model.set_data_processor(derive_processor(base, processor, data.data))
+
+
+    def _share_normalizers(self, pipelines):
+        '''Fit the mode-specific normalizers of the continuous columns once for
+        all models using them (CTGAN, TVAE, CopulaGAN) and hand them to these
+        models instead of letting every model fit its own.'''
+        sharing = [pipeline for pipeline in pipelines
+                   if getattr(pipeline.model, 'mode_specific_normalization', False)]
+        if len(sharing) < 2:
+            return
+        print("Fitting the shared mode-specific normalizers ...")
+        normalizers = SharedNormalizers(fallback=self.mixture_cache)
+        normalizers.fit(sharing[0].input_data, max_workers=self.max_workers)
+        for pipeline in sharing:
+            pipeline.model.set_mixture_cache(normalizers)
+
+
+    def _remaining_time(self):
+        '''Seconds left of the time budget of the training run, None if there
+        is no budget.'''
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+
+    def _pipeline_budget(self, n_pipelines, share=1.0):
+        '''Time budget of each of n_pipelines pipelines: the per-pipeline
+        budget, but not more than their share of the part share of the
+        remaining total budget (pipelines waiting for a free worker get a share
+        of the time left after the ones before them).'''
+        budgets = [self.pipeline_time_budget]
+        remaining = self._remaining_time()
+        if remaining is not None:
+            workers, _ = worker_plan(n_pipelines, self.max_workers, self.threads_per_worker)
+            budgets.append(share * remaining / math.ceil(n_pipelines / workers))
+        return min((b for b in budgets if b is not None), default=None)
+
+
+    def _dispatch(self, pipelines, share=1.0):
+        '''Run the pipelines with the application's worker settings and time
+        budgets, with the part share of the remaining total budget (see
+        _pipeline_budget()).'''
+        budget = self._pipeline_budget(len(pipelines), share)
+        if budget is not None:
+            for pipeline in pipelines:
+                pipeline.model.set_time_budget(TRAINING_BUDGET_SHARE * budget)
         print("Dispatching the pipelines concurrently ...")
-        self._results = concurrent_dispatch(*pipelines)
+        results = dispatch(*pipelines,
+                           max_workers=self.max_workers,
+                           threads_per_worker=self.threads_per_worker,
+                           cpu_affinity=self.cpu_affinity,
+                           timeout=self.pipeline_time_budget,
+                           total_timeout=self._remaining_time(),
+                           share_data=self.share_data)
+        for pipeline, result in zip(pipelines, results):
+            print(f'{pipeline.model.model_type}: {result.status} '
+                  f'after {result.elapsed:.1f}s')
+        return results
+
+
+    def _halving_rounds(self, n_candidates):
+        '''Number of successive-halving rounds needed to reduce n_candidates
+        to a single winner.'''
+        rounds = 0
+        while n_candidates > 1:
+            n_candidates = math.ceil(n_candidates / self.halving_eta)
+            rounds += 1
+        return rounds
+
+
+    def _stage_costs(self, n_candidates):
+        '''Relative durations of the successive-halving rounds for
+        n_candidates and of the final training of the winner: the number of
+        waves of pipelines on the workers times their fidelity.'''
+        rounds = self._halving_rounds(n_candidates)
+        costs = []
+        for round_ in range(rounds):
+            workers, _ = worker_plan(n_candidates, self.max_workers, self.threads_per_worker)
+            costs.append(math.ceil(n_candidates / workers) * self.halving_eta ** (round_ - rounds))
+            n_candidates = math.ceil(n_candidates / self.halving_eta)
+        return costs + [1.0]
+
+
+    def _reduce_epochs(self, pipelines, fidelity):
+        '''Reduce the training budget of the pipelines' models to the fraction
+        fidelity of their full number of epochs.'''
+        for pipeline in pipelines:
+            epochs = pipeline.model.epochs
+            if epochs is not None:
+                pipeline.model.set_epochs(max(1, math.ceil(epochs * fidelity)))
+
+
+    def _subsample(self, input_data, fidelity):
+        '''Return input_data subsampled to the fraction fidelity of its rows,
+        if subsampling is enabled.'''
+        n_rows = input_data.data.shape[0]
+        sample_size = min(n_rows, max(self.halving_min_rows, math.ceil(n_rows * fidelity)))
+        if not self.halving_subsample or sample_size == n_rows:
+            return input_data
+        sample = input_data.data.sample(n=sample_size, random_state=42)
+        return Data(sample.reset_index(drop=True), metadata=input_data.metadata)
+
+
+    def _successive_halving(self, input_data, prepared_data):
+        '''Select the candidate models by successive halving: all candidates are
+        trained with a small budget of epochs (and rows), scored, and only the
+        best 1/halving_eta of them proceed to the next round with halving_eta
+        times the budget, until one candidate is left.  Return the list with
+        the remaining model name.'''
+        candidates = list(self.models)
+        rounds = self._halving_rounds(len(candidates))
+        for round_ in range(rounds):
+            fidelity = self.halving_eta ** (round_ - rounds)
+            print(f"Successive halving round {round_ + 1}/{rounds}: "
+                  f"{candidates} at fidelity {fidelity:.3f} ...")
+            # both are subsampled to the same rows:
+            pipelines = self._create_pipelines(candidates,
+                                               self._subsample(input_data, fidelity),
+                                               self._subsample(prepared_data, fidelity))
+            self._reduce_epochs(pipelines, fidelity)
+            self._configure_pipelines(pipelines)
+            # the round's part of the time left for it, the later rounds and
+            # the final training:
+            costs = self._stage_costs(len(candidates))
+            results = self._dispatch(pipelines, share=costs[0] / sum(costs))
+            self._tournament.append({'fidelity': fidelity,
+                                     'results': dict(zip(candidates, results))})
+
+            # pipelines which failed or timed out are ranked last:
+            scores = [result.score if result.status == FINISHED else -math.inf
+                      for result in results]
+            n_keep = math.ceil(len(candidates) / self.halving_eta)
+            ranking = sorted(range(len(candidates)),
+                             key=lambda i: scores[i], reverse=True)
+            candidates = [candidates[i] for i in sorted(ranking[:n_keep])]
+        return candidates
+
+
+    def train(self, input_data, metadata):
+        """Train each model in its own pipeline using input_data and metadata,
+        score, select and return the best scoring model.
+        """
+        input_data.set_metadata(metadata)
+
+        print(f"Used models are: {self.models} ...")
+
+        self._deadline = None
+        if self.time_budget is not None:
+            self._deadline = time.monotonic() + self.time_budget
+        # the rounds of this run only, see _successive_halving():
+        self._tournament = []
+
+        prepared_data = self._prepare(input_data)
+
+        if self.selection == 'successive_halving':
+            candidates = self._successive_halving(input_data, prepared_data)
+        else:
+            candidates = self.models
+
+        pipelines = self._create_pipelines(candidates, input_data, prepared_data)
+        print(f"Running pipelines: {pipelines} ...")
+        self._configure_pipelines(pipelines)
+
+        self._results = self._dispatch(pipelines)
+        self._result_models = [pipeline.model.model_type for pipeline in pipelines]
 
         self._best = self._select_best(self._results, pipelines=pipelines)
 
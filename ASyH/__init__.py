@@ -1,18 +1,20 @@
 """ASyH classes and utilities"""
 
 from ASyH.App import Application
-from ASyH.data import Data, SyntheticData
+from ASyH.data import Data, SharedData, SyntheticData
 from ASyH.metadata import Metadata
 from ASyH.model import Model
 from ASyH.models import TVAEModel, CTGANModel, CopulaGANModel, GaussianCopulaModel, ForestFlowModel
 from ASyH.pipeline import Pipeline
 from ASyH.pipelines import TVAEPipeline, CTGANPipeline, CopulaGANPipeline, GaussianCopulaPipeline, ForestFlowPipeline
 from ASyH.report import Report
-from ASyH.dispatch import concurrent_dispatch
+from ASyH.dispatch import concurrent_dispatch, dispatch, PipelineResult
+from ASyH.mixture_cache import MixtureCache
 
 __all__ = [
     'Application',
     'Data',
+    'SharedData',
     'SyntheticData',
     'Metadata',
     'Model',
@@ -27,6 +29,9 @@ __all__ = [
     'GaussianCopulaPipeline',
     'Report',
     'concurrent_dispatch',
+    'dispatch',
+    'PipelineResult',
+    'MixtureCache',
     'ForestFlowModel',
     'ForestFlowPipeline'
 ]
@@ -91,12 +91,12 @@ def get_st_ed(target_col_index,output_info):
     return (st,ed)
 
 def random_choice_prob_index_sampling(probs,col_idx):
-    option_list = []
-    for i in col_idx:
-        pp = probs[i]
-        option_list.append(np.random.choice(np.arange(len(probs[i])), p=pp))
-    
-    return np.array(option_list).reshape(col_idx.shape)
+    # probs: one row of (zero-padded) option probabilities per column; one
+    # uniform draw per batch element, searched in the cumulative
+    # probabilities like np.random.choice does:
+    cumulative = probs[col_idx].cumsum(axis=1)
+    r = np.random.rand(len(col_idx), 1) * cumulative[:, -1:]
+    return (cumulative > r).argmax(axis=1).reshape(col_idx.shape)
 
 def random_choice_prob_index(a, axis=1):
     r = np.expand_dims(np.random.rand(a.shape[1 - axis]), axis=axis)
@@ -131,7 +131,7 @@ class Cond(object):
         self.n_opt = 0  
         st = 0
         self.p = np.zeros((counter, maximum_interval(output_info)))  
-        self.p_sampling = []
+        self.p_sampling = np.zeros((counter, maximum_interval(output_info)))
         for item in output_info:
             # import pdb; pdb.set_trace()
             if item[1] == 'tanh':
@@ -145,7 +145,7 @@ class Cond(object):
                 tmp = np.log(tmp + 1)  
                 tmp = tmp / np.sum(tmp) 
                 tmp_sampling = tmp_sampling / np.sum(tmp_sampling)
-                self.p_sampling.append(tmp_sampling)
+                self.p_sampling[self.n_col, :item[0]] = tmp_sampling
                 self.p[self.n_col, :item[0]] = tmp 
                 self.interval.append((self.n_opt, item[0]))
                 self.n_opt += item[0]
@@ -165,8 +165,7 @@ class Cond(object):
         mask = np.zeros((batch, self.n_col), dtype='float32')
         mask[np.arange(batch), idx] = 1  
         opt1prime = random_choice_prob_index(self.p[idx]) 
-        for i in np.arange(batch):
-            vec[i, self.interval[idx[i], 0] + opt1prime[i]] = 1
+        vec[np.arange(batch), self.interval[idx, 0] + opt1prime] = 1
             
         return vec, mask, idx, opt1prime
 
@@ -179,9 +178,7 @@ class Cond(object):
 
         vec = np.zeros((batch, self.n_opt), dtype='float32')
         opt1prime = random_choice_prob_index_sampling(self.p_sampling,idx)
-        
-        for i in np.arange(batch):
-            vec[i, self.interval[idx[i], 0] + opt1prime[i]] = 1
+        vec[np.arange(batch), self.interval[idx, 0] + opt1prime] = 1
             
         return vec
 
@@ -213,8 +210,13 @@ class Sampler(object):
     def __init__(self, data, output_info):
         super(Sampler, self).__init__()
         self.data = data
-        self.model = []
         self.n = len(data)
+        # CSR-style lookup of the rows having an option of a softmax column:
+        # the rows of option o of column c are
+        # rows[offsets[k]:offsets[k] + counts[k]] with k = option_start[c] + o.
+        rows = []
+        counts = []
+        self.option_start = []
         st = 0
         for item in output_info:
             if item[1] == 'tanh':
@@ -222,20 +224,24 @@ class Sampler(object):
                 continue
             elif item[1] == 'softmax':
                 ed = st + item[0]
-                tmp = []
-                for j in range(item[0]):
-                    tmp.append(np.nonzero(data[:, st + j])[0])
-                self.model.append(tmp)
+                self.option_start.append(sum(len(c) for c in counts))
+                # transposed, nonzero() lists the rows option by option:
+                opts, col_rows = np.nonzero(data[:, st:ed].T)
+                rows.append(col_rows)
+                counts.append(np.bincount(opts, minlength=item[0]))
                 st = ed
+        self.option_start = np.array(self.option_start, dtype=int)
+        self.rows = np.concatenate(rows) if rows else np.zeros(0, dtype=int)
+        self.counts = np.concatenate(counts) if counts else np.zeros(0, dtype=int)
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)[:-1]]).astype(int)
                 
     def sample(self, n, col, opt):
         if col is None:
             idx = np.random.choice(np.arange(self.n), n)
             return self.data[idx]
-        idx = []
-        for c, o in zip(col, opt):
-            idx.append(np.random.choice(self.model[c][o]))
-        return self.data[idx]
+        k = self.option_start[col] + opt
+        pick = self.offsets[k] + (np.random.rand(len(k)) * self.counts[k]).astype(int)
+        return self.data[self.rows[pick]]
 
 class Discriminator(Module):
     def __init__(self, side, layers):
@@ -358,6 +364,9 @@ class CTABGANSynthesizer:
                  l2scale=1e-5,
                  batch_size=500,
                  epochs=1,
+                 n_jobs=None,
+                 max_fit_rows=None,
+                 mixture_cache=None,
                  **kwargs):
 
         self.random_dim = random_dim
@@ -368,6 +377,10 @@ class CTABGANSynthesizer:
         self.l2scale = l2scale
         self.batch_size = batch_size
         self.epochs = epochs
+        # passed on to the DataTransformer:
+        self.n_jobs = n_jobs
+        self.max_fit_rows = max_fit_rows
+        self.mixture_cache = mixture_cache
         self.device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 
 
@@ -377,7 +390,9 @@ class CTABGANSynthesizer:
         print("Initializing Data transformer for Forest Flow ...")
         # import ipdb; ipdb.set_trace() # remove later
         self.transformer = DataTransformer(train_data=train_data, categorical_list=categorical, 
-                                           mixed_dict=mixed, general_list=general, non_categorical_list=non_categorical)
+                                           mixed_dict=mixed, general_list=general, non_categorical_list=non_categorical,
+                                           n_jobs=self.n_jobs, max_fit_rows=self.max_fit_rows,
+                                           mixture_cache=self.mixture_cache)
         self.transformer.fit()
         # train_data = self.transformer.transform()
         # breakpoint
@@ -532,10 +547,9 @@ class CTABGANSynthesizer:
 
             
    
-    def sample(self, n):
-        
-        self.generator.eval()
-
+    def _generate(self, n):
+        """Generate at least n rows (whole batches) in the transformed data
+        space."""
         output_info = self.transformer.output_info
         steps = n // self.batch_size + 1
         
@@ -556,33 +570,28 @@ class CTABGANSynthesizer:
             fakeact = apply_activate(faket,output_info)
             data.append(fakeact.detach().cpu().numpy())
 
-        data = np.concatenate(data, axis=0)
-        result,resample = self.transformer.inverse_transform(data)
-        
-        while len(result) < n:
-            data_resample = []    
-            steps_left = resample// self.batch_size + 1
-            
-            for i in range(steps_left):
-                noisez = torch.randn(self.batch_size, self.random_dim, device=self.device)
-                condvec = self.cond_generator.sample(self.batch_size)
-                if condvec is not None:
-                    c = condvec
-                    c = torch.from_numpy(c).to(self.device)
-                    noisez = torch.cat([noisez, c], dim=1)
-                noisez =  noisez.view(self.batch_size,self.random_dim+self.cond_generator.n_opt,1,1)
-                    
-                fake = self.generator(noisez)
-                faket = self.Gtransformer.inverse_transform(fake)
-                fakeact = apply_activate(faket, output_info)
-                data_resample.append(fakeact.detach().cpu().numpy())
+        return np.concatenate(data, axis=0)
 
-            data_resample = np.concatenate(data_resample, axis=0)
 
-            res,resample = self.transformer.inverse_transform(data_resample)
-            result  = np.concatenate([result,res],axis=0)
-        
-        return result[0:n]
+    def sample(self, n, max_resample_rounds=10):
+        """Sample n rows.  Rows with values outside the range of the training
+        data are replaced by newly generated ones, for at most
+        max_resample_rounds rounds; if there are still too few valid rows
+        then, the rest is filled up with invalid ones."""
+        self.generator.eval()
+
+        result, valid = self.transformer.inverse_transform(self._generate(n))
+        samples, rejected = [result[valid]], [result[~valid]]
+        n_valid = np.sum(valid)
+        for _ in range(max_resample_rounds):
+            if n_valid >= n:
+                break
+            result, valid = self.transformer.inverse_transform(self._generate(n - n_valid))
+            samples.append(result[valid])
+            rejected.append(result[~valid])
+            n_valid += np.sum(valid)
+
+        return np.concatenate(samples + rejected, axis=0)[0:n]
     
 
     def save(self, save_prefix="."):
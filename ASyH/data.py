@@ -8,9 +8,11 @@
 #
 #   Module docstring
 from typing import Optional
+from multiprocessing import shared_memory
 import re
 import magic
 
+import numpy
 import pandas
 from pandas import DataFrame
 
@@ -33,6 +35,13 @@ class Data:
     def metadata(self) -> Metadata:
         return self._metadata
 
+    @property
+    def cache(self) -> dict:
+        '''Results derived from the table and its metadata, e.g. the
+        statistics of ASyH.metrics.real_statistics; emptied when either is
+        replaced (but not when the data frame is changed in place).'''
+        return self.__dict__.setdefault('_cache', {})
+
     @property
     def sdv_metadata(self) -> SingleTableMetadata:
         try:
@@ -50,6 +59,7 @@ class Data:
         # should we not .copy() the dataframe?  atm we do not manipulate ._data.
         self._data = data
         self._metadata = metadata
+        self._cache = {}
 
     def read(self, input_file):
         """Generic read method inferring file format from \'magic\'.  Excel and
@@ -65,15 +75,96 @@ class Data:
         else:
             raise DataError("Cannot determine input file type: ")
         self._data = data
+        self._cache = {}
 
     def set_metadata(self, metadata: Optional[Metadata] = None):
         self._metadata = metadata
+        self._cache = {}
 
 
 class RealData(Data):
     pass
 
 
+class SharedData(Data):
+    """Data whose numerical columns are stored in shared memory, to be handed
+    to pipelines in worker processes without copying.  Forked workers see the
+    same memory pages, and pickling (as done when starting workers with
+    'spawn') only transfers the names of the shared memory blocks: unpickling
+    attaches to them.  The shared columns are read-only.
+
+    The creating process owns the shared memory and has to unlink() it when
+    it is no longer needed.
+    """
+
+    def __init__(self, data: Optional[DataFrame] = None, metadata: Optional[Metadata] = None):
+        super().__init__(metadata=metadata)
+        self._memory = []
+        self._blocks = []  # (shared memory name, dtype, shape, column names)
+        self._index = data.index
+        self._columns = list(data.columns)
+        shared = [col for col in data.columns
+                  if isinstance(data[col].dtype, numpy.dtype)
+                  and data[col].dtype.kind in 'biufc']
+        self._other = data.drop(columns=shared)
+
+        # one block per dtype, in Fortran order so that each column is a
+        # contiguous slice:
+        groups = {}
+        for col in shared:
+            groups.setdefault(data[col].dtype, []).append(col)
+        for dtype, columns in groups.items():
+            values = data[columns].to_numpy(dtype=dtype)
+            memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            array = numpy.ndarray(values.shape, dtype=dtype, buffer=memory.buf, order='F')
+            array[...] = values
+            self._memory.append(memory)
+            self._blocks.append((memory.name, dtype, values.shape, columns))
+        self._data = self._assemble()
+
+    def _assemble(self) -> DataFrame:
+        views = {}
+        for memory, (_, dtype, shape, names) in zip(self._memory, self._blocks):
+            array = numpy.ndarray(shape, dtype=dtype, buffer=memory.buf, order='F')
+            array.flags.writeable = False
+            for i, name in enumerate(names):
+                views[name] = array[:, i]
+        columns = {name: views[name] if name in views else self._other[name].array
+                   for name in self._columns}
+        # copy=False keeps one block per column, i.e. views of shared memory:
+        return DataFrame(columns, index=self._index, copy=False)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_memory']
+        del state['_data']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._memory = [shared_memory.SharedMemory(name=name)
+                        for name, _, _, _ in self._blocks]
+        self._data = self._assemble()
+
+    def close(self):
+        """Detach from the shared memory."""
+        self._data = None
+        for memory in self._memory:
+            try:
+                memory.close()
+            except BufferError:
+                # still referenced by views of the data, detached when
+                # these are garbage collected.
+                pass
+
+    def unlink(self):
+        """Free the shared memory; to be called once by the creating
+        process."""
+        for memory in self._memory:
+            memory.unlink()
+        self.close()
+
+
 class SyntheticData(Data):
     """Synthetic data class: In contrast to real data, it can be written to
     file.
@@ -1,26 +1,254 @@
 # ASyH concurrent/async dispatch
 # ToDos: -
 
-from multiprocessing import Process, Value
+import os
+import pickle
+import time
+import traceback
+from collections import namedtuple
+from multiprocessing import Process, Pipe
+from multiprocessing.connection import wait
 
+from ASyH.data import SharedData
+from ASyH.utils import available_cpus
 
-def task(pipeline, retval):
-    retval.value = pipeline.run()
+# states of a dispatched pipeline:
+FINISHED = 'finished'
+FAILED = 'failed'
+TIMED_OUT = 'timed out'
 
+PipelineResult = namedtuple('PipelineResult',
+                            'status score elapsed error interval instrumentation',
+                            defaults=(None, None, None))
+PipelineResult.__doc__ = \
+    '''Outcome of a dispatched pipeline: its status (FINISHED, FAILED or
+    TIMED_OUT), its score (None unless FINISHED), the elapsed wall-clock time
+    in seconds, the error message of a FAILED pipeline, the confidence
+    interval (low, high) of the score if the pipeline estimated one, and the
+    ASyH.instrumentation.Instrumentation of the stages of a FINISHED
+    pipeline's run.'''
 
-def concurrent_dispatch(*pipelines):
-    '''Run several ASyH pipelines concurrently with multiprocessing.Process.'''
-    results = []
-    procs = []
+# seconds a worker may take to exit after sending its result before it is
+# terminated, e.g. when threads left behind by the pipeline keep it alive:
+EXIT_TIMEOUT = 10.0
 
-    for i in range(len(pipelines)):
-        ret = Value('f', 0.0)
-        p = Process(target=task, args=(pipelines[i], ret))
-        results.append(ret)
-        procs.append(p)
-        p.start()
+# environment variables read by OpenMP, MKL, OpenBLAS & co. when they size
+# their thread pools:
+THREAD_ENV_VARIABLES = ('OMP_NUM_THREADS',
+                        'MKL_NUM_THREADS',
+                        'OPENBLAS_NUM_THREADS',
+                        'NUMEXPR_NUM_THREADS',
+                        'VECLIB_MAXIMUM_THREADS')
 
-    for p in procs:
-        p.join()
 
-    return [results[i].value for i in range(len(pipelines))]
+def limit_threads(threads, cpus=None):
+    '''Restrict torch and the BLAS/OpenMP libraries of the calling process to
+    the given number of threads, and pin the process to the CPUs in cpus if
+    specified.'''
+    if cpus is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    # for libraries loaded after this point:
+    for variable in THREAD_ENV_VARIABLES:
+        os.environ[variable] = str(threads)
+    # for libraries already loaded by the parent before forking:
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def worker_plan(n_pipelines, max_workers=None, threads_per_worker=None):
+    '''Return the number of worker processes and the number of threads per
+    worker, such that workers x threads matches the available CPUs unless
+    specified otherwise.'''
+    cpus = len(available_cpus())
+    workers = min(n_pipelines, max_workers or cpus)
+    workers = max(workers, 1)
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cpus // workers)
+    return workers, threads_per_worker
+
+
+def cpu_slots(workers, threads):
+    '''Split the available CPUs into one set of CPUs per worker slot.  If there
+    are fewer CPUs than workers x threads, the sets wrap around.'''
+    cpus = available_cpus()
+    return [{cpus[(slot * threads + i) % len(cpus)] for i in range(threads)}
+            for slot in range(workers)]
+
+
+def task(pipeline, connection, threads=None, cpus=None):
+    '''Run the pipeline and send its score together with the fitted model back
+    to the parent process.'''
+    if threads is not None:
+        limit_threads(threads, cpus)
+    try:
+        score = pipeline.run()
+    except Exception:  # report any failure back to the parent instead of dying
+        message = {'status': FAILED, 'error': traceback.format_exc()}
+    else:
+        message = {'status': FINISHED, 'score': score,
+                   'interval': getattr(pipeline, 'score_interval', None),
+                   'instrumentation': getattr(pipeline, 'instrumentation', None),
+                   'model': pipeline.model}
+    # pickled by value: Connection.send() would hand torch tensors over as
+    # file descriptors, which are gone once this process has exited
+    connection.send_bytes(pickle.dumps(message))
+    connection.close()
+
+
+def share_input_data(pipelines):
+    '''Move the input data of the pipelines into shared memory, once per
+    distinct Data object, and return the original Data objects and the
+    SharedData created.'''
+    originals = [pipeline.input_data for pipeline in pipelines]
+    shared = {}
+    for pipeline, data in zip(pipelines, originals):
+        if id(data) not in shared:
+            shared[id(data)] = SharedData(data.data, data.metadata)
+            shared[id(data)].cache.update(data.cache)
+        pipeline.input_data = shared[id(data)]
+    return originals, list(shared.values())
+
+
+def dispatch(*pipelines, max_workers=None, threads_per_worker=None,
+             cpu_affinity=False, timeout=None, total_timeout=None,
+             share_data=False):
+    '''Run several ASyH pipelines concurrently in a bounded pool of
+    multiprocessing.Process workers and return a PipelineResult per pipeline.
+
+    At most max_workers pipelines run at the same time (default: one per
+    pipeline, but not more than there are CPUs).  Each worker limits torch and
+    the BLAS/OpenMP libraries to threads_per_worker threads (default: the
+    available CPUs divided by the number of workers), and is pinned to its own
+    set of CPUs if cpu_affinity is True.
+
+    A pipeline running longer than timeout seconds is terminated, as are all
+    pipelines still running total_timeout seconds after the dispatch started;
+    pipelines not started by then are not started at all.  Both are reported
+    as TIMED_OUT.  A pipeline raising an exception or whose child process dies
+    is reported as FAILED.
+
+    The models fitted in the child processes are sent back to the parent and
+    replace the untrained models of the given pipelines, so they can be sampled
+    from without retraining.
+
+    If share_data is True, the input data of the pipelines is put into shared
+    memory for the time of the dispatch, instead of being copied to each
+    worker; the numerical columns are read-only in the workers then.'''
+    if not share_data:
+        return _schedule(pipelines, max_workers, threads_per_worker,
+                         cpu_affinity, timeout, total_timeout)
+    originals, shared = share_input_data(pipelines)
+    try:
+        return _schedule(pipelines, max_workers, threads_per_worker,
+                         cpu_affinity, timeout, total_timeout)
+    finally:
+        for pipeline, data in zip(pipelines, originals):
+            pipeline.input_data = data
+        for data in shared:
+            data.unlink()
+
+
+def _schedule(pipelines, max_workers, threads_per_worker, cpu_affinity,
+              timeout, total_timeout):
+    '''The scheduling loop of dispatch().'''
+    workers, threads = worker_plan(len(pipelines), max_workers, threads_per_worker)
+    if cpu_affinity:
+        cpu_sets = cpu_slots(workers, threads)
+    else:
+        cpu_sets = [None] * workers
+
+    dispatch_start = time.monotonic()
+    total_deadline = None
+    if total_timeout is not None:
+        total_deadline = dispatch_start + total_timeout
+
+    results = [None] * len(pipelines)
+    pending = list(range(len(pipelines)))
+    free_slots = list(range(workers))
+    # receiving end of the pipe => (pipeline index, process, slot, start, deadline)
+    running = {}
+
+    def finish(receiver, result):
+        index, p, slot, _, _ = running.pop(receiver)
+        receiver.close()
+        if result.status == TIMED_OUT:
+            p.terminate()
+        p.join(EXIT_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+            p.join()
+        free_slots.append(slot)
+        results[index] = result
+
+    while pending or running:
+        if total_deadline is not None and time.monotonic() >= total_deadline:
+            for index in pending:
+                results[index] = PipelineResult(TIMED_OUT, None, 0.0)
+            pending = []
+
+        while pending and free_slots:
+            index = pending.pop(0)
+            slot = free_slots.pop(0)
+            receiver, sender = Pipe(duplex=False)
+            p = Process(target=task,
+                        args=(pipelines[index], sender, threads, cpu_sets[slot]))
+            start = time.monotonic()
+            p.start()
+            # only the child writes to this end, closing it here lets recv()
+            # see EOF when the child dies:
+            sender.close()
+            deadlines = [d for d in (total_deadline,
+                                     None if timeout is None else start + timeout)
+                         if d is not None]
+            running[receiver] = (index, p, slot, start, min(deadlines, default=None))
+
+        if not running:
+            continue
+
+        next_deadline = min((entry[4] for entry in running.values()
+                             if entry[4] is not None), default=None)
+        wait_time = None
+        if next_deadline is not None:
+            wait_time = max(0.0, next_deadline - time.monotonic())
+
+        # receive before joining: a child blocks in send() until its
+        # (possibly large) model has been read from the pipe.
+        for receiver in wait(list(running), timeout=wait_time):
+            index, _, _, start, _ = running[receiver]
+            try:
+                message = pickle.loads(receiver.recv_bytes())
+            except EOFError:
+                message = {'status': FAILED, 'error': 'child process died'}
+            elapsed = time.monotonic() - start
+            if message['status'] == FINISHED:
+                pipelines[index].model = message['model']
+                result = PipelineResult(FINISHED, message['score'], elapsed,
+                                        interval=message['interval'],
+                                        instrumentation=message['instrumentation'])
+            else:
+                result = PipelineResult(FAILED, None, elapsed, message['error'])
+            finish(receiver, result)
+
+        now = time.monotonic()
+        for receiver, (_, _, _, start, deadline) in list(running.items()):
+            if deadline is not None and now >= deadline:
+                finish(receiver, PipelineResult(TIMED_OUT, None, now - start))
+
+    return results
+
+
+def concurrent_dispatch(*pipelines, **dispatch_args):
+    '''Run several ASyH pipelines concurrently, see dispatch() for the
+    arguments.  Returns the list of scores in the order of the pipelines; a
+    pipeline which failed or timed out scores 0.0 and keeps its untrained
+    model.'''
+    return [result.score if result.status == FINISHED else 0.0
+            for result in dispatch(*pipelines, **dispatch_args)]
@@ -1,6 +1,13 @@
 '''Hooks: simple execution hooks for common point of execution.'''
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
 from sdmetrics.errors import IncomputableMetricError
 from ASyH.data import Data
+from ASyH.instrumentation import measure
 import pdb
 
 
@@ -11,34 +18,162 @@ class Hook:
 
     def __init__(self):
         self._function_list = []
+        # ASyH.instrumentation.Instrumentation recording the functions:
+        self.instrumentation = None
 
     def add(self, func):
         '''Add a function to the hook'''
         self._function_list.append(func)
 
+    @property
+    def functions(self):
+        '''The functions in the hook, in the order of execution.'''
+        return list(self._function_list)
+
     def execute(self, *args):
         '''Return a dict of the format function: return_value.'''
         return {func.__name__: func(*args)
                 for func in self._function_list}
 
 
+EXECUTORS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
+# seconds a scoring process may take to exit after sending its result before
+# it is terminated:
+EXIT_TIMEOUT = 5.0
+
+
+def _score_in_process(func, real_data, synthetic_data, connection):
+    '''Run the scoring function func in a child process of ScoringHook and
+    send its result and record back.'''
+    try:
+        message = ('result', measure(func, real_data, synthetic_data))
+    except IncomputableMetricError:
+        message = ('incomputable', None)
+    except Exception:  # re-raised in the parent
+        message = ('error', traceback.format_exc())
+    connection.send(message)
+    connection.close()
+
+
+def _stop(process, timeout=0.0):
+    '''Join process, terminating it if it has not exited after timeout
+    seconds.'''
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+
+
 class ScoringHook(Hook):
     '''Hook for Scoring functions, i.e. with the fingerprint
     (real_data, synthetic_data) => float,
     where real_data and synthetic_data are objects of the ASyH.data.Data
-    class.  Only add such functions, otherwise exceptions will be thrown.'''
+    class.  Only add such functions, otherwise exceptions will be thrown.
+
+    With max_workers > 1, the scoring functions run concurrently in a pool
+    of max_workers threads, or processes if executor is 'process' (the
+    functions and data have to be picklable then).  With a timeout, each
+    function runs in a process of its own instead (max_workers at a time),
+    which is terminated and left out of the results if it has not finished
+    timeout seconds after it started.  The seconds each function took are
+    recorded in timings.'''
+
+    def __init__(self, max_workers=1, executor='thread', timeout=None):
+        super().__init__()
+        assert executor in EXECUTORS, f'Unknown executor {executor} specified'
+        self.max_workers = max_workers
+        self.executor = executor
+        self.timeout = timeout
+        self.timings = {}
 
     def execute(self, real_data: Data, synthetic_data: Data):
         '''Execute all scoring functions in the hook,
         return a dict of the format function: return_value.'''
+        self.timings = {}
+        if self.timeout is not None:
+            ret = self._execute_in_processes(real_data, synthetic_data)
+        elif self.max_workers > 1 and len(self._function_list) > 1:
+            ret = self._execute_concurrently(real_data, synthetic_data)
+        else:
+            ret = {}
+            for func in self._function_list:
+                try:
+                    # pdb.set_trace()
+                    res, record = measure(func, real_data, synthetic_data)
+                    self._record(func.__name__, record)
+                    ret[func.__name__] = res
+                except IncomputableMetricError:
+                    pass
+        # in the order of the functions:
+        return {func.__name__: ret[func.__name__] for func in self._function_list
+                if func.__name__ in ret}
+
+    def _record(self, name, record):
+        self.timings[name] = record['wall_time']
+        if self.instrumentation is not None:
+            self.instrumentation.add(name, record, category='scoring')
+
+    def _execute_concurrently(self, real_data: Data, synthetic_data: Data):
         ret = {}
-        for func in self._function_list:
-            try:
-                # pdb.set_trace()
-                res = func(real_data, synthetic_data)
-                ret[func.__name__] = res
-            except IncomputableMetricError:
-                pass
+        with EXECUTORS[self.executor](max_workers=self.max_workers) as pool:
+            futures = {pool.submit(measure, func, real_data, synthetic_data): func
+                       for func in self._function_list}
+            for future, func in futures.items():
+                try:
+                    res, record = future.result()
+                    self._record(func.__name__, record)
+                    ret[func.__name__] = res
+                except IncomputableMetricError:
+                    pass
+        return ret
+
+    def _execute_in_processes(self, real_data: Data, synthetic_data: Data):
+        ret = {}
+        waiting = list(self._function_list)
+        # receiving end of the pipe => (function, process, deadline)
+        running = {}
+        try:
+            while waiting or running:
+                while waiting and len(running) < max(self.max_workers, 1):
+                    func = waiting.pop(0)
+                    receiver, sender = Pipe(duplex=False)
+                    process = Process(target=_score_in_process,
+                                      args=(func, real_data, synthetic_data, sender))
+                    process.start()
+                    # lets recv() see EOF when the child dies:
+                    sender.close()
+                    running[receiver] = (func, process, time.monotonic() + self.timeout)
+
+                next_deadline = min(deadline for _, _, deadline in running.values())
+                for receiver in wait(list(running),
+                                     timeout=max(0.0, next_deadline - time.monotonic())):
+                    func, process, _ = running.pop(receiver)
+                    try:
+                        status, value = receiver.recv()
+                    except EOFError:
+                        status, value = 'error', 'the scoring process died'
+                    receiver.close()
+                    _stop(process, EXIT_TIMEOUT)
+                    if status == 'error':
+                        raise RuntimeError(f'Scoring function {func.__name__} failed:\n{value}')
+                    if status == 'result':
+                        res, record = value
+                        self._record(func.__name__, record)
+                        ret[func.__name__] = res
+
+                now = time.monotonic()
+                for receiver, (func, process, deadline) in list(running.items()):
+                    if now >= deadline:
+                        print(f'Warning: scoring function {func.__name__} '
+                              f'timed out after {self.timeout}s')
+                        del running[receiver]
+                        receiver.close()
+                        _stop(process)
+        finally:
+            for receiver, (_, process, _) in running.items():
+                receiver.close()
+                _stop(process)
         return ret
 
 
@@ -55,7 +190,9 @@ class PreprocessHook(Hook):
         ret = real_data
         for func in self._function_list:
             try:
-                ret = func(ret)
+                ret, record = measure(func, ret)
+                if self.instrumentation is not None:
+                    self.instrumentation.add(func.__name__, record, category='preprocessing')
             except IncomputableMetricError:
                 pass
         print("Finished all functions in the preprocess hook")
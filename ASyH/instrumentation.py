@@ -0,0 +1,117 @@
+'''Instrumentation of pipeline runs: wall time, CPU time and peak memory of
+each stage (preprocessing, training, sampling, scoring) and of each hook
+function, exportable as JSON or as a Chrome trace (chrome://tracing,
+https://ui.perfetto.dev) to compare runs.'''
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss() -> Optional[int]:
+    '''Peak resident set size of the calling process so far in bytes, None
+    if unknown.'''
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS:
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _clocks():
+    return time.time(), time.perf_counter(), time.process_time()
+
+
+def _record(clocks) -> dict:
+    '''The record of the time since the _clocks() clocks, see
+    Instrumentation.'''
+    start, wall, cpu = clocks
+    return {'start': start,
+            'wall_time': time.perf_counter() - wall,
+            'cpu_time': time.process_time() - cpu,
+            'peak_rss': peak_rss(),
+            'pid': os.getpid(),
+            'thread': threading.get_ident()}
+
+
+def measure(func, *args):
+    '''Return func(*args) and the record of its wall time, CPU time (of the
+    whole process) and peak RSS, see Instrumentation.'''
+    clocks = _clocks()
+    result = func(*args)
+    return result, _record(clocks)
+
+
+class Instrumentation:
+    '''The records of the stages of a run, each a dict with its name,
+    category ('stage' or the kind of hook function), start (seconds since
+    the epoch), wall_time and cpu_time in seconds, peak_rss in bytes (of the
+    process, up to the end of the stage), and the process and thread it ran
+    in.  The CPU time is the process's, i.e. includes other threads running
+    at the same time.'''
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, name: str, record: dict, category: str = 'stage'):
+        '''Add the record of measure() for name.'''
+        self.records.append({'name': name, 'category': category, **record})
+
+    @contextmanager
+    def stage(self, name: str, category: str = 'stage'):
+        '''Context manager recording the enclosed code as the stage name.'''
+        clocks = _clocks()
+        try:
+            yield
+        finally:
+            self.add(name, _record(clocks), category)
+
+    def wall_times(self, category: str = 'stage') -> Dict[str, float]:
+        '''Wall time by name of the records of category.'''
+        return {record['name']: record['wall_time'] for record in self.records
+                if record['category'] == category}
+
+    def to_dict(self) -> dict:
+        return {'records': list(self.records)}
+
+    def chrome_events(self, pid=None, label: Optional[str] = None) -> list:
+        '''The records as events of the Chrome trace event format, in process
+        pid (default: the one they ran in) named label.'''
+        events = []
+        for record in self.records:
+            events.append({'name': record['name'], 'cat': record['category'], 'ph': 'X',
+                           'ts': record['start'] * 1e6, 'dur': record['wall_time'] * 1e6,
+                           'pid': record['pid'] if pid is None else pid,
+                           'tid': record['thread'],
+                           'args': {'cpu_time': record['cpu_time'],
+                                    'peak_rss': record['peak_rss']}})
+        if label is not None and events:
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': events[0]['pid'],
+                           'args': {'name': label}})
+        return events
+
+
+def write_json(instrumentations: Dict[str, Instrumentation], path):
+    '''Write the records of the runs instrumentations (by label) to the JSON
+    file path.'''
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({label: instrumentation.to_dict()
+                   for label, instrumentation in instrumentations.items()}, f, indent=2)
+
+
+def write_chrome_trace(instrumentations: Dict[str, Instrumentation], path):
+    '''Write the runs instrumentations (by label) to the Chrome trace file
+    path, one process per run.'''
+    events = []
+    for pid, (label, instrumentation) in enumerate(instrumentations.items()):
+        events.extend(instrumentation.chrome_events(pid=pid, label=label))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
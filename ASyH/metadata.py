@@ -21,15 +21,18 @@ class Metadata:
         'Property method for retrieving the \'columns\' entry in the metadata.'
         if self.metadata is None:
             return {}
+        if isinstance(self.metadata, SingleTableMetadata):
+            return self.metadata.columns
         return self.metadata['columns']
     
     def read(self, filename: Union[str, pathlib.Path]):
-        '''Read the metadata from file into the metadata dict.'''
-        table = SingleTableMetadata()
+        '''Read the metadata from file into the metadata dict, checking
+        that SDV can load it.'''
         if pathlib.Path(filename).is_file():
             with open(filename, 'r', encoding='utf-8') as f:
                 dictionary = json.load(f)
-                self.metadata = table.load_from_dict(dictionary)
+            SingleTableMetadata.load_from_dict(dictionary)
+            self.metadata = dictionary
         else:
             raise FileNotFoundError
 
@@ -65,21 +68,19 @@ class Metadata:
     def __init__(self,
                  metadata: Optional[Dict[str, Any]] = None,
                  data: Optional[DataFrame] = None):
-        '''Initialize the Metadata object.'''
+        '''Initialize the Metadata object from the metadata dict (or an SDV
+        SingleTableMetadata or another Metadata), or else detect it from
+        data.'''
+        if isinstance(metadata, Metadata):
+            metadata = metadata.metadata
+        if isinstance(metadata, SingleTableMetadata):
+            metadata = metadata.to_dict()
         if metadata is None and data is not None:
             print("=== Metadata is set from the data. ===\n",
                   "This is a dummy metadata, please save it to a file ",
                   "and edit it to your needs.")
             # Create a dummy metadata from the data
-            metadata = SingleTableMetadata()
-            metadata.detect_from_dataframe(data)
-            # the_metadata = dummy.to_dict()
-            # the_metadata.column_relationships = None  # no column relationships for now
-            self.metadata = metadata
-        else:
-            print("Metadata is set from the argument.")
-            # self.metadata = metadata
-            # initialize empty SDV metadata
-            self.metadata = SingleTableMetadata()
-            # entering debug mode 
-            # import ipdb; ipdb.set_trace()
\ No newline at end of file
+            detected = SingleTableMetadata()
+            detected.detect_from_dataframe(data)
+            metadata = detected.to_dict()
+        self.metadata = metadata
@@ -3,13 +3,20 @@
 from ASyH.metrics.sdv_metrics import adapt_sdv_metric
 
 from ASyH.metrics.anonymity import mean_pairwise_distance, maximum_cosine_similarity
+from ASyH.metrics.privacy import dcr_score, nndr_score
+from ASyH.metrics.quality import quality_score
 
 __all__ = [
     'univariate_statistics',
     'bivariate_statistics',
     'anonymity',
+    'privacy',
+    'quality',
     'sdv_metrics',
     'adapt_sdv_metric',
     'mean_pairwise_distance',
     'maximum_cosine_similarity',
+    'dcr_score',
+    'nndr_score',
+    'quality_score',
 ]
@@ -1,22 +1,106 @@
 '''Metric functions to estimate anonymity of synthetic data.'''
 import math
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 import numpy
 import pandas
-import gower
-
-
-def mean_pairwise_distance(orig_data, synth_data):
-    '''Calculate the minimum Gower\'s distance between original and synthetic
-    data.'''
-    # concat orig_data with synth_data
-    data_union = pandas.concat([orig_data.data, synth_data.data], axis=0)
-    gowers_distance_matrix = gower.gower_matrix(numpy.asarray(data_union))
-    # extract the part in which orig_data is compared with synth_data:
-    orig_size = orig_data.data.shape[0]
-    synth_size = synth_data.data.shape[0]
-    distances = gowers_distance_matrix[:orig_size, synth_size:].flatten()
-    # return the mean over all non-NaN values:
-    return distances[~numpy.isnan(distances)].mean()
+import scipy.sparse
+
+# number of pairs of rows compared at once per worker by the metrics below (a
+# few arrays of this many floats are held in memory per worker):
+BLOCK_SIZE = 2**22
+
+
+def _blocks(n_rows, n_columns, block_rows=None):
+    '''Split the rows of an n_rows x n_columns matrix into blocks (start,
+    stop) of block_rows rows, by default as many as fit into BLOCK_SIZE.'''
+    if block_rows is None:
+        block_rows = max(1, BLOCK_SIZE // max(n_columns, 1))
+    return [(start, min(start + block_rows, n_rows))
+            for start in range(0, n_rows, block_rows)]
+
+
+def _map_blocks(function, blocks, n_jobs):
+    '''Return the list of function(start, stop) for the blocks, computed by
+    n_jobs threads.'''
+    if n_jobs > 1 and len(blocks) > 1:
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            return list(pool.map(lambda block: function(*block), blocks))
+    return [function(*block) for block in blocks]
+
+
+def _gower_features(orig, synth):
+    '''Prepare the data frames orig and synth (with the same columns) for
+    Gower\'s distance like gower.gower_matrix: the numerical columns divided
+    by their maximum, the ranges of these scaled columns, both computed over
+    both tables, and the categorical columns as integer codes (-1 for NaN,
+    which equals nothing, -2 for None, which equals None).'''
+    synth = synth[orig.columns]
+    categorical = [not (pandas.api.types.is_numeric_dtype(orig[col])
+                        and pandas.api.types.is_numeric_dtype(synth[col]))
+                   or pandas.api.types.is_bool_dtype(orig[col])
+                   or pandas.api.types.is_bool_dtype(synth[col])
+                   for col in orig.columns]
+    numerical_vars = [col for col, cat in zip(orig.columns, categorical) if not cat]
+    categorical_vars = [col for col, cat in zip(orig.columns, categorical) if cat]
+
+    values = numpy.concatenate([orig[numerical_vars].to_numpy(dtype=float),
+                                synth[numerical_vars].to_numpy(dtype=float)])
+    with warnings.catch_warnings():  # all-NaN columns
+        warnings.simplefilter('ignore', RuntimeWarning)
+        maxima = numpy.nan_to_num(numpy.nanmax(values.astype(numpy.float32), axis=0))
+        minima = numpy.nan_to_num(numpy.nanmin(values.astype(numpy.float32), axis=0))
+    maxima, minima = maxima.astype(float), minima.astype(float)
+    ranges = numpy.abs(1 - numpy.divide(minima, maxima, out=numpy.ones_like(maxima),
+                                        where=maxima != 0))
+    values = numpy.divide(values, maxima, out=numpy.zeros_like(values), where=maxima != 0)
+
+    codes = numpy.zeros((len(values), len(categorical_vars)), dtype=int)
+    for k, col in enumerate(categorical_vars):
+        column = numpy.concatenate([orig[col].to_numpy(dtype=object),
+                                    synth[col].to_numpy(dtype=object)])
+        codes[:, k] = pandas.factorize(column)[0]
+        codes[numpy.equal(column, None).astype(bool), k] = -2
+    n_orig = len(orig)
+    return values[:n_orig], values[n_orig:], ranges, codes[:n_orig], codes[n_orig:]
+
+
+def _gower_block(start, stop, features):
+    '''Sum and number of the (non-NaN) Gower\'s distances of the original
+    rows start:stop to all synthetic rows.'''
+    numerical_orig, numerical_synt, ranges, categorical_orig, categorical_synt = features
+    total = numpy.zeros((stop - start, len(numerical_synt)))
+    for k in numpy.flatnonzero(ranges):  # constant columns add nothing
+        total += numpy.abs(numerical_orig[start:stop, k, None]
+                           - numerical_synt[None, :, k]) / ranges[k]
+    for k in range(categorical_orig.shape[1]):
+        codes_a = categorical_orig[start:stop, k, None]
+        total += (codes_a != categorical_synt[None, :, k]) | (codes_a == -1)
+    distances = total / (numerical_orig.shape[1] + categorical_orig.shape[1])
+    present = ~numpy.isnan(distances)
+    return distances[present].sum(), present.sum()
+
+
+def mean_pairwise_distance(orig_data, synth_data,
+                           n_jobs: int = 1,
+                           tile_rows: Optional[int] = None):
+    '''Calculate the mean Gower\'s distance between original and synthetic
+    data, over all pairs of an original and a synthetic row (ignoring NaN
+    distances).
+
+    The distances are computed in tiles of tile_rows original rows (default:
+    as many as fit into BLOCK_SIZE distances) by n_jobs threads, without
+    holding the whole distance matrix in memory.'''
+    features = _gower_features(orig_data.data, synth_data.data)
+    n_orig, n_synt = orig_data.data.shape[0], synth_data.data.shape[0]
+    sums = _map_blocks(lambda start, stop: _gower_block(start, stop, features),
+                       _blocks(n_orig, n_synt, tile_rows), n_jobs)
+    total = sum(tile_sum for tile_sum, _ in sums)
+    count = sum(tile_count for _, tile_count in sums)
+    # the mean over all non-NaN values:
+    return total / count if count else numpy.nan
 
 
 def _categorical_inner(a, b):
@@ -70,11 +154,70 @@ def _mixed_cosine(numerical_array_a, categorical_array_a,
     return (numerical_prod + categorical_prod) / (abs_a * abs_b)
 
 
-def maximum_cosine_similarity(orig_data, synth_data):
+def _numerical_features(array):
+    '''Features of the numerical part of rows for the mixed cosine: the
+    values (0 for NaN), their squares and the indicator of non-NaN values.'''
+    array = numpy.asarray(array, dtype=float)
+    present = ~numpy.isnan(array)
+    values = numpy.where(present, array, 0.0)
+    return values, values**2, present.astype(float)
+
+
+def _categorical_features(categorical_orig, categorical_synt):
+    '''Features of the categorical parts of rows of original and synthetic
+    data for the mixed cosine: the sparse one-hot encoding of their values,
+    the indicator of values equal to themselves (i.e. neither None nor NaN)
+    and the indicator of values which are not None, for each of both.'''
+    table = numpy.concatenate([categorical_orig, categorical_synt])
+    not_none = ~numpy.equal(table, None).astype(bool)
+    # NaN and None do not equal anything, they get no code:
+    codes = numpy.column_stack([pandas.factorize(table[:, k])[0]
+                                for k in range(table.shape[1])]
+                               + [numpy.zeros((len(table), 0), dtype=int)])
+    valid = codes >= 0
+    offsets = numpy.cumsum([0] + [codes[:, k].max() + 1 for k in range(codes.shape[1])])
+    rows, cols = numpy.nonzero(valid)
+    onehot = scipy.sparse.csr_matrix(
+        (numpy.ones(len(rows)), (rows, codes[rows, cols] + offsets[cols])),
+        shape=(len(table), offsets[-1]))
+    n_orig = len(categorical_orig)
+    return (onehot[:n_orig], valid[:n_orig].astype(float), not_none[:n_orig].astype(float),
+            onehot[n_orig:], valid[n_orig:].astype(float), not_none[n_orig:].astype(float))
+
+
+def _maximum_cosine_block(start, stop, orig, synt):
+    '''Maximum mixed cosine of the original rows start:stop with all
+    synthetic rows, and the indices of the pair: (cosine, i, j).  orig and
+    synt are the numerical and categorical features of the rows.'''
+    values_a, squares_a, present_a, onehot_a, valid_a, not_none_a = \
+        [feature[start:stop] for feature in orig]
+    values_b, squares_b, present_b, onehot_b, valid_b, not_none_b = synt
+    # inner products and magnitudes, both restricted to the elements specified
+    # in both rows:
+    inner = values_a @ values_b.T + (onehot_a @ onehot_b.T).toarray()
+    abs_a = squares_a @ present_b.T + valid_a @ not_none_b.T
+    abs_b = present_a @ squares_b.T + not_none_a @ valid_b.T
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        cosines = inner / numpy.sqrt(abs_a * abs_b)
+    cosines[numpy.isnan(cosines)] = -numpy.inf
+    i, j = numpy.unravel_index(numpy.argmax(cosines), cosines.shape)
+    return float(cosines[i, j]), int(start + i), int(j)
+
+
+def maximum_cosine_similarity(orig_data, synth_data,
+                              n_jobs: int = 1,
+                              block_size: Optional[int] = None,
+                              return_indices: bool = False):
     '''Find the maximum cosine value between real and synthetic data as a
     measure for maximum entry similarity.  The cosine value is calculated by
     treating the arrays in the function mixed cosine, which augments the concept
     of inner product to arrays of categorical values.
+
+    The cosines are computed as matrix products in blocks of about block_size
+    (default: BLOCK_SIZE) pairs of rows, by n_jobs threads.  Pairs
+    without any element specified in both rows are ignored (NaN if there are
+    only such pairs).  With return_indices, the tuple of the maximum cosine
+    and the row numbers of the original and the synthetic row is returned.
     '''
     # divide datasets into numerical and categorical tables:
     numerical_vars = orig_data.metadata.variables_by_type("numerical")
@@ -82,15 +225,22 @@ def maximum_cosine_similarity(orig_data, synth_data):
     numerical_synt = numpy.array(synth_data.data[numerical_vars])
 
     categorical_vars = orig_data.metadata.variables_by_type("categorical")
-    categorical_orig = numpy.array(orig_data.data[categorical_vars])
-    categorical_synt = numpy.array(synth_data.data[categorical_vars])
-
-    cosines = []
-    for i in range(orig_data.data.shape[0]):
-        for j in range(synth_data.data.shape[0]):
-            # add cosine value for orig_data[i] and synth_data[j] to end of
-            # cosines:
-            cosines.append(
-                _mixed_cosine(numerical_orig[i], categorical_orig[i],
-                              numerical_synt[j], categorical_synt[j]))
-    return max(cosines)
+    categorical_orig = numpy.array(orig_data.data[categorical_vars], dtype=object)
+    categorical_synt = numpy.array(synth_data.data[categorical_vars], dtype=object)
+
+    n_orig, n_synt = len(numerical_orig), len(numerical_synt)
+    if n_orig == 0 or n_synt == 0:
+        raise ValueError('maximum_cosine_similarity: no pairs of rows to compare')
+    categorical = _categorical_features(categorical_orig, categorical_synt)
+    orig = _numerical_features(numerical_orig) + categorical[:3]
+    synt = _numerical_features(numerical_synt) + categorical[3:]
+
+    block_rows = None if block_size is None else max(1, block_size // n_synt)
+    maxima = _map_blocks(lambda start, stop: _maximum_cosine_block(start, stop, orig, synt),
+                         _blocks(n_orig, n_synt, block_rows), n_jobs)
+    cosine, i, j = max(maxima, key=lambda maximum: maximum[0])
+    if cosine == -numpy.inf:
+        cosine, i, j = numpy.nan, None, None
+    if return_indices:
+        return cosine, i, j
+    return cosine
@@ -1,8 +1,16 @@
-import math
+import re
 import scipy.stats
 import numpy
+import sklearn
 import sklearn.decomposition
 
+from ASyH.metrics.real_statistics import real_statistics
+
+# scikit-learn >= 1.5 fixes the sign of a principal component by its largest
+# entry, older versions by the sample with the largest projection on it:
+_version = re.match(r'(\d+)\.(\d+)', sklearn.__version__)
+SIGN_BY_COMPONENT = (int(_version[1]), int(_version[2])) >= (1, 5)
+
 
 # pairwise application of bivariate function:
 def pairwise(func, dataframe, list_of_variables=None):
@@ -21,6 +29,33 @@ def pairwise(func, dataframe, list_of_variables=None):
     return returnval
 
 
+def pairwise_matrix(matrix_fn, dataframe, list_of_variables=None):
+    '''Like pairwise(), for matrix_fn calculating the results for all pairs
+    of columns of a 2d array at once, as an array with the result for columns
+    i and j at [i, j].  Return the array and the list of variables.'''
+    if not list_of_variables:
+        list_of_variables = list(dataframe.columns)
+    values = numpy.asarray(dataframe.loc[:, list_of_variables], dtype=float)
+    return matrix_fn(values), list_of_variables
+
+
+def matrix_comparison(real_data, synthetic_data, matrix_fn, comparison_fn):
+    '''Like comparison(), for matrix_fn calculating the results for all pairs
+    of columns at once (see pairwise_matrix()) and comparison_fn comparing
+    arrays of results elementwise.  The results for the real data are kept in
+    its RealStatistics.'''
+    returnval = {}
+    variables = real_data.metadata.variables_by_type("numerical")
+    if len(variables) > 1:
+        real_vals = real_statistics(real_data).matrix(matrix_fn, variables)
+        synth_vals, _ = pairwise_matrix(matrix_fn, synthetic_data.data, variables)
+        compared = comparison_fn(real_vals, synth_vals)
+        for i, first_var in enumerate(variables):
+            for j in range(i + 1, len(variables)):
+                returnval[f'({first_var}, {variables[j]})'] = compared[i, j]
+    return returnval
+
+
 def comparison(real_data, synthetic_data, calculating_fn, comparison_fn):
     '''Template function for comparing bivariate functions applied on each pair
     of numerical variables in the dataframes of real_data and synthetic_data.
@@ -51,6 +86,49 @@ def cosine_comparator(vec_a, vec_b):
     return scalar_product / (abs_a*abs_b)
 
 
+def cosine_comparator_rows(vecs_a, vecs_b):
+    '''Calculate cosines between the vectors along the last axis of the arrays
+    vecs_a and vecs_b.'''
+    scalar_products = numpy.sum(vecs_a * vecs_b, axis=-1)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return scalar_products / (numpy.linalg.norm(vecs_a, axis=-1)
+                                  * numpy.linalg.norm(vecs_b, axis=-1))
+
+
+def first_principal_components(values):
+    '''First principal components of all pairs of columns of the 2d array
+    values, as array of shape (columns, columns, 2), like
+    principal_components() but from the closed-form eigenvectors of the 2x2
+    covariance matrices.'''
+    centered = values - values.mean(axis=0)
+    covariance = centered.T @ centered
+    variances = numpy.diag(covariance)
+    var_a, var_b = variances[:, None], variances[None, :]
+    # largest eigenvalue of [[var_a, cov], [cov, var_b]] and its eigenvector,
+    # taking the more accurate of the two formulas:
+    half_diff = (var_a - var_b) / 2
+    eigenvalue = (var_a + var_b) / 2 + numpy.hypot(half_diff, covariance)
+    first = numpy.stack([eigenvalue - var_b, covariance], axis=-1)
+    second = numpy.stack([covariance, eigenvalue - var_a], axis=-1)
+    components = numpy.where((half_diff >= 0)[..., None], first, second)
+    norms = numpy.linalg.norm(components, axis=-1, keepdims=True)
+    components = numpy.where(norms == 0,
+                             numpy.array([1.0, 0.0]),  # uncorrelated, equal variances
+                             components / numpy.where(norms == 0, 1.0, norms))
+
+    if SIGN_BY_COMPONENT:
+        largest = numpy.argmax(numpy.abs(components), axis=-1)[..., None]
+        signs = numpy.sign(numpy.take_along_axis(components, largest, axis=-1))
+    else:
+        signs = numpy.ones(components.shape[:2] + (1,))
+        for i in range(values.shape[1]):
+            projections = centered[:, i, None] * components[i, :, 0] \
+                + centered * components[i, :, 1]
+            largest = numpy.argmax(numpy.abs(projections), axis=0)
+            signs[i, :, 0] = numpy.sign(projections[largest, numpy.arange(values.shape[1])])
+    return components * numpy.where(signs == 0, 1.0, signs)
+
+
 def principal_components(column_a, column_b):
     '''Bivariate principal component calculation using scikit-learn.'''
     data = [[column_a[i], column_b[i]] for i in range(len(column_a))]
@@ -62,8 +140,8 @@ def principal_components(column_a, column_b):
 def pc_comparison(real_data, synthetic_data):
     '''Calculate cosines of first principal components of each pair of numerical
     values in real_data and synthetic_data.'''
-    return comparison(real_data,
-                      synthetic_data, principal_components, cosine_comparator)
+    return matrix_comparison(real_data, synthetic_data,
+                             first_principal_components, cosine_comparator_rows)
 
 
 def pearson_correlation(column_a, column_b):
@@ -75,12 +153,47 @@ def pearson_correlation(column_a, column_b):
     return r
 
 
+def _significant(r, p):
+    '''The correlations r where their p-values are at most 0.05, else 0.'''
+    return numpy.where(p > 0.05, 0.0, r)
+
+
+def pearson_correlations(values):
+    '''Pearson\'s correlations between all pairs of columns of the 2d array
+    values like pearson_correlation(), from a single correlation matrix.'''
+    n = values.shape[0]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        r = numpy.clip(numpy.corrcoef(values, rowvar=False), -1.0, 1.0)
+    # two-sided p-values of scipy.stats.pearsonr:
+    ab = n / 2 - 1
+    p = 2 * scipy.stats.beta.cdf(-numpy.abs(r), ab, ab, loc=-1, scale=2)
+    return _significant(r, p)
+
+
+def spearman_correlations(values):
+    '''Spearman\'s correlations between all pairs of columns of the 2d array
+    values like spearman_correlation(), from a single rank transformation.'''
+    ranks = scipy.stats.rankdata(values, axis=0)
+    ranks[:, numpy.isnan(values).any(axis=0)] = numpy.nan
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        r = numpy.corrcoef(ranks, rowvar=False)
+        # two-sided p-values of scipy.stats.spearmanr:
+        dof = values.shape[0] - 2
+        t = r * numpy.sqrt((dof / ((r + 1.0) * (1.0 - r))).clip(0))
+    p = 2 * scipy.stats.t.sf(numpy.abs(t), dof)
+    return _significant(r, p)
+
+
+def relative_difference(x, y):
+    '''Elementwise |x - y| / x, or |x - y| where x is 0.'''
+    return numpy.abs(x - y) / numpy.where(x != 0, x, 1)
+
+
 def pearsonr_comparison(real_data, synthetic_data):
     '''Calculate diffences in Pearson\'s Correlation of each pair of numerical
     values in real_data and synthetic_data.'''
-    return comparison(real_data, synthetic_data,
-                      pearson_correlation,
-                      lambda x, y: math.fabs(x-y)/(1, x)[x != 0])
+    return matrix_comparison(real_data, synthetic_data,
+                             pearson_correlations, relative_difference)
 
 
 def spearman_correlation(column_a, column_b):
@@ -95,6 +208,21 @@ def spearman_correlation(column_a, column_b):
 def spearmanr_comparison(real_data, synthetic_data):
     '''Calculate differences in Spearman\'s correlation of each pair of
     numerical values in real_data and synthetic_data'''
-    return comparison(real_data, synthetic_data,
-                      spearman_correlation,
-                      lambda x, y: math.fabs(x-y)/(1, x)[x != 0])
+    return matrix_comparison(real_data, synthetic_data,
+                             spearman_correlations, relative_difference)
+
+
+def _precompute_matrix(matrix_fn):
+    '''Function computing the results of matrix_fn for the real data, like
+    matrix_comparison().'''
+    def precompute(real_data):
+        variables = real_data.metadata.variables_by_type("numerical")
+        if len(variables) > 1:
+            real_statistics(real_data).matrix(matrix_fn, variables)
+    return precompute
+
+
+# the statistics of the real data they use (see ASyH.metrics.real_statistics):
+pc_comparison.precompute = _precompute_matrix(first_principal_components)
+pearsonr_comparison.precompute = _precompute_matrix(pearson_correlations)
+spearmanr_comparison.precompute = _precompute_matrix(spearman_correlations)
@@ -0,0 +1,159 @@
+'''Nearest-neighbour privacy metrics: distance to closest record (DCR) and
+nearest-neighbour distance ratio (NNDR) of synthetic rows.
+
+The rows are encoded as points using the metadata: numerical and datetime
+columns scaled to [0, 1] by the range of the real data (with an indicator
+column for missing values), categorical and boolean columns one-hot encoded
+such that different categories are at distance 1.  A KD-tree (or ball tree)
+is built once over the real rows and queried for the synthetic rows in
+batches.'''
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy
+import pandas
+from sklearn.neighbors import BallTree, KDTree
+
+from ASyH.data import Data
+from ASyH.utils import fingerprint
+
+# number of synthetic rows per query batch:
+BATCH_ROWS = 10000
+# synthetic rows closer to a real row than this quantile of the distances of
+# real rows to their nearest other real row count as privacy risks:
+DCR_QUANTILE = 0.05
+
+TREES = {'kd_tree': KDTree, 'ball_tree': BallTree}
+
+
+class RealRowIndex:
+    '''Spatial index over the rows of real_data for nearest-neighbour queries
+    of other rows of the same table.'''
+
+    def __init__(self, real_data: Data, algorithm: str = 'kd_tree', leaf_size: int = 40):
+        assert algorithm in TREES, f'Unknown algorithm {algorithm} specified'
+        metadata = real_data.metadata
+        frame = real_data.data
+        self._numerical = [col for sdtype in ('numerical', 'datetime')
+                           for col in metadata.variables_by_type(sdtype)
+                           if col in frame.columns]
+        self._categorical = [col for sdtype in ('categorical', 'boolean')
+                             for col in metadata.variables_by_type(sdtype)
+                             if col in frame.columns]
+        values = self._numerical_values(frame)
+        with warnings.catch_warnings():  # all-NaN columns
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self._minima = numpy.nan_to_num(numpy.nanmin(values, axis=0))
+            ranges = numpy.nanmax(values, axis=0) - self._minima
+        self._ranges = numpy.where(ranges > 0, ranges, 1.0)
+        self._categories = [pandas.Index(frame[col].unique()) for col in self._categorical]
+        self.points = self.encode(real_data)
+        self.tree = TREES[algorithm](self.points, leaf_size=leaf_size)
+        self._nearest_other = None
+
+    def _numerical_values(self, frame):
+        '''The numerical and datetime columns of frame as float array, the
+        datetimes in seconds.'''
+        columns = []
+        for col in self._numerical:
+            if pandas.api.types.is_numeric_dtype(frame[col]):
+                columns.append(frame[col].to_numpy(dtype=float, na_value=numpy.nan))
+            else:
+                times = pandas.to_datetime(frame[col], errors='coerce')
+                columns.append((times - pandas.Timestamp(0)).dt.total_seconds().to_numpy())
+        return numpy.column_stack(columns + [numpy.zeros((len(frame), 0))])
+
+    def encode(self, data: Data) -> numpy.ndarray:
+        '''Encode the rows of data (with the columns of the real data) as
+        points.'''
+        frame = data.data
+        scaled = (self._numerical_values(frame) - self._minima) / self._ranges
+        missing = numpy.isnan(scaled)
+        parts = [numpy.where(missing, 0.0, scaled), missing.astype(float)]
+        for col, categories in zip(self._categorical, self._categories):
+            codes = categories.get_indexer(frame[col])
+            onehot = numpy.zeros((len(frame), len(categories)))
+            known = codes >= 0  # categories not in the real data stay 0
+            onehot[numpy.flatnonzero(known), codes[known]] = numpy.sqrt(0.5)
+            parts.append(onehot)
+        return numpy.column_stack(parts)
+
+    def query(self, data: Data, k: int = 1, n_jobs: int = 1,
+              batch_rows: Optional[int] = None):
+        '''Return the distances and the indices of the k nearest real rows
+        of each row of data, as arrays of shape (rows, k).  The rows are
+        queried in batches of batch_rows (default: BATCH_ROWS) by n_jobs
+        threads.'''
+        return self._query_points(self.encode(data), k, n_jobs, batch_rows)
+
+    def _query_points(self, points, k, n_jobs=1, batch_rows=None):
+        if batch_rows is None:
+            batch_rows = BATCH_ROWS
+        batches = [points[start:start + batch_rows]
+                   for start in range(0, len(points), batch_rows)]
+        if n_jobs > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                results = list(pool.map(lambda batch: self.tree.query(batch, k=k), batches))
+        else:
+            results = [self.tree.query(batch, k=k) for batch in batches]
+        if not results:
+            return numpy.zeros((0, k)), numpy.zeros((0, k), dtype=int)
+        return (numpy.concatenate([distances for distances, _ in results]),
+                numpy.concatenate([indices for _, indices in results]))
+
+    def nearest_other_distances(self) -> numpy.ndarray:
+        '''Distance of each real row to its nearest other real row, computed
+        on first use.'''
+        if self._nearest_other is None:
+            distances, _ = self._query_points(self.points, k=2)
+            self._nearest_other = distances[:, 1]
+        return self._nearest_other
+
+
+# the index of the real data of the last call, by fingerprint of the data and
+# its metadata:
+_last_index = {}
+
+
+def real_row_index(real_data: Data) -> RealRowIndex:
+    '''Return the RealRowIndex of real_data, reusing the one of the last
+    call for the same data.'''
+    key = (fingerprint(real_data), repr(real_data.metadata.columns))
+    if key not in _last_index:
+        _last_index.clear()
+        _last_index[key] = RealRowIndex(real_data)
+    return _last_index[key]
+
+
+def distance_to_closest_record(real_data: Data, synth_data: Data,
+                               n_jobs: int = 1) -> numpy.ndarray:
+    '''Distance of each synthetic row to the closest real row.'''
+    distances, _ = real_row_index(real_data).query(synth_data, k=1, n_jobs=n_jobs)
+    return distances[:, 0]
+
+
+def nearest_neighbour_distance_ratio(real_data: Data, synth_data: Data,
+                                     n_jobs: int = 1) -> numpy.ndarray:
+    '''Ratio of the distances of each synthetic row to its closest and its
+    second closest real row, in [0, 1] (1 for rows equally far from both).
+    Small ratios mark synthetic rows close to a single real row.'''
+    distances, _ = real_row_index(real_data).query(synth_data, k=2, n_jobs=n_jobs)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ratios = distances[:, 0] / distances[:, 1]
+    return numpy.where(distances[:, 1] > 0, ratios, 1.0)
+
+
+def dcr_score(real_data: Data, synth_data: Data) -> float:
+    '''Scoring function: the share of synthetic rows which are farther from
+    the closest real row than the DCR_QUANTILE quantile of the distances of
+    the real rows to their nearest other real row.'''
+    real_distances = real_row_index(real_data).nearest_other_distances()
+    threshold = numpy.quantile(real_distances, DCR_QUANTILE)
+    return float(numpy.mean(distance_to_closest_record(real_data, synth_data) > threshold))
+
+
+def nndr_score(real_data: Data, synth_data: Data) -> float:
+    '''Scoring function: the median nearest-neighbour distance ratio of the
+    synthetic rows.'''
+    return float(numpy.median(nearest_neighbour_distance_ratio(real_data, synth_data)))
@@ -0,0 +1,318 @@
+'''ASyH's quality score: the properties Column Shapes and Column Pair Trends
+of the SDMetrics quality report, computed with batched numpy operations.
+
+Column Shapes compares each column's distribution: KSComplement (1 - the
+Kolmogorov-Smirnov statistic) for numerical and datetime columns,
+TVComplement (1 - the total variation distance of the category
+frequencies) for categorical and boolean ones.  Column Pair Trends compares
+each pair of columns: the correlation similarity (1 - |difference of
+Pearson's correlations| / 2) of pairs of numerical or datetime columns, the
+contingency similarity (1 - the total variation distance of the contingency
+tables) of all other pairs, with numerical and datetime columns binned into
+the 10 bins of their own table's histogram, like SDMetrics 0.13 does.
+Missing values are left out of the KS statistics and correlations and are a
+category of their own otherwise (of continuous columns, shared with their
+maximum).
+
+The real side (sorted columns, category codes, correlation matrix,
+contingency tables) is kept in the RealStatistics of the real data, see
+ASyH.metrics.real_statistics.'''
+import warnings
+
+import numpy
+import pandas
+
+from ASyH.data import Data
+from ASyH.metrics.real_statistics import numeric_values, real_statistics
+
+CONTINUOUS_SDTYPES = ('numerical', 'datetime')
+DISCRETE_SDTYPES = ('categorical', 'boolean')
+# number of bins of continuous columns in contingency tables:
+NUM_BINS = 10
+# number of codes (row x column pair) counted at once:
+BLOCK_SIZE = 2**22
+# pairs with larger contingency tables are counted sparsely:
+MAX_PAIR_CELLS = 2**16
+
+
+def _columns(data: Data, sdtypes):
+    return [col for col, typeinfo in data.metadata.columns.items()
+            if typeinfo['sdtype'] in sdtypes and col in data.data.columns]
+
+
+def _real_numeric(real_data: Data, column) -> numpy.ndarray:
+    return real_statistics(real_data).numeric_values(column)
+
+
+def _encoding(real_data: Data, column) -> pandas.Index:
+    '''The categories of the real data (missing values included), by which
+    a discrete column is encoded as integer codes.'''
+    def compute():
+        codes, categories = pandas.factorize(real_data.data[column], use_na_sentinel=False)
+        return pandas.Index(categories)
+    return real_statistics(real_data).get(('quality_encoding', column), compute)
+
+
+def _codes(real_data: Data, data: Data, column):
+    '''Integer codes of the values of column of data and their number:
+    categories of the real data, with one code for all others, or histogram
+    bins.'''
+    if real_data.metadata.columns[column]['sdtype'] in CONTINUOUS_SDTYPES:
+        # as in SDMetrics, the closed bins of the histogram of data: the
+        # maximum and NaN both get the code behind the last bin:
+        values = numeric_values(data, column)
+        edges = numpy.histogram_bin_edges(values[~numpy.isnan(values)], bins=NUM_BINS)
+        return numpy.digitize(values, edges), len(edges) + 1
+    encoding = _encoding(real_data, column)
+    values = data.data[column]
+    codes = encoding.get_indexer(values)
+    # all missing values are one category, like in pandas.factorize():
+    codes[pandas.isna(values).to_numpy()] = encoding.get_indexer([numpy.nan])[0]
+    codes[codes < 0] = len(encoding)
+    return codes, len(encoding) + 1
+
+
+def _real_codes(real_data: Data, column):
+    return real_statistics(real_data).get(('quality_codes', column),
+                                          lambda: _codes(real_data, real_data, column))
+
+
+def _real_sorted(real_data: Data, column) -> numpy.ndarray:
+    '''The sorted values of column without the missing ones, a view of the
+    RealStatistics' sorted_values.'''
+    values = real_statistics(real_data).sorted_values(column)
+    # NaN is sorted last:
+    return values[:len(values) - numpy.count_nonzero(numpy.isnan(values))]
+
+
+def _real_frequencies(real_data: Data, column) -> numpy.ndarray:
+    def compute():
+        codes, n_codes = _real_codes(real_data, column)
+        return numpy.bincount(codes, minlength=n_codes) / max(len(codes), 1)
+    return real_statistics(real_data).get(('quality_frequencies', column), compute)
+
+
+def ks_complements(real_data: Data, synthetic_data: Data) -> dict:
+    '''KSComplement of each numerical and datetime column, nan for columns
+    without values.'''
+    scores = {}
+    for column in _columns(real_data, CONTINUOUS_SDTYPES):
+        real = _real_sorted(real_data, column)
+        synth = numpy.sort(numeric_values(synthetic_data, column))
+        synth = synth[~numpy.isnan(synth)]
+        if len(real) == 0 or len(synth) == 0:
+            scores[column] = numpy.nan
+            continue
+        # the empirical distribution functions at all values:
+        points = numpy.concatenate([real, synth])
+        difference = (numpy.searchsorted(real, points, side='right') / len(real)
+                      - numpy.searchsorted(synth, points, side='right') / len(synth))
+        scores[column] = 1.0 - numpy.abs(difference).max()
+    return scores
+
+
+def tv_complements(real_data: Data, synthetic_data: Data) -> dict:
+    '''TVComplement of each categorical and boolean column.'''
+    scores = {}
+    for column in _columns(real_data, DISCRETE_SDTYPES):
+        real = _real_frequencies(real_data, column)
+        codes, n_codes = _codes(real_data, synthetic_data, column)
+        synth = numpy.bincount(codes, minlength=n_codes) / max(len(codes), 1)
+        scores[column] = 1.0 - 0.5 * numpy.abs(real - synth).sum()
+    return scores
+
+
+def column_shapes(real_data: Data, synthetic_data: Data) -> dict:
+    '''Column Shapes scores of all columns.'''
+    scores = ks_complements(real_data, synthetic_data)
+    scores.update(tv_complements(real_data, synthetic_data))
+    return {column: scores[column] for column in real_data.metadata.columns
+            if column in scores}
+
+
+def pairwise_pearson(values: numpy.ndarray) -> numpy.ndarray:
+    '''Pearson's correlations between all pairs of columns of the 2d array
+    values, each from the rows where both are not NaN.'''
+    present = ~numpy.isnan(values)
+    with warnings.catch_warnings():  # all-NaN columns
+        warnings.simplefilter('ignore', RuntimeWarning)
+        centered = numpy.where(present, values - numpy.nanmean(values, axis=0), 0.0)
+    mask = present.astype(float)
+    counts = mask.T @ mask
+    sums = centered.T @ mask  # [i, j]: sum of column i where j is present
+    squares = (centered ** 2).T @ mask
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        covariance = centered.T @ centered - sums * sums.T / counts
+        variances = squares - sums ** 2 / counts
+        correlation = covariance / numpy.sqrt(variances * variances.T)
+    # constant columns have no correlation:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        constant = ~(numpy.nanmax(values, axis=0) > numpy.nanmin(values, axis=0))
+    correlation[constant, :] = numpy.nan
+    correlation[:, constant] = numpy.nan
+    correlation[~(variances * variances.T > 0)] = numpy.nan
+    return numpy.clip(correlation, -1.0, 1.0)
+
+
+def _real_correlations(real_data: Data, columns) -> numpy.ndarray:
+    return real_statistics(real_data).get(
+        ('quality_correlations', tuple(columns)),
+        lambda: pairwise_pearson(numpy.column_stack(
+            [_real_numeric(real_data, column) for column in columns])))
+
+
+def correlation_similarities(real_data: Data, synthetic_data: Data) -> dict:
+    '''Correlation similarity of each pair of numerical and datetime
+    columns.'''
+    columns = _columns(real_data, CONTINUOUS_SDTYPES)
+    if len(columns) < 2:
+        return {}
+    real = _real_correlations(real_data, columns)
+    synth = pairwise_pearson(numpy.column_stack(
+        [numeric_values(synthetic_data, column) for column in columns]))
+    similarity = 1.0 - numpy.abs(real - synth) / 2
+    return {f'({first}, {columns[j]})': similarity[i, j]
+            for i, first in enumerate(columns) for j in range(i + 1, len(columns))}
+
+
+def _contingency_blocks(real_data: Data, columns, continuous):
+    '''Blocks (first column, list of second columns) of the pairs of columns
+    with at least one not in continuous whose contingency tables are counted
+    together.'''
+    n_rows = max(len(real_data.data), 1)
+    blocks = []
+    for i, first in enumerate(columns):
+        n_first = _real_codes(real_data, first)[1]
+        block, cells = [], 0
+        for second in columns[i + 1:]:
+            if first in continuous and second in continuous:
+                continue
+            pair_cells = n_first * _real_codes(real_data, second)[1]
+            if pair_cells > MAX_PAIR_CELLS:
+                blocks.append((first, [second]))
+                continue
+            if block and (cells + pair_cells > BLOCK_SIZE
+                          or n_rows * (len(block) + 1) > BLOCK_SIZE):
+                blocks.append((first, block))
+                block, cells = [], 0
+            block.append(second)
+            cells += pair_cells
+        if block:
+            blocks.append((first, block))
+    return blocks
+
+
+def _contingency_tables(first, seconds):
+    '''Relative frequencies of the contingency tables of the codes first
+    and each of the list seconds (all as (codes, number of codes)),
+    concatenated, and the offsets of the single tables.'''
+    codes, n_codes = first
+    n_seconds = numpy.array([n_second for _, n_second in seconds])
+    offsets = numpy.concatenate([[0], numpy.cumsum(n_codes * n_seconds)])
+    # one row per pair:
+    cells = numpy.vstack([second for second, _ in seconds])
+    cells += codes * n_seconds[:, None] + offsets[:-1, None]
+    counts = numpy.bincount(cells.ravel(), minlength=offsets[-1])
+    return counts / max(len(codes), 1), offsets
+
+
+def _sparse_contingency_table(first, second):
+    '''The occurring cells of the contingency table of the codes first and
+    second (as (codes, number of codes)) and their relative frequencies.'''
+    cells, counts = numpy.unique(first[0] * second[1] + second[0], return_counts=True)
+    return cells, counts / max(len(first[0]), 1)
+
+
+def _sparse_variation(real, synth):
+    '''Total variation distance of the sparse contingency tables real and
+    synth.'''
+    cells = numpy.union1d(real[0], synth[0])
+    frequencies = numpy.zeros((2, len(cells)))
+    frequencies[0, numpy.searchsorted(cells, real[0])] = real[1]
+    frequencies[1, numpy.searchsorted(cells, synth[0])] = synth[1]
+    return 0.5 * numpy.abs(frequencies[0] - frequencies[1]).sum()
+
+
+def _real_contingency_tables(real_data: Data, first, seconds):
+    '''The contingency tables of the real data of the block (first,
+    seconds), see _contingency_blocks(): sparse for a single pair with too
+    many cells.'''
+    first_codes = _real_codes(real_data, first)
+    second_codes = [_real_codes(real_data, second) for second in seconds]
+    if first_codes[1] * second_codes[0][1] > MAX_PAIR_CELLS:
+        return real_statistics(real_data).get(
+            ('quality_contingency', first, seconds[0]),
+            lambda: _sparse_contingency_table(first_codes, second_codes[0]))
+    return real_statistics(real_data).get(
+        ('quality_contingency', first, tuple(seconds)),
+        lambda: _contingency_tables(first_codes, second_codes))
+
+
+def contingency_similarities(real_data: Data, synthetic_data: Data) -> dict:
+    '''Contingency similarity of each pair of columns with at least one
+    categorical or boolean column.'''
+    columns = _columns(real_data, CONTINUOUS_SDTYPES + DISCRETE_SDTYPES)
+    continuous = set(_columns(real_data, CONTINUOUS_SDTYPES))
+    synth_codes = {column: _codes(real_data, synthetic_data, column) for column in columns}
+    scores = {}
+    for first, seconds in _contingency_blocks(real_data, columns, continuous):
+        real = _real_contingency_tables(real_data, first, seconds)
+        if synth_codes[first][1] * synth_codes[seconds[0]][1] > MAX_PAIR_CELLS:
+            second = seconds[0]
+            synth = _sparse_contingency_table(synth_codes[first], synth_codes[second])
+            scores[f'({first}, {second})'] = 1.0 - _sparse_variation(real, synth)
+            continue
+        real, offsets = real
+        synth, _ = _contingency_tables(synth_codes[first],
+                                       [synth_codes[second] for second in seconds])
+        variations = numpy.add.reduceat(numpy.abs(real - synth), offsets[:-1]) / 2
+        for second, variation in zip(seconds, variations):
+            scores[f'({first}, {second})'] = 1.0 - variation
+    return scores
+
+
+def column_pair_trends(real_data: Data, synthetic_data: Data) -> dict:
+    '''Column Pair Trends scores of all pairs of columns.'''
+    scores = correlation_similarities(real_data, synthetic_data)
+    scores.update(contingency_similarities(real_data, synthetic_data))
+    columns = _columns(real_data, CONTINUOUS_SDTYPES + DISCRETE_SDTYPES)
+    return {key: scores[key]
+            for key in (f'({first}, {columns[j]})'
+                        for i, first in enumerate(columns) for j in range(i + 1, len(columns)))
+            if key in scores}
+
+
+def precompute(real_data: Data):
+    '''Compute the statistics of real_data used by quality_score().'''
+    for column in _columns(real_data, CONTINUOUS_SDTYPES):
+        _real_sorted(real_data, column)
+    for column in _columns(real_data, DISCRETE_SDTYPES):
+        _real_frequencies(real_data, column)
+    continuous = _columns(real_data, CONTINUOUS_SDTYPES)
+    if len(continuous) > 1:
+        _real_correlations(real_data, continuous)
+    columns = _columns(real_data, CONTINUOUS_SDTYPES + DISCRETE_SDTYPES)
+    for first, seconds in _contingency_blocks(real_data, columns, set(continuous)):
+        _real_contingency_tables(real_data, first, seconds)
+
+
+def _mean(scores: dict) -> float:
+    values = numpy.array(list(scores.values()), dtype=float)
+    values = values[~numpy.isnan(values)]
+    return float(values.mean()) if len(values) else numpy.nan
+
+
+def quality_properties(real_data: Data, synthetic_data: Data) -> dict:
+    '''Scores of the properties Column Shapes and Column Pair Trends.'''
+    return {'Column Shapes': _mean(column_shapes(real_data, synthetic_data)),
+            'Column Pair Trends': _mean(column_pair_trends(real_data, synthetic_data))}
+
+
+def quality_score(real_data: Data, synthetic_data: Data) -> float:
+    '''Scoring function: overall quality score like the one of the SDMetrics
+    quality report, the mean of the property scores.'''
+    return _mean(quality_properties(real_data, synthetic_data))
+
+
+quality_score.precompute = precompute
@@ -0,0 +1,85 @@
+'''Statistics of the real table, shared by the scoring functions.
+
+All pipelines compare their synthetic data with the same real table, so the
+real side of the comparisons is computed once: a RealStatistics object kept
+in the cache of the real ASyH.data.Data computes each statistic on first use
+and returns the stored result afterwards.
+
+A scoring function may have an attribute precompute, a function of the real
+Data computing the statistics the scoring function uses.  The Application
+calls it for the registered scoring functions before the pipelines are
+dispatched, so that the statistics are handed to all of them with the data;
+statistics no scoring function uses are not computed.'''
+import collections
+from typing import Callable, Optional, Sequence
+
+import numpy
+import pandas
+
+from ASyH.data import Data
+
+
+def numeric_values(data: Data, column) -> numpy.ndarray:
+    '''The values of the numerical or datetime column of data as floats, the
+    datetimes in seconds; missing or unparsable values are NaN.'''
+    values = data.data[column]
+    if pandas.api.types.is_bool_dtype(values) or pandas.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float, na_value=numpy.nan)
+    datetime_format = data.metadata.columns[column].get('datetime_format')
+    times = pandas.to_datetime(values, format=datetime_format, errors='coerce')
+    return (times - pandas.Timestamp(0)).dt.total_seconds().to_numpy(dtype=float)
+
+
+class RealStatistics:
+    '''Lazily computed statistics of the table of real_data, stored in the
+    dict results (by default, in the cache of real_data).'''
+
+    def __init__(self, real_data: Data, results: Optional[dict] = None):
+        self._real_data = real_data
+        self._results = results if results is not None else {}
+
+    def get(self, key, compute: Callable[[], object]):
+        '''Return the statistic stored under key, computing it with compute()
+        first if needed.'''
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+    def numeric_values(self, column) -> numpy.ndarray:
+        '''The values of column as floats, see numeric_values().'''
+        return self.get(('numeric_values', column),
+                        lambda: numeric_values(self._real_data, column))
+
+    def sorted_values(self, column) -> numpy.ndarray:
+        '''The values of column as floats (see numeric_values()), sorted, the
+        missing values last.'''
+        return self.get(('sorted_values', column),
+                        lambda: numpy.sort(numeric_values(self._real_data, column)))
+
+    def category_counts(self, column) -> dict:
+        '''Number of occurrences of each category of column.'''
+        return self.get(('category_counts', column),
+                        lambda: dict(collections.Counter(
+                            numpy.array(self._real_data.data.loc[:, column]))))
+
+    def matrix(self, matrix_fn, variables: Sequence[str]) -> numpy.ndarray:
+        '''Result of matrix_fn (see ASyH.metrics.bivariate_statistics) for all
+        pairs of the columns variables.'''
+        def compute():
+            values = numpy.asarray(self._real_data.data.loc[:, list(variables)], dtype=float)
+            return matrix_fn(values)
+        return self.get(('matrix', matrix_fn, tuple(variables)), compute)
+
+
+def real_statistics(real_data: Data) -> RealStatistics:
+    '''Return the RealStatistics of real_data, with the results kept in its
+    cache.'''
+    return RealStatistics(real_data, real_data.cache.setdefault('real_statistics', {}))
+
+
+def precompute(real_data: Data, scoring_functions):
+    '''Compute the statistics of real_data used by scoring_functions, i.e.
+    call the precompute attribute of those which have one.'''
+    for scoring_function in scoring_functions:
+        if getattr(scoring_function, 'precompute', None) is not None:
+            scoring_function.precompute(real_data)
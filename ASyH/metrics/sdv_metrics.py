@@ -2,7 +2,7 @@
 from typing import Type
 
 from sdmetrics.single_table import SingleTableMetric
-from ASyH import Data
+from ASyH.data import Data
 
 
 def adapt_sdv_metric(sdv_metric_class: Type[SingleTableMetric]):
@@ -3,14 +3,17 @@ import collections
 import numpy
 import sdv.metrics
 
+from ASyH.metrics.real_statistics import real_statistics
+
 
 def kstest(real_data, synthetic_data):
     '''Calculate p-values for all numerical variables in input data.'''
     numerical_variables = \
         real_data.metadata.variables_by_type("numerical")
+    statistics = real_statistics(real_data)
     return [
         scipy.stats.kstest(
-            numpy.array(real_data.data.loc[:, col].values),
+            statistics.sorted_values(col),
             numpy.array(synthetic_data.data.loc[:, col].values)
         ).pvalue
         for col in numerical_variables]
@@ -21,8 +24,7 @@ def cstest(real_data, synthetic_data):
     categorical_variables = \
         real_data.metadata.variables_by_type("categorical")
 
-    def frequencies_ordered(data, var):
-        freqs = dict(collections.Counter(numpy.array(data.data.loc[:, var])))
+    def frequencies_ordered(freqs):
         return [freqs[cat] for cat in sorted(freqs.keys())]
 
     def average(value_list):
@@ -30,8 +32,9 @@ def cstest(real_data, synthetic_data):
 
     results = {}
     for var in categorical_variables:
-        real_freqs = frequencies_ordered(real_data, var)
-        synth_freqs = frequencies_ordered(synthetic_data, var)
+        real_freqs = frequencies_ordered(real_statistics(real_data).category_counts(var))
+        synth_freqs = frequencies_ordered(
+            dict(collections.Counter(numpy.array(synthetic_data.data.loc[:, var]))))
         results[var] = \
             scipy.stats.chisquare(real_freqs, synth_freqs).pvalue
 
@@ -39,6 +42,23 @@ def cstest(real_data, synthetic_data):
     return results
 
 
+def _precompute_kstest(real_data):
+    statistics = real_statistics(real_data)
+    for col in real_data.metadata.variables_by_type("numerical"):
+        statistics.sorted_values(col)
+
+
+def _precompute_cstest(real_data):
+    statistics = real_statistics(real_data)
+    for var in real_data.metadata.variables_by_type("categorical"):
+        statistics.category_counts(var)
+
+
+# the statistics of the real data they use (see ASyH.metrics.real_statistics):
+kstest.precompute = _precompute_kstest
+cstest.precompute = _precompute_cstest
+
+
 def cstest_sdv(real_data, synthetic_data):
     '''Chi-square test as defined in SDV.'''
     test = sdv.metrics.tabular.CSTest()
@@ -0,0 +1,333 @@
+'''On-disk cache of fitted per-column mixture models.
+
+Fitting the Bayesian Gaussian mixtures of the mode-specific normalization
+(CTAB-GAN's DataTransformer, and the ctgan DataTransformer used by SDV's CTGAN,
+TVAE and CopulaGAN synthesizers) is expensive and yields the same models for
+the same column and hyperparameters.  A MixtureCache stores them keyed by a
+hash of the column values and the hyperparameters.  SharedNormalizers holds
+the normalizers of one table in memory, fitted once and handed to all models
+using them.  The synthesizers below hand the cache to their own ctgan model
+only, through its data_transformer.'''
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import ctgan
+import numpy as np
+import rdt
+import sdv.single_table
+from ctgan.data_transformer import DataTransformer
+from sdv.single_table.utils import detect_discrete_columns
+
+from ASyH.data import Data
+from ASyH.utils import default_workers
+
+# sdtypes which the SDV synthesizers hand to ctgan as discrete columns:
+DISCRETE_SDTYPES = ('categorical', 'boolean')
+
+CacheEntry = namedtuple('CacheEntry', 'key size last_used')
+CacheEntry.__doc__ = \
+    '''A cached model: its key, its file size in bytes and the time it was
+    last used (seconds since the epoch).'''
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'asyh', 'mixtures')
+
+
+class MixtureCache:
+    '''Cache of fitted mixture models in a directory, one pickle file per
+    model.  When the files take more than max_bytes, the least recently used
+    ones are removed.  Several processes can use the same directory.'''
+
+    SUFFIX = '.pkl'
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, max_bytes: int = 2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(values, **parameters) -> str:
+        '''Return the key of a model fitted to values with the given
+        hyperparameters.'''
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(np.asarray(values, dtype=float)).tobytes())
+        digest.update(repr(sorted(parameters.items())).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key: str):
+        '''Return the cached model for key, None if there is none.'''
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                model = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # unreadable, e.g. written by an incompatible version:
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # evicted in the meantime by another process
+            pass
+        return model
+
+    def put(self, key: str, model):
+        '''Store the model under key and evict the least recently used models
+        if the cache grew too large.'''
+        # write to a temporary file first, so that other processes never read
+        # a partially written model:
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            pickle.dump(model, file)
+        os.replace(temporary, self._path(key))
+        self.evict()
+
+    def fit(self, fit_function, values, **parameters):
+        '''Return the cached model for values and parameters, or fit it with
+        fit_function(values, **parameters) and cache it.'''
+        key = self.key(values, **parameters)
+        model = self.get(key)
+        if model is None:
+            model = fit_function(values, **parameters)
+            self.put(key, model)
+        return model
+
+    def entries(self) -> list:
+        '''Return the list of CacheEntry of the cached models, the least
+        recently used first.'''
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append(CacheEntry(name[:-len(self.SUFFIX)], stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry.last_used)
+
+    def size(self) -> int:
+        '''Total size of the cached models in bytes.'''
+        return sum(entry.size for entry in self.entries())
+
+    def evict(self):
+        '''Remove the least recently used models until the cache takes at most
+        max_bytes.'''
+        entries = self.entries()
+        total = sum(entry.size for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(self._path(entry.key))
+            total -= entry.size
+
+    def clear(self):
+        '''Remove all cached models.'''
+        for entry in self.entries():
+            self._remove(self._path(entry.key))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def normalizer_key(cache, data, max_clusters=10, weight_threshold=0.005) -> str:
+    '''Key of the ctgan normalizer of the single-column data frame data.'''
+    column_name = data.columns[0]
+    return cache.key(data[column_name].to_numpy(dtype=float, na_value=np.nan),
+                     transformer='ctgan', rdt=rdt.__version__,
+                     column_name=column_name,
+                     max_clusters=min(len(data), max_clusters),
+                     weight_threshold=weight_threshold)
+
+
+def fit_normalizer(data, max_clusters=10, weight_threshold=0.005):
+    '''Fit the ctgan normalizer of the single-column data frame data and
+    return its ColumnTransformInfo.'''
+    return DataTransformer(max_clusters=max_clusters,
+                           weight_threshold=weight_threshold)._fit_continuous(data)
+
+
+class CachedDataTransformer(DataTransformer):
+    '''ctgan DataTransformer taking the fitted ClusterBasedNormalizers of its
+    continuous columns from a MixtureCache, if given.  Once fitted, it is not
+    refitted to a table of the same columns and rows, so that a model can be
+    retrained with it.  fit_seconds and transform_seconds are the durations
+    of its last fit and transform.'''
+
+    def __init__(self, max_clusters=10, weight_threshold=0.005, cache=None):
+        super().__init__(max_clusters=max_clusters, weight_threshold=weight_threshold)
+        self._cache = cache
+        self._fitted_to = None
+        self.fit_seconds = 0.0
+        self.transform_seconds = 0.0
+
+    def fit(self, raw_data, discrete_columns=()):
+        fitted_to = (tuple(getattr(raw_data, 'columns', range(raw_data.shape[1]))),
+                     tuple(discrete_columns), len(raw_data))
+        if fitted_to == self._fitted_to:
+            self.fit_seconds = 0.0
+            return
+        start = time.perf_counter()
+        super().fit(raw_data, discrete_columns)
+        self.fit_seconds = time.perf_counter() - start
+        self._fitted_to = fitted_to
+
+    def transform(self, raw_data):
+        start = time.perf_counter()
+        transformed = super().transform(raw_data)
+        self.transform_seconds = time.perf_counter() - start
+        return transformed
+
+    def _fit_continuous(self, data):
+        if self._cache is None:
+            return super()._fit_continuous(data)
+        key = normalizer_key(self._cache, data, self._max_clusters, self._weight_threshold)
+        info = self._cache.get(key)
+        if info is None:
+            info = super()._fit_continuous(data)
+            self._cache.put(key, info)
+        return info
+
+    def __getstate__(self):
+        # the cache stays in the process which fitted the transformer:
+        return dict(self.__dict__, _cache=None)
+
+
+class SharedNormalizers:
+    '''In-memory store of the fitted ctgan normalizers of a table, used like
+    a MixtureCache.  Models not finding a normalizer here (e.g. CopulaGAN,
+    whose continuous columns are Gaussian-normalized first) fit it themselves,
+    or take it from the fallback cache.'''
+
+    key = staticmethod(MixtureCache.key)
+
+    def __init__(self, fallback: Optional[MixtureCache] = None):
+        self.fallback = fallback
+        self._models = {}
+
+    def __len__(self):
+        return len(self._models)
+
+    def get(self, key: str):
+        '''Return the normalizer stored under key, None if there is none.'''
+        model = self._models.get(key)
+        if model is None and self.fallback is not None:
+            model = self.fallback.get(key)
+        return model
+
+    def put(self, key: str, model):
+        '''Store the normalizer under key (in the fallback cache, too).'''
+        self._models[key] = model
+        if self.fallback is not None:
+            self.fallback.put(key, model)
+
+    def fit(self, data: Data, max_workers: Optional[int] = None):
+        '''Fit the normalizers of the continuous columns of data as
+        preprocessed by SDV\'s CTGAN and TVAE synthesizers, in parallel by
+        max_workers processes (default: ASyH.utils.default_workers()).'''
+        synthesizer = sdv.single_table.TVAESynthesizer(metadata=data.sdv_metadata)
+        processed = synthesizer.preprocess(data.data)
+        discrete = [col for sdtype in DISCRETE_SDTYPES
+                    for col in data.metadata.variables_by_type(sdtype)]
+        columns = [processed[[col]] for col in processed.columns
+                   if col not in discrete and processed[col].dtype.kind in 'biuf']
+        keys = [normalizer_key(self, column) for column in columns]
+        missing = []
+        for key, column in zip(keys, columns):
+            model = self.get(key)
+            if model is None:
+                missing.append((key, column))
+            else:
+                self._models[key] = model
+
+        if max_workers is None:
+            max_workers = default_workers()
+        if max_workers > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+                models = list(pool.map(fit_normalizer, [column for _, column in missing]))
+        else:
+            models = [fit_normalizer(column) for _, column in missing]
+        for (key, _), model in zip(missing, models):
+            self.put(key, model)
+        return self
+
+
+class _DataTransformerAttribute:
+    '''Descriptor of the attribute in which ctgan's CTGAN (_transformer) and
+    TVAE (transformer) keep their DataTransformer.  Their fit() assigns a new
+    DataTransformer to it, which is replaced by the model's data_transformer
+    if that is set.'''
+
+    def __set_name__(self, owner, name):
+        self._name = '_asyh' + name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return instance.__dict__.get(self._name)
+
+    def __set__(self, instance, value):
+        if value is not None and instance.data_transformer is not None:
+            value = instance.data_transformer
+        instance.__dict__[self._name] = value
+
+
+class CTGAN(ctgan.CTGAN):
+    '''ctgan's CTGAN fitting its data_transformer instead of a new
+    DataTransformer, if set.'''
+    data_transformer = None
+    _transformer = _DataTransformerAttribute()
+
+
+class TVAE(ctgan.TVAE):
+    '''ctgan's TVAE fitting its data_transformer instead of a new
+    DataTransformer, if set.'''
+    data_transformer = None
+    transformer = _DataTransformerAttribute()
+
+
+class _DataTransformerMixin:
+    '''Mixin for SDV's CTGAN and TVAE synthesizers handing data_transformer
+    (e.g. a CachedDataTransformer) to their ctgan model of the class
+    ctgan_class.'''
+    ctgan_class = None
+    data_transformer = None
+
+    def _fit(self, processed_data):
+        # as in SDV's CTGANSynthesizer and TVAESynthesizer:
+        transformers = self._data_processor._hyper_transformer.field_transformers
+        discrete_columns = detect_discrete_columns(self.get_metadata(), processed_data,
+                                                   transformers)
+        self._model = self.ctgan_class(**self._model_kwargs)
+        self._model.data_transformer = self.data_transformer
+        self._model.fit(processed_data, discrete_columns=discrete_columns)
+
+
+class CTGANSynthesizer(_DataTransformerMixin, sdv.single_table.CTGANSynthesizer):
+    '''SDV's CTGANSynthesizer with a data_transformer, see
+    _DataTransformerMixin.'''
+    ctgan_class = CTGAN
+
+
+class TVAESynthesizer(_DataTransformerMixin, sdv.single_table.TVAESynthesizer):
+    '''SDV's TVAESynthesizer with a data_transformer, see
+    _DataTransformerMixin.'''
+    ctgan_class = TVAE
+
+
+class CopulaGANSynthesizer(sdv.single_table.CopulaGANSynthesizer, CTGANSynthesizer):
+    '''SDV's CopulaGANSynthesizer with a data_transformer: its fit
+    Gaussian-normalizes the table and continues with CTGANSynthesizer's.'''
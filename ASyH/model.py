@@ -4,8 +4,11 @@
 #   read() and save()
 
 from datetime import datetime
+import inspect
+import logging
 import re
 import subprocess
+import time
 
 import os.path
 from abc import ABC, abstractmethod
@@ -15,6 +18,11 @@ from pandas import DataFrame
 from sdv.single_table.base import BaseSingleTableSynthesizer
 
 from ASyH.data import Data
+from ASyH.mixture_cache import CachedDataTransformer
+from ASyH.processing import PROCESSOR_ARGUMENTS
+
+# the logger of ASyH.pipelines:
+logger = logging.getLogger("asyh_logger")
 
 
 class RandBaseSingleTableSynthesizer(BaseSingleTableSynthesizer):
@@ -41,6 +49,13 @@ class RandBaseSingleTableSynthesizer(BaseSingleTableSynthesizer):
 class Model(ABC):
     '''ASyH Generic Model Interface'''
 
+    # True if the SDV model normalizes continuous columns with ctgan's
+    # DataTransformer, whose normalizers can be shared between models:
+    mode_specific_normalization = False
+    # True if the SDV model can take a data processor fitted beforehand, see
+    # set_data_processor():
+    shares_data_processor = False
+
     @property
     def sdv_model(self):
         return self._sdv_model
@@ -49,6 +64,60 @@ class Model(ABC):
     def model_type(self):
         return self._model_type
 
+    @property
+    def trained(self):
+        return self._trained
+
+    @property
+    def epochs(self) -> Optional[int]:
+        '''The number of training epochs, None if the underlying model is not
+        trained in epochs.'''
+        if self._override_args is not None and 'epochs' in self._override_args:
+            return self._override_args['epochs']
+        parameter = inspect.signature(self._sdv_model_class).parameters.get('epochs')
+        if parameter is None or parameter.default is inspect.Parameter.empty:
+            return None
+        return parameter.default
+
+    def set_epochs(self, epochs: int):
+        '''Set the number of training epochs.  Only effective before the model
+        is trained.'''
+        # copy: override_args may be shared with the caller
+        self._override_args = dict(self._override_args or {}, epochs=epochs)
+
+    def set_time_budget(self, seconds: Optional[float]):
+        '''Set the wall-clock time budget for training.  Models trained in
+        epochs reduce their number of epochs to what fits into the budget,
+        using the measured duration of one epoch.'''
+        self._time_budget = seconds
+
+    def set_mixture_cache(self, cache):
+        '''Set the ASyH.mixture_cache.MixtureCache to take fitted per-column
+        mixture models from, None to always fit them.'''
+        self._mixture_cache = cache
+
+    def set_data_processor(self, processor):
+        '''Set the SDV DataProcessor, fitted to the training data, with which
+        the SDV model preprocesses the data instead of fitting its own; None
+        to let it fit its own.'''
+        self._data_processor = processor
+
+    def create_data_processor(self, data: Data):
+        '''Return the (unfitted) DataProcessor the SDV model would create for
+        data.'''
+        args = {key: value for key, value in (self._override_args or {}).items()
+                if key in PROCESSOR_ARGUMENTS}
+        synthesizer = self._sdv_model_class(metadata=data.sdv_metadata, **args)
+        if self._constraints is not None:
+            synthesizer.add_constraints(self._constraints)
+        return synthesizer._data_processor
+
+    def set_training_data(self, data: Data):
+        '''Replace the training data, e.g. by a SharedData holding the same
+        table.'''
+        self._training_data = data
+        self._metadata = data.metadata
+
     def __init__(
             self,
             sdv_model_class: Optional[Callable[..., BaseSingleTableSynthesizer]] = None,
@@ -79,6 +148,49 @@ class Model(ABC):
             self._metadata = None
 
         self._trained = False
+        self._time_budget = None
+        self._mixture_cache = None
+        self._data_processor = None
+
+    def _preprocess(self, frame: DataFrame) -> DataFrame:
+        '''Preprocess frame for the SDV model, with the data processor set by
+        set_data_processor() if any.'''
+        if self._data_processor is None:
+            return self._sdv_model.preprocess(frame)
+        self._sdv_model._data_processor = self._data_processor
+        self._sdv_model.validate(frame)
+        self._data_processor.reset_sampling()
+        return self._data_processor.transform(frame)
+
+    def _fit_within_budget(self, frame: DataFrame):
+        '''Fit the SDV model within the time budget: train one epoch on the
+        preprocessed data to measure its duration, then retrain with as many
+        epochs as fit into the rest of the budget (at most the configured
+        number).  The ctgan DataTransformer (see
+        ASyH.mixture_cache.CachedDataTransformer) is fitted by the first fit
+        only, and its fitting is not counted as part of the epoch.'''
+        start = time.monotonic()
+        processed = self._preprocess(frame)
+        epochs = self._sdv_model._model_kwargs['epochs']
+        self._sdv_model._model_kwargs['epochs'] = 1
+        epoch_start = time.monotonic()
+        self._sdv_model.fit_processed_data(processed)
+        epoch_duration = time.monotonic() - epoch_start
+        transformer = getattr(self._sdv_model, 'data_transformer', None)
+        transform_seconds = 0.0
+        if transformer is not None:
+            # the retraining transforms the table again, but does not refit:
+            transform_seconds = transformer.transform_seconds
+            epoch_duration -= transformer.fit_seconds + transform_seconds
+        epoch_duration = max(epoch_duration, 1e-3)
+        remaining = self._time_budget - (time.monotonic() - start) - transform_seconds
+        affordable = min(epochs, int(remaining / epoch_duration))
+        logger.info(f'{self._model_type}: one epoch took {epoch_duration:.1f}s, '
+                    f'training {max(affordable, 1)} of {epochs} epochs '
+                    'within the time budget')
+        if affordable > 1:
+            self._sdv_model._model_kwargs['epochs'] = affordable
+            self._sdv_model.fit_processed_data(processed)
 
     def _train(self, data: Optional[Data] = None):
         assert self._training_data is not None or data is not None
@@ -97,7 +209,16 @@ class Model(ABC):
             if self._constraints is not None:
                 self._sdv_model.add_constraints(self._constraints)
 
-        self._sdv_model.fit(data.data)
+        if hasattr(self._sdv_model, 'data_transformer'):
+            # see ASyH.mixture_cache.CTGANSynthesizer:
+            self._sdv_model.data_transformer = CachedDataTransformer(cache=self._mixture_cache)
+        if self._time_budget is not None \
+           and 'epochs' in getattr(self._sdv_model, '_model_kwargs', {}):
+            self._fit_within_budget(data.data)
+        elif self._data_processor is not None:
+            self._sdv_model.fit_processed_data(self._preprocess(data.data))
+        else:
+            self._sdv_model.fit(data.data)
         self._input_data_size = data.data.shape[0]
         self._trained = True
     
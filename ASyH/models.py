@@ -2,7 +2,6 @@
 from typing import Optional, Dict, Any
 import re
 
-import sdmetrics
 import rdt
 
 #
@@ -11,10 +10,12 @@ import rdt
 
 import sdv
 from ASyH.data import Data, Metadata
+from ASyH import mixture_cache
 from ASyH.model import Model, ModelX
 from ASyH.ctabgan_synthesizer import CTABGANSynthesizer
 from ASyH.transformer_ctabgan import *
 from ASyH.utils import Utils
+from ASyH.tuning import tune_distributions
 # from forest_data_prep import DataPrep
 import time
 import subprocess
@@ -29,7 +30,7 @@ def get_metadata_from_data(data):
     return None if data.metadata is None else data.sdv_metadata
 
 
-class CTGAN2(sdv.single_table.CTGANSynthesizer):
+class CTGAN2(mixture_cache.CTGANSynthesizer):
     _model_sdtype_transformers = {
         'categorical': None,
         'boolean': None
@@ -41,33 +42,19 @@ class CTGAN2(sdv.single_table.CTGANSynthesizer):
                  log_frequency=True, verbose=False, epochs=300, pac=10, cuda=True):
         # def __init__(self, meta, **kwargs):
         #     super(sdv.single_table.CTGANSynthesizer, self).__init__(meta, **kwargs)
-
-        self._model_kwargs = {
-            'embedding_dim': embedding_dim,
-            'generator_dim': generator_dim,
-            'discriminator_dim': discriminator_dim,
-            'generator_lr': generator_lr,
-            'generator_decay': generator_decay,
-            'discriminator_lr': discriminator_lr,
-            'discriminator_decay': discriminator_decay,
-            'batch_size': batch_size,
-            'discriminator_steps': discriminator_steps,
-            'log_frequency': log_frequency,
-            'verbose': verbose,
-            'epochs': epochs,
-            'pac': pac,
-            'cuda': cuda
-        }
-
-        super().__init__(metadata, enforce_min_max_values=True, enforce_rounding=True, locales=None,
-                 embedding_dim=128, generator_dim=(256, 256), discriminator_dim=(256, 256),
-                 generator_lr=2e-4, generator_decay=1e-6, discriminator_lr=2e-4,
-                 discriminator_decay=1e-6, batch_size=500, discriminator_steps=1,
-                 log_frequency=True, verbose=False, epochs=300, pac=10, cuda=True)
+        super().__init__(metadata, enforce_min_max_values=enforce_min_max_values,
+                         enforce_rounding=enforce_rounding, locales=locales,
+                         embedding_dim=embedding_dim, generator_dim=generator_dim,
+                         discriminator_dim=discriminator_dim, generator_lr=generator_lr,
+                         generator_decay=generator_decay, discriminator_lr=discriminator_lr,
+                         discriminator_decay=discriminator_decay, batch_size=batch_size,
+                         discriminator_steps=discriminator_steps, log_frequency=log_frequency,
+                         verbose=verbose, epochs=epochs, pac=pac, cuda=cuda)
 
 
     ## TODO: remake using the module secrets
-    def _set_random_state(self):
+    def _set_random_state(self, random_state=None):
+        # called by sdv's sample() with a fixed seed, which is replaced:
         # self._model.set_random
         curr_time = datetime.datetime.now()
         # random_state = int(curr_time.timestamp() * 1e+6)
@@ -83,9 +70,12 @@ class CTGAN2(sdv.single_table.CTGANSynthesizer):
 class TVAEModel(Model):
     '''Specific ASyH Model for SDV\'s TVAE model.'''
 
+    mode_specific_normalization = True
+    shares_data_processor = True
+
     def __init__(self, data: Optional[Data] = None, override_args=None):
         Model.__init__(self,
-                       sdv_model_class=sdv.single_table.TVAESynthesizer,
+                       sdv_model_class=mixture_cache.TVAESynthesizer,
                        data=data,
                        override_args=override_args)
 
@@ -109,6 +99,9 @@ class TVAEModel(Model):
 class CTGANModel(Model):
     '''Specific ASyH Model for SDV\'s CTGAN model.'''
 
+    mode_specific_normalization = True
+    shares_data_processor = True
+
     def __init__(self, data: Optional[Data] = None, override_args=None):
         Model.__init__(self,
                        # sdv_model_class=sdv.single_table.CTGANSynthesizer,
@@ -134,9 +127,12 @@ class CTGANModel(Model):
 class CopulaGANModel(Model):
     '''Specific ASyH Model for SDV\'s CopulaGAN model.'''
 
+    mode_specific_normalization = True
+    shares_data_processor = True
+
     def __init__(self, data: Optional[Data] = None, override_args=None):
         Model.__init__(self,
-                       sdv_model_class=sdv.single_table.copulagan.CopulaGANSynthesizer,
+                       sdv_model_class=mixture_cache.CopulaGANSynthesizer,
                        data=data,
                        override_args=override_args)
 
@@ -158,6 +154,8 @@ class CopulaGANModel(Model):
 class GaussianCopulaModel(Model):
     '''Specific ASyH Model for SDV\'s GaussianCopula model.'''
 
+    shares_data_processor = True
+
     class Regressed_GaussianCopulaSynthesizer(sdv.single_table.copulas.GaussianCopulaSynthesizer):
         _model_sdtype_transformers = {'categorical': rdt.transformers.FrequencyEncoder(add_noise=True)}
 
@@ -167,6 +165,8 @@ class GaussianCopulaModel(Model):
                        data=data,
                        override_args=override_args)
         self._model_type = 'GaussianCopulaSynthesizer'
+        # number of rows to tune the distributions on, None for all rows:
+        self.tuning_rows = None
 
     def adapted_arguments(self, data: Optional[Data] = None) -> Dict[str, Any]:
         '''Method to adapt the Gaussian Copula sdv model internals to data'''
@@ -175,48 +175,11 @@ class GaussianCopulaModel(Model):
         return args
 
     def _tune_GCM_distributions(self, data: Data) -> Dict[str, str]:
-        best_scores = self._init_iterative_scores(data.metadata)
-        numerical_vars = data.metadata.variables_by_type('numerical')
-        column_distributions = dict()
-
-        for dist in sdv.single_table.copulas.GaussianCopulaSynthesizer._DISTRIBUTIONS:
-            GCM_model = self.Regressed_GaussianCopulaSynthesizer(metadata=get_metadata_from_data(data),
-                                                                 default_distribution=dist)
-            GCM_model.fit(data.data)
-            synth_data = GCM_model.sample(data.data.shape[0])
-            sdmetrics_report = sdmetrics.reports.single_table.QualityReport()
-            sdmetrics_report.generate(data.data,
-                                      synth_data,
-                                      data.metadata.metadata,
-                                      verbose=False)
-
-            # 'details' is a pandas dataframe:
-            details = sdmetrics_report.get_details(property_name='Column Shapes')
-
-            # numerical variables use KSComplement, categorical/booleans use TVComplement:
-            # use the average score for categorical variables
-            categorical_score = details[details['Metric'] == 'TVComplement']['Score'].mean()
-            if categorical_score > best_scores['categorical'][1]:
-                best_scores['categorical'] = (dist, categorical_score)
-            # we want detailed fitting distributions for numerical variables
-            for num_var in numerical_vars:
-                score = details[details['Column'] == num_var]['Score'].values[0]
-                if score > best_scores[num_var][1]:
-                    best_scores[num_var] = (dist, score)
-                    # create the override_args
-                    column_distributions = {var: best_scores[var][0]
-                                            for var in best_scores
-                                            if var != 'categorical'}
-
-        return {'numerical_distributions': column_distributions,
-                'default_distribution': best_scores['categorical'][0]}
-    
-    def _init_iterative_scores(self, metadata_dict: Dict[str, any]):
-        return_dict = {}
-        for numerical in metadata_dict.variables_by_type('numerical'):
-            return_dict[numerical] = ('', 0.0)
-        return_dict['categorical'] = ('', 0.0)
-        return return_dict
+        '''Choose the best-fitting univariate distribution for each numerical
+        column and the default distribution for the other columns.'''
+        return tune_distributions(data,
+                                  synthesizer_class=self.Regressed_GaussianCopulaSynthesizer,
+                                  sample_rows=self.tuning_rows)
 
 
 class ForestFlowModel(Model):
@@ -234,6 +197,10 @@ class ForestFlowModel(Model):
         self.data_hidden = None
         
 
+    def set_training_data(self, data: Data):
+        Model.set_training_data(self, data)
+        self.data = data
+
     def adapted_arguments(self, data: Optional[Data] = None) -> Dict[str, Any]:
         '''Create SDV model specific argument dict to pass to the constructor.
         This method is meant to adapt the CTGAN sdv model internals to the
@@ -246,7 +213,8 @@ class ForestFlowModel(Model):
         hidden_layer_dims = (dim, dim)
         return {'metadata': get_metadata_from_data(data),
                 'generator_dim': hidden_layer_dims,
-                'discriminator_dim': hidden_layer_dims}
+                'discriminator_dim': hidden_layer_dims,
+                'mixture_cache': self._mixture_cache}
     
 
     def transform_data_prep(self, data: Data) -> Data:
@@ -302,8 +270,7 @@ class ForestFlowModel(Model):
         df_fake2 = Utils.convert_types_pandas(data_fake, meta)
 
         # df_fake2 = data_fake2.data
-        for col in col_maps.keys():
-            df_fake2 = Utils.discretize_column(df_fake2, col, col_maps)
+        df_fake2 = Utils.discretize_cols(df_fake2, col_maps.keys(), col_maps)
 
         # return hidden columns to the dataframe df_fake2 using self.data_hidden
         df_fake2 = pd.concat([df_fake2, self.data_hidden], axis=1)
@@ -419,6 +386,10 @@ class CPARModel(Model):
         # self.data_hidden = None
 
 
+    def set_training_data(self, data: Data):
+        Model.set_training_data(self, data)
+        self.data = data
+
     def adapted_arguments(self, data: Optional[Data] = None) -> Dict[str, Any]:
         '''Create SDV model specific argument dict to pass to the constructor.
         This method is meant to adapt the CopulaGAN sdv model internals to the
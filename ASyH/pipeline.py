@@ -7,23 +7,84 @@ from ASyH.data import Data
 from ASyH.model import Model
 from ASyH.abstract_pipeline import AbstractPipeline
 from ASyH.hook import ScoringHook, PreprocessHook, PostprocessHook
+from ASyH.instrumentation import Instrumentation
+from ASyH.sampling import BOOTSTRAP_SAMPLES, bootstrap_interval, stratified_sample
 from ASyH.utils import flatten_dict
 
 
+def mean_score(detailed_scores) -> float:
+    '''The pipeline's score from the results of its scoring hook.'''
+    # Assuming, the scoring functions are maximizing, nomalized, and
+    # weighted equally:
+    scores = flatten_dict(detailed_scores)
+    return sum(scores.values()) / len(scores)
+
+
 class Pipeline(AbstractPipeline):
     """The basic ASyH Pipeline."""
 
+    # whether the pipeline is given the output of the Application's shared
+    # preprocessing instead of the raw input data:
+    preprocessed_input = True
+
     def __init__(self, model: Model, input_data: Data):
         self._model = model
         self._input_data = input_data
         self._preprocessing_hook = PreprocessHook()
         self._postprocessing_hook = PostprocessHook()
         self._scoring_hook = ScoringHook()
+        # sampled scoring, see set_scoring_sample():
+        self.scoring_rows = None
+        self.bootstrap_samples = 0
+        self.confidence_level = 0.95
+        self.score_interval = None
+        # the stages of the last run():
+        self.instrumentation = None
 
     @property
     def model(self):
         return self._model
 
+    @model.setter
+    def model(self, model: Model):
+        self._model = model
+
+    @property
+    def input_data(self):
+        return self._input_data
+
+    @input_data.setter
+    def input_data(self, data: Data):
+        self._input_data = data
+        self._model.set_training_data(data)
+
+    def set_scoring_sample(self, n_rows, bootstrap_samples=BOOTSTRAP_SAMPLES,
+                           confidence_level=0.95):
+        '''Score n_rows synthetic rows against a stratified subsample of as
+        many rows of the input data instead of a synthetic table of the full
+        input size, and estimate the confidence interval of the score from
+        bootstrap_samples half-samples of the synthetic rows (none if 0), see
+        ASyH.sampling.bootstrap_interval().'''
+        self.scoring_rows = n_rows
+        self.bootstrap_samples = bootstrap_samples
+        self.confidence_level = confidence_level
+
+    def set_scoring_concurrency(self, max_workers, executor='thread', timeout=None):
+        '''Run the scoring functions concurrently, see ScoringHook.'''
+        self._scoring_hook.max_workers = max_workers
+        self._scoring_hook.executor = executor
+        self._scoring_hook.timeout = timeout
+
+    def scoring_data(self) -> Data:
+        '''The real data the synthetic data is scored against.'''
+        if self.scoring_rows is None:
+            return self._input_data
+        return stratified_sample(self._input_data, self.scoring_rows)
+
+    @property
+    def scoring_functions(self):
+        return self._scoring_hook.functions
+
     def add_scoring(self, scoring_function):
         self._scoring_hook.add(scoring_function)
     
@@ -37,17 +98,39 @@ class Pipeline(AbstractPipeline):
         save_cwd = os.getcwd()
         with tempfile.TemporaryDirectory() as workdir:
             os.chdir(workdir)
-            self._input_data = self._preprocessing_hook.execute(self._input_data)
-            synthetic_data = Data(data=self._model.synthesize())
+            instrumentation = self.instrumentation = Instrumentation()
+            with instrumentation.stage('preprocessing'):
+                self._preprocessing_hook.instrumentation = instrumentation
+                self._input_data = self._preprocessing_hook.execute(self._input_data)
+            real_data = self.scoring_data()
+            if not self._model.trained:
+                with instrumentation.stage('training'):
+                    self._model._train()
+            sample_size = -1 if self.scoring_rows is None else len(real_data.data)
+            with instrumentation.stage('sampling'):
+                synthetic_data = Data(data=self._model.synthesize(sample_size))
             # synthetic_data = self._postprocessing_hook.execute(synthetic_data)
-            detailed_scores = self._scoring_hook.execute(self._input_data,
-                                                         synthetic_data)
+            with instrumentation.stage('scoring'):
+                self._scoring_hook.instrumentation = instrumentation
+                detailed_scores = self._scoring_hook.execute(real_data, synthetic_data)
+                self._scoring_hook.instrumentation = None
+            timings = self._scoring_hook.timings
+            self.score_interval = None
+            if self.bootstrap_samples:
+                with instrumentation.stage('bootstrap'):
+                    self.score_interval = bootstrap_interval(
+                        lambda real, synth: mean_score(self._scoring_hook.execute(real, synth)),
+                        real_data, synthetic_data,
+                        n_samples=self.bootstrap_samples,
+                        confidence_level=self.confidence_level,
+                        point=mean_score(detailed_scores))
         os.chdir(save_cwd)
         print(f'{self.model.model_type} Scoring: {str(detailed_scores)}')
-        # Assuming, the scoring functions are maximizing, nomalized, and
-        # weighted equally:
-        scores = flatten_dict(detailed_scores)
-        return sum(scores.values()) / len(scores)
+        print(f'{self.model.model_type} Scoring times: {str(timings)}')
+        print(f'{self.model.model_type} Stage times: {str(self.instrumentation.wall_times())}')
+        if self.score_interval is not None:
+            print(f'{self.model.model_type} Score interval: {self.score_interval}')
+        return mean_score(detailed_scores)
 
 
 AbstractPipeline.register(Pipeline)
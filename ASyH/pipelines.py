@@ -8,6 +8,7 @@ from sklearn.experimental import enable_iterative_imputer
 from sklearn.impute import IterativeImputer
 
 from ASyH.pipeline import Pipeline
+from ASyH.instrumentation import Instrumentation
 from ASyH.models import CopulaGANModel, CTGANModel, GaussianCopulaModel, TVAEModel, ForestFlowModel, CPARModel
 
 from ASyH.data import Data, Metadata
@@ -69,6 +70,8 @@ class TVAEPipeline(Pipeline):
                           input_data=input_data)
         
 class ForestFlowPipeline(Pipeline):
+    # converts the dates itself and does not impute:
+    preprocessed_input = False
 
     def __init__(self, input_data, override_args={"constraints": None}):
         super().__init__(model=ForestFlowModel(data=input_data,
@@ -108,40 +111,44 @@ class ForestFlowPipeline(Pipeline):
     def run(self):
         save_cwd = os.getcwd()
         with tempfile.TemporaryDirectory() as workdir:
-            df_int_cols = Utils.identify_float_columns_that_are_integers(self._input_data.data)
-            df_bool_cols = Utils.identify_float_columns_that_are_booleans(self._input_data.data)
-
-            meta = self._input_data.metadata
-            src_medset_raw = Data(self._input_data.data, metadata=Metadata(meta))
-
-            src_medset = Utils.convert_all_dates(src_medset_raw)
-            df_src = src_medset.data
-
-            # import ipdb; ipdb.set_trace() # TODO: comment out later
-
-            for col in df_src.columns:
-                if meta['columns'][col]['sdtype'] == 'numerical':
-                    if col in df_int_cols:
-                        # df_medset[col] = df_medset[col].astype(int)
-                        meta['columns'][col]['computer_representation'] = 'Int'
-                    elif col in df_bool_cols:
-                        meta['columns'][col]['sdtype'] = 'boolean'
-                    else:
-                        meta['columns'][col]['computer_representation'] = 'Float'
-                # else:
-                #     meta['columns'][col]['sdtype'] = 'boolean'
-
-            # with open('meta_updated_medset.json', 'w') as fl_meta:
-            #     json.dump(meta, fl_meta)
-
-            # X = df_medset.values
-            X = df_src.to_numpy()
+            instrumentation = self.instrumentation = Instrumentation()
+            with instrumentation.stage('preprocessing'):
+                df_int_cols = Utils.identify_float_columns_that_are_integers(self._input_data.data)
+                df_bool_cols = Utils.identify_float_columns_that_are_booleans(self._input_data.data)
+
+                meta = self._input_data.metadata
+                src_medset_raw = Data(self._input_data.data, metadata=Metadata(meta))
+
+                src_medset = Utils.convert_all_dates(src_medset_raw)
+                df_src = src_medset.data
+
+                # import ipdb; ipdb.set_trace() # TODO: comment out later
+
+                for col in df_src.columns:
+                    if meta['columns'][col]['sdtype'] == 'numerical':
+                        if col in df_int_cols:
+                            # df_medset[col] = df_medset[col].astype(int)
+                            meta['columns'][col]['computer_representation'] = 'Int'
+                        elif col in df_bool_cols:
+                            meta['columns'][col]['sdtype'] = 'boolean'
+                        else:
+                            meta['columns'][col]['computer_representation'] = 'Float'
+                    # else:
+                    #     meta['columns'][col]['sdtype'] = 'boolean'
+
+                # with open('meta_updated_medset.json', 'w') as fl_meta:
+                #     json.dump(meta, fl_meta)
+
+                # X = df_medset.values
+                X = df_src.to_numpy()
             print(X)
             # ipdb.set_trace()
 
-            self.model._train(X)
+            with instrumentation.stage('training'):
+                self.model._train(X)
 
-            Xy_fake = self.model.synthesize(sample_size=X.shape[0])
+            with instrumentation.stage('sampling'):
+                Xy_fake = self.model.synthesize(sample_size=X.shape[0])
 
             print(f"Regression problem: \n {Xy_fake}")
 
@@ -187,15 +194,17 @@ class ForestFlowPipeline(Pipeline):
             df_fake2 = self.convert_types_pandas(data_fake.data, meta)
 
             # df_fake2 = data_fake2.data
-            for col in col_maps.keys():
-                df_fake2 = self.discretize_column(df_fake2, col, col_maps)
+            df_fake2 = Utils.discretize_cols(df_fake2, col_maps.keys(), col_maps)
             
             synthetic_data = Data(df_fake2, metadata=self._input_data.metadata)
             # synthetic_data.set_metadata(self._input_data.metadata)
             # self.add_postprocessing
             # synthetic_data = self._postprocessing_hook.execute(synthetic_data)
-            detailed_scores = self._scoring_hook.execute(self._input_data,
-                                                            synthetic_data)
+            with instrumentation.stage('scoring'):
+                self._scoring_hook.instrumentation = instrumentation
+                detailed_scores = self._scoring_hook.execute(self._input_data,
+                                                                synthetic_data)
+                self._scoring_hook.instrumentation = None
         os.chdir(save_cwd)
         print(f'{self.model.model_type} Scoring: {str(detailed_scores)}')
         # Assuming, the scoring functions are maximizing, nomalized, and
@@ -205,6 +214,8 @@ class ForestFlowPipeline(Pipeline):
     
 
 class CPARPipeline(Pipeline):
+    preprocessed_input = False
+
     def __init__(self, input_data, override_args={"constraints": None}):
         # self.df = input_data.data
         self.df = input_data
@@ -0,0 +1,93 @@
+'''Sharing of the fitted data processor of the SDV synthesizers.
+
+Every SDV synthesizer preprocesses its training table with a DataProcessor:
+formatters, constraints and an rdt HyperTransformer fitted to the table.  The
+synthesizers of ASyH's models differ only in the transformers of a few
+sdtypes (GaussianCopula encodes categorical columns with a FrequencyEncoder,
+CTGAN and TVAE hand them to ctgan unencoded), so the processor is fitted once
+and the processors of the other synthesizers are derived from it, refitting
+only the columns whose transformers differ.'''
+import copy
+
+import rdt
+
+# arguments of the SDV synthesizers which configure their data processor:
+PROCESSOR_ARGUMENTS = ('enforce_min_max_values', 'enforce_rounding', 'locales')
+
+# the rdt versions whose HyperTransformer internals the classes below use:
+RDT_VERSIONS = ('1.9.2',)
+
+
+def supported() -> bool:
+    '''True if the installed rdt is one of RDT_VERSIONS, i.e. the data
+    processor can be shared; otherwise each model fits its own.'''
+    return rdt.__version__ in RDT_VERSIONS
+
+
+class PartialHyperTransformer(rdt.HyperTransformer):
+    '''rdt HyperTransformer whose next fit() refits only the fields in
+    refit_fields, taking the transformers of all other fields as already
+    fitted.  Later fits refit all fields again.'''
+
+    def __init__(self, refit_fields=None):
+        super().__init__()
+        self.refit_fields = refit_fields
+
+    def fit(self, data):
+        try:
+            super().fit(data)
+        finally:
+            self.refit_fields = None
+
+    def _fit_field_transformer(self, data, field, transformer):
+        if transformer is None or self.refit_fields is None or field in self.refit_fields:
+            return super()._fit_field_transformer(data, field, transformer)
+        # fitted already, only record it like rdt does:
+        self._transformers_sequence.append(transformer)
+        data = transformer.transform(data)
+        for column_name, next_transformer in transformer.get_next_transformers().items():
+            if self._field_in_data(column_name, data):
+                data = self._fit_field_transformer(data, column_name, next_transformer)
+        return data
+
+
+def compatible(base, processor) -> bool:
+    '''True if the processor can be derived from the fitted processor base,
+    i.e. they differ at most in their transformers by sdtype.'''
+    return (base.metadata.to_dict() == processor.metadata.to_dict()
+            and base._enforce_rounding == processor._enforce_rounding
+            and base._enforce_min_max_values == processor._enforce_min_max_values
+            and base._locales == processor._locales
+            and base.get_constraints() == processor.get_constraints()
+            and base._transformers_by_sdtype.keys() == processor._transformers_by_sdtype.keys())
+
+
+def differing_fields(base, processor) -> list:
+    '''The columns of the fitted processor base which processor would
+    transform differently.'''
+    sdtypes = {sdtype for sdtype, transformer in processor._transformers_by_sdtype.items()
+               if repr(transformer) != repr(base._transformers_by_sdtype[sdtype])}
+    hyper = base._hyper_transformer
+    return [field for field, sdtype in hyper.field_sdtypes.items()
+            if sdtype in sdtypes and field in hyper.field_transformers]
+
+
+def derive_processor(base, processor, data):
+    '''Return the processor of another synthesizer of the table data fitted,
+    as a copy of the fitted processor base in which only the columns with
+    differing transformers are refitted.  processor must be compatible().'''
+    fields = differing_fields(base, processor)
+    derived = copy.deepcopy(base)
+    derived._transformers_by_sdtype = copy.deepcopy(processor._transformers_by_sdtype)
+    if not fields:
+        return derived
+
+    hyper = PartialHyperTransformer(refit_fields=set(fields))
+    hyper.__dict__.update(derived._hyper_transformer.__dict__, refit_fields=set(fields))
+    for field in fields:
+        column_metadata = derived.metadata.columns.get(field, {})
+        hyper.field_transformers[field] = \
+            derived._get_transformer_instance(hyper.field_sdtypes[field], column_metadata)
+    hyper.fit(derived._transform_constraints(data))
+    derived._hyper_transformer = hyper
+    return derived
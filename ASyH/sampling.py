@@ -0,0 +1,125 @@
+'''Sampled scoring of pipelines for large tables.
+
+Instead of a synthetic table of the full input size, a pipeline can sample
+and score a fixed number of rows against a stratified subsample of the real
+data.  The subsample is kept in the cache of the real data, so it (and the
+statistics of ASyH.metrics.real_statistics computed for it) is the same for
+all pipelines.  The uncertainty of a score is then estimated from half-samples
+of the synthetic rows; the real subsample is common to all pipelines and
+stays fixed.'''
+from typing import Callable, Optional
+
+import numpy
+import pandas
+
+from ASyH.data import Data
+
+STRATIFY_SDTYPES = ('categorical', 'boolean')
+# the most values a column to stratify by may have, e.g. not an identifier:
+MAX_STRATA = 100
+# the default number of half-samples of a score's interval:
+BOOTSTRAP_SAMPLES = 10
+
+
+def strata_column(data: Data, max_strata: int = MAX_STRATA) -> Optional[str]:
+    '''The column to stratify samples of data by: its first categorical or
+    boolean column with at most max_strata values (counting missing values
+    as one), None if there is none.'''
+    for column, typeinfo in data.metadata.columns.items():
+        if typeinfo['sdtype'] in STRATIFY_SDTYPES and column in data.data.columns \
+           and data.data[column].nunique(dropna=False) <= max_strata:
+            return column
+    return None
+
+
+def allocate(counts, n_rows: int) -> numpy.ndarray:
+    '''Split n_rows (at most sum(counts)) among strata of the sizes counts
+    in proportion to their sizes, by largest remainders, with at least one
+    row per stratum as long as n_rows suffices.'''
+    counts = numpy.asarray(counts, dtype=int)
+    quotas = n_rows * counts / counts.sum()
+    sizes = numpy.minimum(numpy.maximum(numpy.floor(quotas).astype(int), 1), counts)
+    remainders = quotas - numpy.floor(quotas)
+    # add to the largest remainders, take from the smallest of the strata
+    # with more than one row:
+    for stratum in numpy.argsort(-remainders, kind='stable'):
+        if sizes.sum() >= n_rows:
+            break
+        if sizes[stratum] < counts[stratum]:
+            sizes[stratum] += 1
+    while sizes.sum() < n_rows:  # all remainders used up
+        sizes[numpy.argmax(counts - sizes)] += 1
+    for stratum in numpy.argsort(remainders, kind='stable'):
+        if sizes.sum() <= n_rows:
+            break
+        if sizes[stratum] > 1:
+            sizes[stratum] -= 1
+    while sizes.sum() > n_rows:  # more strata than rows: drop the smallest
+        nonempty = numpy.flatnonzero(sizes)
+        sizes[nonempty[numpy.argmin(quotas[nonempty])]] -= 1
+    return sizes
+
+
+def stratified_sample(data: Data, n_rows: int, column: Optional[str] = None,
+                      random_state: int = 42) -> Data:
+    '''Return a subsample of n_rows rows of data which keeps the shares of
+    the values of column (default: strata_column()), see allocate(), or
+    data itself if it has no more rows.  The subsample is kept in the cache
+    of data.'''
+    if len(data.data) <= n_rows:
+        return data
+    if column is None:
+        column = strata_column(data)
+    key = ('stratified_sample', n_rows, column, random_state)
+    if key not in data.cache:
+        if column is None:
+            sample = data.data.sample(n=n_rows, random_state=random_state)
+        else:
+            rng = numpy.random.default_rng(random_state)
+            codes, _ = pandas.factorize(data.data[column], use_na_sentinel=False)
+            counts = numpy.bincount(codes)
+            order = numpy.argsort(codes, kind='stable')
+            strata = numpy.split(order, numpy.cumsum(counts)[:-1])
+            rows = numpy.concatenate([rng.choice(stratum, size, replace=False)
+                                      for stratum, size in zip(strata, allocate(counts, n_rows))])
+            sample = data.data.iloc[numpy.sort(rows)]
+        data.cache[key] = Data(sample.reset_index(drop=True), metadata=data.metadata)
+    return data.cache[key]
+
+
+def bootstrap_interval(score: Callable[[Data, Data], float], real_data: Data,
+                       synthetic_data: Data, n_samples: int = BOOTSTRAP_SAMPLES,
+                       confidence_level: float = 0.95, random_state: int = 42,
+                       point: Optional[float] = None):
+    '''Confidence interval (low, high) of the score point = score(real_data,
+    synthetic_data) (computed unless given), from the scores of n_samples
+    half-samples of the rows of synthetic_data, each costing about half a
+    scoring of synthetic_data.
+
+    Half-samples drawn without replacement vary like bootstrap resamples of
+    the full size, but do not repeat rows, which would make the synthetic
+    distribution look coarser and distances to the real one larger.  As
+    distance-based scores still depend on the number of rows, the interval
+    is the spread of the half-sample scores around their median, placed
+    around the score itself.'''
+    assert 0.0 < confidence_level < 1.0, 'confidence_level should be in (0, 1)'
+    rng = numpy.random.default_rng(random_state)
+    n_rows = len(synthetic_data.data)
+    if point is None:
+        point = score(real_data, synthetic_data)
+    scores = []
+    for _ in range(n_samples):
+        rows = numpy.sort(rng.choice(n_rows, max(n_rows // 2, 1), replace=False))
+        half = Data(synthetic_data.data.iloc[rows].reset_index(drop=True),
+                    metadata=synthetic_data.metadata)
+        scores.append(score(real_data, half))
+    alpha = (1.0 - confidence_level) / 2
+    low, median, high = numpy.nanquantile(numpy.array(scores, dtype=float),
+                                          [alpha, 0.5, 1.0 - alpha])
+    return float(point - (median - low)), float(point + (high - median))
+
+
+def overlapping(interval_a, interval_b) -> bool:
+    '''True if the confidence intervals overlap, i.e. the scores are not
+    significantly different.'''
+    return interval_a[0] <= interval_b[1] and interval_b[0] <= interval_a[1]
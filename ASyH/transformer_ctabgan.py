@@ -1,19 +1,79 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 import torch
 from sklearn.mixture import BayesianGaussianMixture
 # import pudb
 import rdt
-from ASyH.utils import Utils
+from ASyH.utils import Utils, default_workers
 import pdb
 
 
+# the BayesianGaussianMixture arguments besides n_components:
+MIXTURE_ARGUMENTS = {'weight_concentration_prior_type': 'dirichlet_process',
+                     'weight_concentration_prior': 0.001,
+                     'max_iter': 100,
+                     'n_init': 1,
+                     'random_state': 42}
+
+
+def fit_mixture(column, n_clusters, max_fit_rows=None):
+    """Fit a BayesianGaussianMixture to the values of column, to a random
+    subsample of max_fit_rows of them if given and the column is longer."""
+    values = np.asarray(column, dtype=float).reshape([-1, 1])
+    if max_fit_rows is not None and len(values) > max_fit_rows:
+        rows = np.random.default_rng(42).choice(len(values), max_fit_rows, replace=False)
+        values = values[rows]
+    gm = BayesianGaussianMixture(n_components = n_clusters, **MIXTURE_ARGUMENTS)
+    gm.fit(values)
+    return gm
+
+
+def sample_modes(probs, uniform):
+    """Draw a mixture component for each row of the posterior probabilities
+    probs, with one uniform draw per row: the index of the first cumulative
+    probability exceeding the draw, as in np.random.choice.  The
+    probabilities are smoothed by 1e-6."""
+    cumulative = np.cumsum(probs + 1e-6, axis=1)
+    cumulative /= cumulative[:, -1:]
+    selected = (cumulative <= uniform.reshape([-1, 1])).sum(axis=1)
+    return np.minimum(selected, probs.shape[1] - 1)
+
+
+def ordered_onehot(onehot, n_columns=None):
+    """Return the one-hot matrix with its columns in the order of decreasing
+    column sums, together with that order.  If n_columns is given, onehot is
+    the vector of the selected column indices instead."""
+    if n_columns is not None:
+        selected = onehot
+        col_sums = np.bincount(selected, minlength=n_columns).astype(float)
+    else:
+        col_sums = onehot.sum(axis=0)
+    order = np.argsort(-1*col_sums)
+    if n_columns is None:
+        return onehot[:, order], order
+    position = np.empty(n_columns, dtype=int)
+    position[order] = np.arange(n_columns)
+    reordered = np.zeros([len(selected), n_columns])
+    reordered[np.arange(len(selected)), position[selected]] = 1
+    return reordered, order
+
+
 class DataTransformer():
     
-    def __init__(self, train_data=pd.DataFrame, categorical_list=[], mixed_dict={}, general_list=[], non_categorical_list=[], n_clusters=10, eps=0.005):
+    def __init__(self, train_data=pd.DataFrame, categorical_list=[], mixed_dict={}, general_list=[], non_categorical_list=[], n_clusters=10, eps=0.005,
+                 n_jobs=None, max_fit_rows=None, mixture_cache=None):
         self.meta = None
         self.n_clusters = n_clusters
         self.eps = eps
+        # processes fitting the mixture models (default: see
+        # ASyH.utils.default_workers()), and the maximal number of rows to fit
+        # each of them to (default: all):
+        self.n_jobs = n_jobs
+        self.max_fit_rows = max_fit_rows
+        # an ASyH.mixture_cache.MixtureCache to reuse fitted mixtures from:
+        self.mixture_cache = mixture_cache
         self.train_data = train_data
         self.mixed_columns= mixed_dict
         self.general_columns = general_list
@@ -173,6 +233,56 @@ class DataTransformer():
         return new_col
 
 
+    def _fit_mixtures(self, columns):
+        """Fit a mixture model to each of the columns, in a process pool of
+        n_jobs workers, and return the list of futures of the fitted
+        models.  Models in the mixture_cache are not fitted again."""
+        futures = [None] * len(columns)
+        keys = [None] * len(columns)
+        if self.mixture_cache is not None:
+            for i, column in enumerate(columns):
+                keys[i] = self.mixture_cache.key(column, transformer='ctabgan',
+                                                 n_clusters=self.n_clusters,
+                                                 eps=self.eps,
+                                                 max_fit_rows=self.max_fit_rows,
+                                                 **MIXTURE_ARGUMENTS)
+                gm = self.mixture_cache.get(keys[i])
+                if gm is not None:
+                    futures[i] = Future()
+                    futures[i].set_result(gm)
+        to_fit = [i for i, future in enumerate(futures) if future is None]
+
+        n_jobs = self.n_jobs or default_workers()
+        if n_jobs > 1 and len(to_fit) > 1:
+            # leaving the with block waits for all fits:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(to_fit))) as pool:
+                for i in to_fit:
+                    futures[i] = pool.submit(fit_mixture, columns[i], self.n_clusters,
+                                             self.max_fit_rows)
+        else:
+            for i in to_fit:
+                futures[i] = Future()
+                try:
+                    futures[i].set_result(fit_mixture(columns[i], self.n_clusters,
+                                                      self.max_fit_rows))
+                except Exception as e:
+                    futures[i].set_exception(e)
+
+        if self.mixture_cache is not None:
+            for i in to_fit:
+                if futures[i].exception() is None:
+                    self.mixture_cache.put(keys[i], futures[i].result())
+        return futures
+
+
+    def _used_components(self, gm, column):
+        """Components of gm with a weight above eps which are the most likely
+        one for any of the values in column."""
+        assigned = gm.predict(np.asarray(column, dtype=float).reshape([-1, 1]))
+        used = np.bincount(assigned, minlength=self.n_clusters) > 0
+        return list(used & (gm.weights_ > self.eps))
+
+
     def fit(self):
         data = self.train_data.values
         self.meta = self.get_metadata()
@@ -182,6 +292,9 @@ class DataTransformer():
         self.output_dim = 0
         self.components = []
         self.filter_arr = []
+
+        # the columns to fit mixture models to, fitted all at once below:
+        fit_columns = []
         for id_, info in enumerate(self.meta):
             ## ? INSERT here below the code for checking the type of data[:, id_]
             ## then convert it to numeric if it is a string ?
@@ -193,29 +306,25 @@ class DataTransformer():
                     data[:, id_] = pd.Series(self._parse(data[:, id_]))
                 except Exception as e:
                     raise ValueError(f"Error parsing column {id_}: {e}")
-                
+
+            if info['type'] == "continuous" and id_ not in self.general_columns:
+                fit_columns.append(data[:, id_])
+            elif info['type'] == "mixed":
+                filter_arr = ~np.isin(data[:, id_], info['modal'])
+                self.filter_arr.append(filter_arr)
+                fit_columns += [data[:, id_], data[:, id_][filter_arr]]
+
+        fitted = iter(self._fit_mixtures(fit_columns))
+        filters = iter(self.filter_arr)
+        for id_, info in enumerate(self.meta):
             if info['type'] == "continuous":
                 if id_ not in self.general_columns:
-                  gm = BayesianGaussianMixture(
-                      n_components = self.n_clusters, 
-                      weight_concentration_prior_type='dirichlet_process',
-                      weight_concentration_prior=0.001, 
-                      max_iter=100,n_init=1, random_state=42)
-                #   import pdb; pdb.set_trace()
                   try:
-                    gm.fit(data[:, id_].reshape([-1, 1]))
-                    mode_freq = (pd.Series(gm.predict(data[:, id_].reshape([-1, 1]))).value_counts().keys())
-                    model.append(gm)
+                    gm = next(fitted).result()
+                    comp = self._used_components(gm, data[:, id_])
                   except Exception as e:
                     raise ValueError(f"Error parsing column {id_}: {e}")
-            
-                  old_comp = gm.weights_ > self.eps
-                  comp = []
-                  for i in range(self.n_clusters):
-                      if (i in (mode_freq)) & old_comp[i]:
-                          comp.append(True)
-                      else:
-                          comp.append(False)
+                  model.append(gm)
                   self.components.append(comp) 
                   self.output_info += [(1, 'tanh','no_g'), (np.sum(comp), 'softmax')]
                   self.output_dim += 1 + np.sum(comp)
@@ -226,42 +335,10 @@ class DataTransformer():
                   self.output_dim += 1
             
             elif info['type'] == "mixed":
-                
-                gm1 = BayesianGaussianMixture(
-                    n_components = self.n_clusters, 
-                    weight_concentration_prior_type='dirichlet_process',
-                    weight_concentration_prior=0.001, max_iter=100,
-                    n_init=1,random_state=42)
-                gm2 = BayesianGaussianMixture(
-                    n_components = self.n_clusters,
-                    weight_concentration_prior_type='dirichlet_process',
-                    weight_concentration_prior=0.001, max_iter=100,
-                    n_init=1,random_state=42)
-                
-                gm1.fit(data[:, id_].reshape([-1, 1]))
-                
-                filter_arr = []
-                for element in data[:, id_]:
-                    if element not in info['modal']:
-                        filter_arr.append(True)
-                    else:
-                        filter_arr.append(False)
-               
-                gm2.fit(data[:, id_][filter_arr].reshape([-1, 1]))
-                mode_freq = (pd.Series(gm2.predict(data[:, id_][filter_arr].reshape([-1, 1]))).value_counts().keys())
-                self.filter_arr.append(filter_arr)
+                gm1 = next(fitted).result()
+                gm2 = next(fitted).result()
+                comp = self._used_components(gm2, data[:, id_][next(filters)])
                 model.append((gm1,gm2))
-               
-                old_comp = gm2.weights_ > self.eps
-                  
-                comp = []
-                  
-                for i in range(self.n_clusters):
-                    if (i in (mode_freq)) & old_comp[i]:
-                        comp.append(True)
-                    else:
-                        comp.append(False)
-
                 self.components.append(comp)
 
                 self.output_info += [(1, 'tanh',"no_g"), (np.sum(comp) + len(info['modal']), 'softmax')]
@@ -269,19 +346,37 @@ class DataTransformer():
             else:
                 model.append(None)
                 self.components.append(None)
-                # print(f"On LINE 268")
-                # import pdb; pdb.set_trace()
                 self.output_info += [(info['size'], 'softmax')]
                 self.output_dim += info['size']
         self.model = model
         
 
+    def _normalize(self, id_, gm, current, ispositive, positive_list):
+        """Return the mode-specific normalized values of current under the
+        mixture gm and, for each value, a mode sampled with the mixture's
+        posterior probabilities, both restricted to the used components of
+        column id_."""
+        current = current.reshape([-1, 1]).astype(float)
+        means = gm.means_.reshape((1, self.n_clusters))
+        stds = np.sqrt(gm.covariances_).reshape((1, self.n_clusters))
+        features = (current - means) / (4 * stds)
+        if ispositive and id_ in positive_list:
+            features = np.abs(features)
+        probs = gm.predict_proba(current)
+        features = features[:, self.components[id_]]
+        probs = probs[:, self.components[id_]]
+
+        opt_sel = sample_modes(probs, np.random.random_sample(len(current)))
+        features = features[np.arange(len(features)), opt_sel].reshape([-1, 1])
+        features = np.clip(features, -.99, .99)
+        return features, opt_sel, probs.shape[1]
+
+
     def transform(self, data, ispositive = False, positive_list = None):
 
         data = data.values
 
         values = []
-        mixed_counter = 0
 
         for id_, info in enumerate(self.meta):
             ## ? Insert here the code to check the data type of current column
@@ -295,49 +390,14 @@ class DataTransformer():
                 except Exception as e:
                     raise ValueError(f"Error parsing column {id_}: {e}")
             current = data[:, id_]
-            # import pdb; pdb.set_trace()
             if info['type'] == "continuous":
                 ## REVIEW 
                 if id_ not in self.general_columns:
-                  current = current.reshape([-1, 1])
-                  means = self.model[id_].means_.reshape((1, self.n_clusters))
-                  stds = np.sqrt(self.model[id_].covariances_).reshape((1, self.n_clusters))
-                  features = np.empty(shape=(len(current),self.n_clusters))
-                  if ispositive == True:
-                      if id_ in positive_list:
-                          features = np.abs(current - means) / (4 * stds)
-                  else:
-                      features = (current - means) / (4 * stds)
-
-                  probs = self.model[id_].predict_proba(current.reshape([-1, 1]))
-                  n_opts = sum(self.components[id_])
-                  features = features[:, self.components[id_]]
-                  probs = probs[:, self.components[id_]]
-
-                  opt_sel = np.zeros(len(data), dtype='int')
-                  for i in range(len(data)):
-                      pp = probs[i] + 1e-6
-                      pp = pp / sum(pp)
-                      opt_sel[i] = np.random.choice(np.arange(n_opts), p=pp)
-
-                  idx = np.arange((len(features)))
-                  features = features[idx, opt_sel].reshape([-1, 1])
-                  features = np.clip(features, -.99, .99) 
-                  probs_onehot = np.zeros_like(probs)
-                  probs_onehot[np.arange(len(probs)), opt_sel] = 1
-
-                  re_ordered_phot = np.zeros_like(probs_onehot)
-                  
-                  col_sums = probs_onehot.sum(axis=0)
-                  
-
-                  n = probs_onehot.shape[1]
-                  largest_indices = np.argsort(-1*col_sums)[:n]
-                  self.ordering.append(largest_indices)
-                  for id,val in enumerate(largest_indices):
-                      re_ordered_phot[:,id] = probs_onehot[:,val]
-                
-                  values += [features, re_ordered_phot]
+                  features, opt_sel, n_opts = self._normalize(id_, self.model[id_], current,
+                                                              ispositive, positive_list)
+                  onehot, order = ordered_onehot(opt_sel, n_opts)
+                  self.ordering.append(order)
+                  values += [features, onehot]
                   
                 else:
                   
@@ -353,141 +413,76 @@ class DataTransformer():
                   values.append(current)
 
             elif info['type'] == "mixed":
-                    
+                modal = info['modal']
                 means_0 = self.model[id_][0].means_.reshape([-1])
                 stds_0 = np.sqrt(self.model[id_][0].covariances_).reshape([-1])
 
-                zero_std_list = []
-                means_needed = []
-                stds_needed = []
-
-                for mode in info['modal']:
-                    if mode!=-9999999:
-                        dist = []
-                        for idx,val in enumerate(list(means_0.flatten())):
-                            dist.append(abs(mode-val))
-                        index_min = np.argmin(np.array(dist))
-                        zero_std_list.append(index_min)
-                    else: continue
-
-                for idx in zero_std_list:
-                    means_needed.append(means_0[idx])
-                    stds_needed.append(stds_0[idx])
-                
-                
-                mode_vals = []
-
-                for i,j,k in zip(info['modal'],means_needed,stds_needed):
-                    this_val  = np.abs(i - j) / (4*k)
-                    mode_vals.append(this_val)
-                
-                if -9999999 in info["modal"]:
+                # the normalized value of each modal value, relative to the
+                # closest component of the mixture fitted with modal values:
+                zero_std_list = [np.argmin(np.abs(mode - means_0))
+                                 for mode in modal if mode != -9999999]
+                mode_vals = [np.abs(i - means_0[j]) / (4 * stds_0[j])
+                             for i, j in zip(modal, zero_std_list)]
+                if -9999999 in modal:
                     mode_vals.append(0)
-                
-                current = current.reshape([-1, 1])
-                filter_arr = self.filter_arr[mixed_counter]
-                current = current[filter_arr]
-                
-                means = self.model[id_][1].means_.reshape((1, self.n_clusters))
-                stds = np.sqrt(self.model[id_][1].covariances_).reshape((1, self.n_clusters))
-                features = np.empty(shape=(len(current),self.n_clusters))
-                if ispositive == True:
-                    if id_ in positive_list:
-                        features = np.abs(current - means) / (4 * stds)
-                else:
-                    features = (current - means) / (4 * stds)
-
-                probs = self.model[id_][1].predict_proba(current.reshape([-1, 1]))
-
-                n_opts = sum(self.components[id_]) # 8
-                features = features[:, self.components[id_]]
-                probs = probs[:, self.components[id_]]
-                
-                opt_sel = np.zeros(len(current), dtype='int')
-                for i in range(len(current)):
-                    pp = probs[i] + 1e-6
-                    pp = pp / sum(pp)
-                    opt_sel[i] = np.random.choice(np.arange(n_opts), p=pp)
-                idx = np.arange((len(features)))
-                features = features[idx, opt_sel].reshape([-1, 1])
-                features = np.clip(features, -.99, .99)
-                probs_onehot = np.zeros_like(probs)
-                probs_onehot[np.arange(len(probs)), opt_sel] = 1
-                extra_bits = np.zeros([len(current), len(info['modal'])])
-                temp_probs_onehot = np.concatenate([extra_bits,probs_onehot], axis = 1)
-                final = np.zeros([len(data), 1 + probs_onehot.shape[1] + len(info['modal'])])
-                features_curser = 0
-                for idx, val in enumerate(data[:, id_]):
-                    if val in info['modal']:
-                        category_ = list(map(info['modal'].index, [val]))[0]
-                        final[idx, 0] = mode_vals[category_]
-                        final[idx, (category_+1)] = 1
-                    
-                    else:
-                        final[idx, 0] = features[features_curser]
-                        final[idx, (1+len(info['modal'])):] = temp_probs_onehot[features_curser][len(info['modal']):]
-                        features_curser = features_curser + 1
-               
-                just_onehot = final[:,1:]
-                re_ordered_jhot= np.zeros_like(just_onehot)
-                n = just_onehot.shape[1]
-                col_sums = just_onehot.sum(axis=0)
-                largest_indices = np.argsort(-1*col_sums)[:n]
-                self.ordering.append(largest_indices)
-                for id,val in enumerate(largest_indices):
-                      re_ordered_jhot[:,id] = just_onehot[:,val]
-                final_features = final[:,0].reshape([-1, 1])
-                values += [final_features, re_ordered_jhot]
-                mixed_counter = mixed_counter + 1
+                mode_vals = np.array(mode_vals, dtype=float)
+
+                # index of the (first) equal modal value, -1 for the others:
+                category = np.full(len(data), -1)
+                for k in reversed(range(len(modal))):
+                    category[current == modal[k]] = k
+                is_modal = category >= 0
+
+                features, opt_sel, n_opts = self._normalize(id_, self.model[id_][1],
+                                                            current[~is_modal],
+                                                            ispositive, positive_list)
+                final = np.zeros([len(data), 1 + n_opts + len(modal)])
+                final[is_modal, 0] = mode_vals[category[is_modal]]
+                final[np.flatnonzero(is_modal), 1 + category[is_modal]] = 1
+                final[~is_modal, 0] = features[:, 0]
+                final[np.flatnonzero(~is_modal), 1 + len(modal) + opt_sel] = 1
+
+                onehot, order = ordered_onehot(final[:, 1:])
+                self.ordering.append(order)
+                values += [final[:, 0].reshape([-1, 1]), onehot]
     
             else:
                 self.ordering.append(None)
                 col_t = np.zeros([len(data), info['size']])
-                idx = list(map(info['i2s'].index, current))
+                idx = pd.Index(info['i2s']).get_indexer(current)
+                if (idx < 0).any():
+                    raise ValueError(f"Unknown category in column {id_}")
                 col_t[np.arange(len(data)), idx] = 1
                 values.append(col_t)
                 
         return np.concatenate(values, axis=1)
 
     def inverse_transform(self, data):
+        """Transform the generated data back to the original space.  Return
+        the data and a boolean mask of the valid rows, i.e. those with all
+        continuous and mixed values within the range of the training data."""
         data_t = np.zeros([len(data), len(self.meta)])
-        invalid_ids = []
+        valid = np.ones(len(data), dtype=bool)
         st = 0
         for id_, info in enumerate(self.meta):
             if info['type'] == "continuous":
                 if id_ not in self.general_columns:
+                  n_comp = np.sum(self.components[id_])
                   u = data[:, st]
-                  v = data[:, st + 1:st + 1 + np.sum(self.components[id_])]
-                  order = self.ordering[id_] 
-                  v_re_ordered = np.zeros_like(v)
-
-                  for id,val in enumerate(order):
-                      v_re_ordered[:,val] = v[:,id]
-                  
-                  v = v_re_ordered
+                  v = np.zeros([len(data), n_comp])
+                  v[:, self.ordering[id_]] = data[:, st + 1:st + 1 + n_comp]
 
                   u = np.clip(u, -1, 1)
                   v_t = np.ones((data.shape[0], self.n_clusters)) * -100
                   v_t[:, self.components[id_]] = v
-                  v = v_t
-                  st += 1 + np.sum(self.components[id_])
+                  st += 1 + n_comp
                   means = self.model[id_].means_.reshape([-1])
                   stds = np.sqrt(self.model[id_].covariances_).reshape([-1])
-                  p_argmax = np.argmax(v, axis=1)
-                  std_t = stds[p_argmax]
-                  mean_t = means[p_argmax]
-                  tmp = u * 4 * std_t + mean_t
-                                    
-                  for idx,val in enumerate(tmp):
-                    #  pdb.set_trace() 
-                    ## FIXME
-                    # stack_trace_396_241205.txt
-                    # (when called )
-                     if (val < info["min"]) | (val > info['max']):
-                         invalid_ids.append(idx)
-                  
+                  p_argmax = np.argmax(v_t, axis=1)
+                  tmp = u * 4 * stds[p_argmax] + means[p_argmax]
+                  valid &= ~((tmp < info['min']) | (tmp > info['max']))
+
                   if id_ in self.non_categorical_columns:
-                    
                     tmp = np.round(tmp)
                   
                   data_t[:, id_] = tmp
@@ -504,45 +499,32 @@ class DataTransformer():
                   st += 1
 
             elif info['type'] == "mixed":
-
+                n_modal = len(info['modal'])
+                n_comp = np.sum(self.components[id_])
                 u = data[:, st]
-                full_v = data[:,(st+1):(st+1)+len(info['modal'])+np.sum(self.components[id_])]
-                order = self.ordering[id_]
-                full_v_re_ordered = np.zeros_like(full_v)
+                full_v = np.zeros([len(data), n_modal + n_comp])
+                full_v[:, self.ordering[id_]] = data[:, (st+1):(st+1)+n_modal+n_comp]
 
-                for id,val in enumerate(order):
-                    full_v_re_ordered[:,val] = full_v[:,id]
-                  
-                full_v = full_v_re_ordered
-
-                
-                mixed_v = full_v[:,:len(info['modal'])]
-                v = full_v[:,-np.sum(self.components[id_]):]
+                mixed_v = full_v[:, :n_modal]
+                v = full_v[:, -n_comp:]
 
                 u = np.clip(u, -1, 1)
                 v_t = np.ones((data.shape[0], self.n_clusters)) * -100
                 v_t[:, self.components[id_]] = v
                 v = np.concatenate([mixed_v,v_t], axis=1)
 
-                st += 1 + np.sum(self.components[id_]) + len(info['modal'])
+                st += 1 + n_comp + n_modal
                 means = self.model[id_][1].means_.reshape([-1]) 
                 stds = np.sqrt(self.model[id_][1].covariances_).reshape([-1]) 
                 p_argmax = np.argmax(v, axis=1)
 
-                result = np.zeros_like(u)
-
-                for idx in range(len(data)):
-                    if p_argmax[idx] < len(info['modal']):
-                        argmax_value = p_argmax[idx]
-                        result[idx] = float(list(map(info['modal'].__getitem__, [argmax_value]))[0])
-                    else:
-                        std_t = stds[(p_argmax[idx]-len(info['modal']))]
-                        mean_t = means[(p_argmax[idx]-len(info['modal']))]
-                        result[idx] = u[idx] * 4 * std_t + mean_t
-                        
-                for idx,val in enumerate(result):
-                     if (val < info["min"]) | (val > info['max']):
-                         invalid_ids.append(idx)
+                # rows with a modal value take it, the others are
+                # denormalized with their mixture component:
+                is_mode = p_argmax < n_modal
+                comp = np.maximum(p_argmax - n_modal, 0)
+                result = u * 4 * stds[comp] + means[comp]
+                result[is_mode] = np.array(info['modal'], dtype=float)[p_argmax[is_mode]]
+                valid &= ~((result < info['min']) | (result > info['max']))
 
                 data_t[:, id_] = result
 
@@ -550,14 +532,9 @@ class DataTransformer():
                 current = data[:, st:st + info['size']]
                 st += info['size']
                 idx = np.argmax(current, axis=1)
-                data_t[:, id_] = list(map(info['i2s'].__getitem__, idx))
-            
-            
-        invalid_ids = np.unique(np.array(invalid_ids)) 
-        all_ids = np.arange(0,len(data))
-        valid_ids = list(set(all_ids) - set(invalid_ids))
-            
-        return data_t,len(invalid_ids) # change done per https://github.com/Team-TUD/CTAB-GAN-Plus/issues/7#issuecomment-1576690333
+                data_t[:, id_] = np.array(info['i2s'], dtype=object)[idx]
+
+        return data_t, valid # see also https://github.com/Team-TUD/CTAB-GAN-Plus/issues/7#issuecomment-1576690333
 
 
 class ImageTransformer():
@@ -0,0 +1,88 @@
+'''Tuning of the univariate distributions of the Gaussian Copula model.
+
+The marginal distributions of a Gaussian Copula model are the univariate
+distributions fitted to its (preprocessed) columns; the copula only couples
+them.  Hence each candidate distribution can be fitted and scored per column,
+without fitting, sampling and evaluating complete models.'''
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sdmetrics.single_column import KSComplement, TVComplement
+from sdv.single_table.copulas import GaussianCopulaSynthesizer
+
+from ASyH.data import Data
+from ASyH.utils import default_workers
+
+# sdtypes scored by sdmetrics' Column Shapes property with TVComplement; they
+# are modelled with the default distribution:
+DISCRETE_SDTYPES = ('categorical', 'boolean')
+
+
+def score_distribution(distribution, processed, real, transformer, metric, seed=42):
+    '''Fit the univariate distribution named distribution to the preprocessed
+    column, sample as many values, transform them back with the column's
+    transformer and return the score of the sdmetrics single-column metric
+    (KSComplement or TVComplement) comparing them with the real column.  A
+    distribution which fails to fit scores 0.0.'''
+    np.random.seed(seed)
+    univariate = GaussianCopulaSynthesizer._DISTRIBUTIONS[distribution]()
+    try:
+        univariate.fit(processed.to_numpy())
+        samples = pd.DataFrame({processed.name: univariate.sample(len(processed))})
+    except Exception:  # like SDV, fall back to other distributions
+        return 0.0
+    synthetic = transformer.reverse_transform(samples)[real.name]
+    return metric.compute(real, synthetic)
+
+
+def tune_distributions(data: Data,
+                       synthesizer_class=GaussianCopulaSynthesizer,
+                       sample_rows: Optional[int] = None,
+                       max_workers: Optional[int] = None) -> Dict[str, object]:
+    '''Return the arguments numerical_distributions, i.e. the best-scoring
+    distribution per numerical column, and default_distribution, the one
+    scoring best on average over the categorical and boolean columns (if
+    any), for a synthesizer_class model of data.
+
+    With sample_rows, the distributions are fitted and scored on a random
+    subsample of that many rows.  The (column, distribution) pairs are scored
+    in parallel by max_workers processes (default: ASyH.utils.default_workers()).'''
+    synthesizer = synthesizer_class(metadata=data.sdv_metadata)
+    processed = synthesizer.preprocess(data.data)
+    transformers = synthesizer.get_transformers()
+    real = data.data.loc[processed.index]
+    if sample_rows is not None and sample_rows < len(processed):
+        rows = np.random.default_rng(42).choice(len(processed), sample_rows, replace=False)
+        processed, real = processed.iloc[rows], real.iloc[rows]
+
+    metadata = data.metadata
+    numerical = [col for col in metadata.variables_by_type('numerical')
+                 if col in processed.columns and transformers.get(col) is not None]
+    discrete = [col for sdtype in DISCRETE_SDTYPES
+                for col in metadata.variables_by_type(sdtype)
+                if col in processed.columns and transformers.get(col) is not None]
+    distributions = list(GaussianCopulaSynthesizer._DISTRIBUTIONS)
+    tasks = [(dist, col) for col in numerical + discrete for dist in distributions]
+
+    if max_workers is None:
+        max_workers = default_workers()
+    arguments = [(dist, processed[col], real[col], transformers[col],
+                  KSComplement if col in numerical else TVComplement)
+                 for dist, col in tasks]
+    if max_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+            scores = list(pool.map(score_distribution, *zip(*arguments)))
+    else:
+        scores = [score_distribution(*args) for args in arguments]
+    scores = dict(zip(tasks, scores))
+
+    numerical_distributions = {col: max(distributions, key=lambda dist: scores[(dist, col)])
+                               for col in numerical}
+    tuned = {'numerical_distributions': numerical_distributions}
+    if discrete:
+        tuned['default_distribution'] = max(
+            distributions,
+            key=lambda dist: np.mean([scores[(dist, col)] for col in discrete]))
+    return tuned
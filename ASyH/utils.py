@@ -1,4 +1,6 @@
+import hashlib
 import inspect
+import os
 from typing import Dict, Any
 import pandas as pd
 from ASyH.data import Data
@@ -26,6 +28,35 @@ def flatten_dict(indict: Dict[str, Any],
     return dict(items)
 
 
+def available_cpus() -> list:
+    '''Return the sorted list of CPUs the calling process may run on.'''
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def default_workers() -> int:
+    '''Return the default number of worker processes for a parallel step: the
+    number of available CPUs divided by the threads each worker process may
+    use, i.e. the thread limit of a dispatched pipeline (see
+    ASyH.dispatch.limit_threads()) which the workers inherit.'''
+    threads = int(os.environ.get('OMP_NUM_THREADS', 0)) or 1
+    return max(1, len(available_cpus()) // threads)
+
+
+def fingerprint(data: Data, functions=()) -> str:
+    '''Return a hash of the table in data (values, index, column names and
+    types) and of the names of the functions to be applied to it.'''
+    frame = data.data
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    digest.update(repr([(str(col), str(dtype))
+                        for col, dtype in frame.dtypes.items()]).encode())
+    for func in functions:
+        digest.update(f'{func.__module__}.{func.__qualname__}'.encode())
+    return digest.hexdigest()
+
+
 # ASyH static class for preprocessing functions
 class Utils:
 
@@ -206,22 +237,65 @@ class Utils:
         return col_maps
     
 
+    @staticmethod
+    def nearest_codes(values, codes) -> np.ndarray:
+        '''Return for each of the values the index of the closest of the codes,
+        the first one in case of ties (like find_closest), and 0 for NaN and
+        infinite values.'''
+        codes = np.asarray(codes, dtype=float)
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        right = np.clip(np.searchsorted(sorted_codes, values, side='left'),
+                        1, len(codes) - 1) if len(codes) > 1 else np.zeros(len(values), dtype=int)
+        left = np.maximum(right - 1, 0)
+        with np.errstate(invalid='ignore'):
+            take_left = values - sorted_codes[left] <= sorted_codes[right] - values
+        nearest = order[np.where(take_left, left, right)]
+        nearest[~np.isfinite(values)] = 0
+        return nearest
+
+
+    @staticmethod
+    def _decode_column(column, scaled, col_map) -> pd.Series:
+        '''Map the scaled values of a column to the labels of the closest codes
+        in col_map.'''
+        codes = list(col_map.keys())
+        labels = pd.Series([col_map[code] for code in codes])
+        decoded = pd.Series(labels.to_numpy()[Utils.nearest_codes(scaled, codes)],
+                            index=column.index, name=column.name)
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return decoded.astype('category')
+        return decoded
+
+
     @staticmethod
     def discretize_column(df, col_name, col_maps) -> pd.DataFrame:
-        discrete_values = np.array(list(col_maps[col_name].keys()))
-        df[col_name] = df[col_name].apply(lambda val: (val/max(df[col_name]) * max(discrete_values)))
-        df[col_name] = df[col_name].apply(lambda val: Utils.find_closest(val, discrete_values))
-        df[col_name] = df[col_name].apply(lambda val: col_maps[col_name][val])
+        '''Rescale the column to the range of codes in col_maps[col_name] and
+        replace its values by the labels of the closest codes.'''
+        values = df[col_name].to_numpy(dtype=float, na_value=np.nan)
+        scale = max(col_maps[col_name].keys())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = values / np.nanmax(values) * scale
+        df[col_name] = Utils._decode_column(df[col_name], scaled, col_maps[col_name])
         return df
     
 
     # apply the discretize_column function to all columns of interest in the dataframe df_forest
     @staticmethod
     def discretize_cols(df, categoric_cols, col_maps) -> pd.DataFrame:
-        # df = data.data
-        for col in categoric_cols:
-            df_forest = Utils.discretize_column(df, col, col_maps)
-        return df_forest
+        '''discretize_column() for all categoric_cols at once.'''
+        categoric_cols = list(categoric_cols)
+        if not categoric_cols:
+            return df
+        values = df[categoric_cols].to_numpy(dtype=float, na_value=np.nan)
+        scales = np.array([max(col_maps[col].keys()) for col in categoric_cols], dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = values / np.nanmax(values, axis=0) * scales
+        decoded = {col: Utils._decode_column(df[col], scaled[:, i], col_maps[col])
+                   for i, col in enumerate(categoric_cols)}
+        for col, column in decoded.items():
+            df[col] = column
+        return df
     
 
     @staticmethod
@@ -0,0 +1,2 @@
+'''Benchmarks of ASyH's hot paths on generated clinical-like tables, see
+suite.py; run with python -m benchmarks.'''
@@ -0,0 +1,60 @@
+'''Command line interface of the benchmark suite:
+
+    python -m benchmarks --rows 10000 --columns 20 --output results.json
+    python -m benchmarks --filter metrics. --compare baseline.json
+'''
+import argparse
+import sys
+
+from benchmarks import suite
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmark the hot paths of ASyH.')
+    parser.add_argument('--rows', type=int, default=10000, help='rows of the generated table')
+    parser.add_argument('--columns', type=int, default=20, help='columns of the generated table')
+    parser.add_argument('--categorical-share', type=float, default=0.3,
+                        help='share of categorical columns')
+    parser.add_argument('--datetime-share', type=float, default=0.1,
+                        help='share of datetime columns')
+    parser.add_argument('--cardinality', type=int, default=8,
+                        help='maximal number of categories of a categorical column')
+    parser.add_argument('--missing', type=float, default=0.05, help='share of missing values')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated table')
+    parser.add_argument('--filter', action='append', default=None,
+                        help='run only the benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions of each benchmark')
+    parser.add_argument('--epochs', type=int, default=10,
+                        help='training epochs of the models trained in epochs')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='JSON file to write the results to')
+    parser.add_argument('--compare', default=None,
+                        help='JSON file of earlier results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='relative slowdown reported as regression')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    names = [name for name in suite.BENCHMARKS
+             if args.filter is None or any(part in name for part in args.filter)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+    results = suite.run(names, repeat=args.repeat, epochs=args.epochs,
+                        rows=args.rows, columns=args.columns,
+                        categorical_share=args.categorical_share,
+                        datetime_share=args.datetime_share,
+                        cardinality=args.cardinality, missing=args.missing, seed=args.seed)
+    suite.save(results, args.output)
+    print(f'Results written to {args.output}')
+    if args.compare is None:
+        return 0
+    comparison = suite.compare(suite.load(args.compare), results, args.tolerance)
+    for name, ratio in comparison['ratios'].items():
+        print(f'{name}: {ratio:.2f}x' + (' REGRESSION' if name in comparison['regressions'] else ''))
+    return 1 if comparison['regressions'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
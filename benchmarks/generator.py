@@ -0,0 +1,82 @@
+'''Generator of synthetic clinical-like tables to benchmark ASyH with.
+
+The tables mix numerical measurements (normal, log-normal and integer
+counts, partly correlated through a latent severity), categorical codes of
+configurable cardinality with skewed frequencies, and dates around an
+admission date, with a configurable share of missing values.'''
+from typing import Optional
+
+import numpy
+import pandas
+
+from ASyH.data import Data
+from ASyH.metadata import Metadata
+
+DATETIME_FORMAT = '%Y-%m-%d'
+
+
+def clinical_table(rows: int = 10000,
+                   columns: int = 20,
+                   categorical_share: float = 0.3,
+                   cardinality: int = 8,
+                   missing: float = 0.05,
+                   datetime_share: float = 0.1,
+                   numeric_codes: bool = False,
+                   seed: Optional[int] = 0) -> Data:
+    '''Return a Data object with a table of rows rows and columns columns
+    and its metadata.  categorical_share and datetime_share of the columns
+    are categorical and datetime columns, the others numerical; categorical
+    columns have up to cardinality categories, labels like 'c3' or the codes
+    themselves if numeric_codes is True.  The share missing of the values of
+    each column except the first one is missing.'''
+    assert rows > 0 and columns > 0, 'rows and columns should be positive'
+    assert 0.0 <= categorical_share + datetime_share <= 1.0, \
+        'categorical_share and datetime_share should add up to at most 1'
+    assert cardinality >= 2, 'cardinality should be at least 2'
+    assert 0.0 <= missing < 1.0, 'missing should be in [0, 1)'
+    rng = numpy.random.default_rng(seed)
+    n_categorical = int(round(columns * categorical_share))
+    n_datetime = int(round(columns * datetime_share))
+    n_numerical = columns - n_categorical - n_datetime
+
+    severity = rng.normal(size=rows)  # shared by the columns, correlates them
+    admission = pandas.Timestamp('2020-01-01') \
+        + pandas.to_timedelta(rng.integers(0, 3 * 365, rows), unit='D')
+    frame = {}
+    metadata = {}
+    for i in range(n_numerical):
+        kind = i % 3
+        weight = rng.uniform(-1.0, 1.0)
+        if kind == 0:  # e.g. blood pressure
+            values = rng.normal(100.0, 15.0, rows) + 10.0 * weight * severity
+        elif kind == 1:  # e.g. laboratory values
+            values = numpy.exp(rng.normal(1.0, 0.5, rows) + 0.3 * weight * severity)
+        else:  # e.g. days in hospital
+            values = rng.poisson(numpy.exp(1.0 + 0.5 * numpy.abs(weight) * severity.clip(-2, 2)))
+        frame[f'num_{i}'] = values.astype(float)
+        metadata[f'num_{i}'] = {'sdtype': 'numerical'}
+    for i in range(n_categorical):
+        n_categories = int(rng.integers(2, cardinality + 1))
+        # skewed frequencies, shifted by the severity:
+        logits = -numpy.arange(n_categories) * rng.uniform(0.2, 1.0)
+        scores = logits + rng.gumbel(size=(rows, n_categories)) \
+            + numpy.outer(severity, rng.normal(0.0, 0.5, n_categories))
+        codes = scores.argmax(axis=1)
+        if numeric_codes:
+            frame[f'cat_{i}'] = codes.astype(float)
+        else:
+            frame[f'cat_{i}'] = numpy.array([f'c{code}' for code in range(n_categories)],
+                                            dtype=object)[codes]
+        metadata[f'cat_{i}'] = {'sdtype': 'categorical'}
+    for i in range(n_datetime):
+        if i == 0:
+            dates = admission
+        else:
+            dates = admission + pandas.to_timedelta(rng.integers(-30, 60, rows), unit='D')
+        frame[f'date_{i}'] = dates.strftime(DATETIME_FORMAT)
+        metadata[f'date_{i}'] = {'sdtype': 'datetime', 'datetime_format': DATETIME_FORMAT}
+
+    frame = pandas.DataFrame(frame)
+    for column in frame.columns[1:]:
+        frame.loc[rng.random(rows) < missing, column] = numpy.nan
+    return Data(frame, metadata=Metadata(metadata={'columns': metadata}))
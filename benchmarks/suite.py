@@ -0,0 +1,335 @@
+'''Timed benchmarks of ASyH's hot paths on generated tables.
+
+Each benchmark prepares its input (untimed) and times one call, repeated a
+number of times.  The results (wall time, CPU time and peak RSS of each
+repetition, see ASyH.instrumentation) are stored as JSON together with the
+versions of ASyH and its main dependencies, so that the results of two
+versions can be compared with compare().'''
+import copy
+import datetime
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import traceback
+from importlib import metadata as importlib_metadata
+from typing import Callable, Dict, Optional
+
+from ASyH.data import Data
+from ASyH.instrumentation import measure
+from ASyH.utils import Utils
+
+from benchmarks.generator import clinical_table
+
+# name => function(context) returning (prepare, run): run(*prepare()) is timed
+BENCHMARKS: Dict[str, Callable] = {}
+
+# the rows of the anonymity metrics comparing all pairs of rows:
+PAIRWISE_ROWS = 2000
+
+PACKAGES = ('ASyH', 'numpy', 'pandas', 'scikit-learn', 'scipy', 'sdv', 'sdmetrics',
+            'rdt', 'ctgan', 'torch')
+
+
+def benchmark(name: str):
+    '''Decorator registering a benchmark under name.'''
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def _attribute(module: str, name: str):
+    '''module.name, imported when a benchmark runs: a missing optional
+    dependency only fails the benchmarks needing it.'''
+    return getattr(importlib.import_module(module), name)
+
+
+def _copy(data: Data) -> Data:
+    '''A copy of data with an empty cache.'''
+    return Data(data.data.copy(), metadata=data.metadata)
+
+
+class Context:
+    '''The tables of a benchmark run, generated on first use: the table,
+    another one as its synthetic counterpart, and both with numeric codes
+    for categorical columns and after ASyH's preprocessing (dates converted,
+    imputed).'''
+
+    def __init__(self, epochs: int = 10, **table_args):
+        self.epochs = epochs
+        self.table_args = table_args
+        self._tables = {}
+        self._models = {}
+        # for the files written by the benchmarks:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory.name, filename)
+
+    def table(self, numeric_codes=False, synthetic=False) -> Data:
+        key = ('table', numeric_codes, synthetic)
+        if key not in self._tables:
+            args = dict(self.table_args, numeric_codes=numeric_codes)
+            args['seed'] = args.get('seed', 0) + (1 if synthetic else 0)
+            self._tables[key] = clinical_table(**args)
+        return self._tables[key]
+
+    def prepared(self) -> Data:
+        '''The numeric table after the Application's preprocessing.'''
+        if 'prepared' not in self._tables:
+            data = Utils.convert_all_dates(_copy(self.table(numeric_codes=True)))
+            self._tables['prepared'] = Utils.impute(data)
+        return self._tables['prepared']
+
+    def model(self, model_class):
+        '''A new model of model_class for the prepared table, with the
+        benchmark's number of epochs.'''
+        model = model_class(data=self.prepared())
+        if model.epochs is not None:
+            model.set_epochs(self.epochs)
+        return model
+
+    def trained_model(self, model_class):
+        if model_class not in self._models:
+            model = self.model(model_class)
+            model._train()
+            self._models[model_class] = model
+        return self._models[model_class]
+
+
+# data and preprocessing:
+
+@benchmark('data.read_csv')
+def read_csv(context):
+    path = context.path('table.csv')
+    context.table().data.to_csv(path, index=False)
+    return tuple, lambda: Data().read(path)
+
+
+@benchmark('data.read_excel')
+def read_excel(context):
+    path = context.path('table.xlsx')
+    context.table().data.to_excel(path, index=False)
+    return tuple, lambda: Data().read(path)
+
+
+@benchmark('utils.convert_all_dates')
+def convert_all_dates(context):
+    # converts the data frame in place:
+    return lambda: (_copy(context.table()),), Utils.convert_all_dates
+
+
+@benchmark('utils.impute')
+def impute(context):
+    data = Utils.convert_all_dates(_copy(context.table(numeric_codes=True)))
+    return lambda: (data,), Utils.impute
+
+
+@benchmark('utils.discretize_column')
+def discretize_column(context):
+    data = context.table(numeric_codes=True)
+    columns = data.metadata.variables_by_type('categorical')
+    col_maps = Utils.generate_col_maps(data, columns)
+    # synthetic values of a categorical column, i.e. continuous:
+    frame = context.prepared().data
+
+    def prepare():
+        return (frame.copy(),)
+    return prepare, lambda df: [Utils.discretize_column(df, col, col_maps) for col in columns]
+
+
+# models:
+
+def _model_benchmarks(name):
+    @benchmark(f'models.{name}.fit')
+    def fit(context):
+        model_class = _attribute('ASyH.models', f'{name}Model')
+        return lambda: (context.model(model_class),), lambda model: model._train()
+
+    @benchmark(f'models.{name}.sample')
+    def sample(context):
+        model = context.trained_model(_attribute('ASyH.models', f'{name}Model'))
+        return tuple, lambda: model.synthesize(len(context.prepared().data))
+
+
+for _name in ('TVAE', 'CTGAN', 'CopulaGAN', 'GaussianCopula'):
+    _model_benchmarks(_name)
+
+
+@benchmark('models.ForestFlow.fit')
+def forest_flow_fit(context):
+    forest_flow = _attribute('ASyH.models', 'ForestFlowModel')
+    data = context.table(numeric_codes=True)
+
+    def prepare():
+        model = forest_flow(data=_copy(data))
+        if model.epochs is not None:
+            model.set_epochs(context.epochs)
+        return model, model.transform_data_prep(_copy(data))
+    return prepare, lambda model, prepared: model._train(data=prepared)
+
+
+@benchmark('models.ForestFlow.sample')
+def forest_flow_sample(context):
+    forest_flow = _attribute('ASyH.models', 'ForestFlowModel')
+    data = context.table(numeric_codes=True)
+    model = forest_flow(data=_copy(data))
+    if model.epochs is not None:
+        model.set_epochs(context.epochs)
+    model._train(data=model.transform_data_prep(_copy(data)))
+    return tuple, lambda: model.synthesize(len(data.data), data=_copy(data))
+
+
+# the CTAB-GAN transformer:
+
+def _ctabgan_transformer(context):
+    transformer_class = _attribute('ASyH.transformer_ctabgan', 'DataTransformer')
+    data = context.prepared()
+    columns = list(data.data.columns)
+    categorical = [columns.index(col) for col in data.metadata.variables_by_type('categorical')]
+    return transformer_class(train_data=data.data, categorical_list=categorical,
+                             mixed_dict={}, general_list=[],
+                             non_categorical_list=[i for i in range(len(columns))
+                                                   if i not in categorical])
+
+
+@benchmark('transformer_ctabgan.fit')
+def ctabgan_fit(context):
+    return lambda: (_ctabgan_transformer(context),), lambda transformer: transformer.fit()
+
+
+@benchmark('transformer_ctabgan.transform')
+def ctabgan_transform(context):
+    transformer = _ctabgan_transformer(context)
+    transformer.fit()
+    # transform() keeps its state in the transformer:
+    return lambda: (copy.deepcopy(transformer),), \
+        lambda transformer: transformer.transform(context.prepared().data)
+
+
+# metrics, each with a cold cache of the real data's statistics:
+
+def _metric_benchmark(name, module, rows=None):
+    '''Register the benchmark metrics.name of the metric module.function,
+    the last part of name.'''
+    @benchmark(f'metrics.{name}')
+    def run(context):
+        metric = _attribute(module, name.split('.')[-1])
+        real, synth = context.table(), context.table(synthetic=True)
+        if rows is not None:
+            real = Data(real.data.iloc[:rows], metadata=real.metadata)
+            synth = Data(synth.data.iloc[:rows], metadata=synth.metadata)
+        return lambda: (_copy(real), synth), metric
+
+
+for _name in ('kstest', 'cstest'):
+    _metric_benchmark(f'univariate_statistics.{_name}', 'ASyH.metrics.univariate_statistics')
+for _name in ('pc_comparison', 'pearsonr_comparison', 'spearmanr_comparison'):
+    _metric_benchmark(f'bivariate_statistics.{_name}', 'ASyH.metrics.bivariate_statistics')
+for _name in ('mean_pairwise_distance', 'maximum_cosine_similarity'):
+    _metric_benchmark(f'anonymity.{_name}', 'ASyH.metrics.anonymity', rows=PAIRWISE_ROWS)
+for _name in ('dcr_score', 'nndr_score'):
+    _metric_benchmark(f'privacy.{_name}', 'ASyH.metrics.privacy')
+_metric_benchmark('quality.quality_score', 'ASyH.metrics.quality')
+_metric_benchmark('sdmetrics_quality', 'ASyH.App')
+
+
+@benchmark('report.generate')
+def report_generate(context):
+    report_class = _attribute('ASyH.report', 'Report')
+    real, synth = context.table(), context.table(synthetic=True)
+
+    def prepare():
+        return (report_class(input_data=real.data, synthetic_data=synth.data,
+                             metadata=real.metadata.metadata),)
+
+    def generate(report):
+        # the report writes its files to the working directory:
+        cwd = os.getcwd()
+        os.chdir(context.directory.name)
+        try:
+            report.generate('benchmark', 'none')
+        finally:
+            os.chdir(cwd)
+    return prepare, generate
+
+
+def environment() -> dict:
+    '''Versions of Python, the platform and the packages in PACKAGES.'''
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = importlib_metadata.version(package)
+        except importlib_metadata.PackageNotFoundError:
+            versions[package] = None
+    return {'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+            'packages': versions}
+
+
+def _run(name, context, repeat) -> dict:
+    '''The result of the benchmark name, or its error.'''
+    print(f'Benchmark {name} ...')
+    try:
+        prepare, function = BENCHMARKS[name](context)
+        records = []
+        for _ in range(repeat):
+            _, record = measure(function, *prepare())
+            records.append(record)
+    except Exception:  # keep the other benchmarks' results
+        print(f'Benchmark {name} failed')
+        return {'error': traceback.format_exc()}
+    wall_times = [record['wall_time'] for record in records]
+    print(f'Benchmark {name}: {min(wall_times):.3f}s')
+    return {'wall_time': wall_times,
+            'cpu_time': [record['cpu_time'] for record in records],
+            'peak_rss': max((record['peak_rss'] or 0) for record in records) or None,
+            'min_wall_time': min(wall_times),
+            'median_wall_time': statistics.median(wall_times)}
+
+
+def run(names=None, repeat: int = 3, epochs: int = 10, **table_args) -> dict:
+    '''Run the benchmarks names (default: all) repeat times each on tables
+    generated with table_args (see clinical_table()) and return the
+    results.  A failing benchmark is reported with its error instead.'''
+    context = Context(epochs=epochs, **table_args)
+    results = {}
+    try:
+        for name in names if names is not None else BENCHMARKS:
+            results[name] = _run(name, context, repeat)
+    finally:
+        context.directory.cleanup()
+    return {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'environment': environment(),
+            'parameters': {'repeat': repeat, 'epochs': epochs, **table_args},
+            'benchmarks': results}
+
+
+def save(results: dict, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+
+def load(path) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, results: dict, tolerance: float = 0.1) -> dict:
+    '''Ratios of the minimal wall times of the benchmarks in results to the
+    ones in baseline, for the benchmarks which ran in both; those with a
+    ratio above 1 + tolerance are regressions.'''
+    ratios = {}
+    for name, result in results['benchmarks'].items():
+        old: Optional[dict] = baseline['benchmarks'].get(name)
+        if old is None or 'error' in old or 'error' in result or old['min_wall_time'] <= 0:
+            continue
+        ratios[name] = result['min_wall_time'] / old['min_wall_time']
+    return {'ratios': ratios,
+            'regressions': [name for name, ratio in ratios.items() if ratio > 1.0 + tolerance]}
@@ -0,0 +1,80 @@
+import gower
+import numpy
+import pandas
+from pandas import DataFrame
+
+from ASyH import Metadata
+from ASyH.data import Data
+from ASyH.metrics.anonymity import _mixed_cosine, maximum_cosine_similarity, \
+    mean_pairwise_distance
+
+
+EXAMPLE_METADATA = Metadata(metadata={
+    'columns': {
+        'sex': {'sdtype': 'categorical'},
+        'smoker': {'sdtype': 'categorical'},
+        'height': {'sdtype': 'numerical'},
+        'weight': {'sdtype': 'numerical'},
+    },
+})
+
+
+def example_data(n_rows, seed):
+    rng = numpy.random.default_rng(seed)
+    height = rng.normal(1.75, 0.1, n_rows)
+    height[rng.random(n_rows) < 0.2] = numpy.nan
+    smoker = numpy.array(rng.choice(['y', 'n'], n_rows), dtype=object)
+    smoker[rng.random(n_rows) < 0.2] = None
+    smoker[rng.random(n_rows) < 0.1] = numpy.nan
+    return Data(data=DataFrame(data={
+        'sex': rng.choice(['m', 'f', 'd'], n_rows),
+        'smoker': smoker,
+        'height': height,
+        'weight': rng.normal(75.0, 10.0, n_rows),
+    }), metadata=EXAMPLE_METADATA)
+
+
+def reference_maximum(orig_data, synth_data):
+    '''Maximum of the mixed cosines of all pairs of rows, one by one.'''
+    numerical = ['height', 'weight']
+    categorical = ['sex', 'smoker']
+    best = (-numpy.inf, None, None)
+    for i, (_, a) in enumerate(orig_data.data.iterrows()):
+        for j, (_, b) in enumerate(synth_data.data.iterrows()):
+            cosine = _mixed_cosine(a[numerical].to_numpy(dtype=float),
+                                   a[categorical].to_numpy(dtype=object),
+                                   b[numerical].to_numpy(dtype=float),
+                                   b[categorical].to_numpy(dtype=object))
+            if cosine > best[0]:
+                best = (cosine, i, j)
+    return best
+
+
+def test_maximum_cosine_similarity():
+    orig, synth = example_data(40, seed=0), example_data(30, seed=1)
+    expected, i, j = reference_maximum(orig, synth)
+    for n_jobs, block_size in [(1, None), (1, 50), (3, 50)]:
+        cosine, i_found, j_found = maximum_cosine_similarity(
+            orig, synth, n_jobs=n_jobs, block_size=block_size, return_indices=True)
+        assert numpy.isclose(cosine, expected)
+        assert (i_found, j_found) == (i, j)
+    assert numpy.isclose(maximum_cosine_similarity(orig, synth), expected)
+
+
+def test_maximum_cosine_similarity_unspecified():
+    metadata = Metadata(metadata={'columns': {'sex': {'sdtype': 'categorical'}}})
+    orig = Data(data=DataFrame(data={'sex': [None]}), metadata=metadata)
+    synth = Data(data=DataFrame(data={'sex': ['m']}), metadata=metadata)
+    assert numpy.isnan(maximum_cosine_similarity(orig, synth))
+
+
+def test_mean_pairwise_distance():
+    orig, synth = example_data(40, seed=0), example_data(30, seed=1)
+    union = numpy.asarray(pandas.concat([orig.data, synth.data]), dtype=object)
+    matrix = gower.gower_matrix(union, cat_features=[True, True, False, False])
+    matrix = matrix[:40, 40:]
+    expected = matrix[~numpy.isnan(matrix)].mean()
+    for n_jobs, tile_rows in [(1, None), (1, 1), (3, 7)]:
+        assert numpy.isclose(mean_pairwise_distance(orig, synth, n_jobs=n_jobs,
+                                                    tile_rows=tile_rows),
+                             expected)
@@ -0,0 +1,53 @@
+import math
+
+import numpy
+from pandas import DataFrame
+
+from ASyH import Metadata
+from ASyH.data import Data
+from ASyH.metrics.bivariate_statistics import comparison, cosine_comparator, \
+    pc_comparison, pearson_correlation, pearsonr_comparison, principal_components, \
+    spearman_correlation, spearmanr_comparison
+
+
+EXAMPLE_METADATA = Metadata(metadata={
+    'columns': {
+        'a': {'sdtype': 'numerical'},
+        'b': {'sdtype': 'numerical'},
+        'c': {'sdtype': 'numerical'},
+        'd': {'sdtype': 'numerical'},
+        'sex': {'sdtype': 'categorical'},
+    },
+})
+
+
+def example_data(seed):
+    rng = numpy.random.default_rng(seed)
+    base = rng.normal(size=300)
+    return Data(data=DataFrame(data={
+        'a': base + rng.normal(0.0, 0.1, 300),
+        'b': -base + rng.normal(0.0, 2.0, 300),
+        'c': rng.normal(size=300),
+        'd': rng.integers(0, 5, 300),
+        'sex': rng.choice(['m', 'f'], 300),
+    }), metadata=EXAMPLE_METADATA)
+
+
+def relative_difference(x, y):
+    return math.fabs(x-y)/(1, x)[x != 0]
+
+
+def assert_same(results, expected):
+    assert list(results) == list(expected)
+    for key, value in expected.items():
+        assert numpy.isclose(results[key], value), key
+
+
+def test_matrix_comparisons():
+    real, synthetic = example_data(0), example_data(1)
+    assert_same(pearsonr_comparison(real, synthetic),
+                comparison(real, synthetic, pearson_correlation, relative_difference))
+    assert_same(spearmanr_comparison(real, synthetic),
+                comparison(real, synthetic, spearman_correlation, relative_difference))
+    assert_same(pc_comparison(real, synthetic),
+                comparison(real, synthetic, principal_components, cosine_comparator))
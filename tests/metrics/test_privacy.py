@@ -0,0 +1,70 @@
+import numpy
+from pandas import DataFrame
+
+from ASyH import Metadata
+from ASyH.data import Data
+from ASyH.metrics.privacy import RealRowIndex, dcr_score, \
+    distance_to_closest_record, nearest_neighbour_distance_ratio, nndr_score, real_row_index
+
+
+EXAMPLE_METADATA = Metadata(metadata={
+    'columns': {
+        'name': {'sdtype': 'id'},
+        'sex': {'sdtype': 'categorical'},
+        'height': {'sdtype': 'numerical'},
+    },
+})
+
+EXAMPLE_DATA_A = Data(
+    data=DataFrame(data={
+        'name': ['Albert', 'Berta', 'Charlie', 'Dorothea'],
+        'sex':  ['m', 'f', 'm', 'f'],
+        'height': [1.80, 1.60, 1.75, 1.78],
+    }),
+    metadata=EXAMPLE_METADATA
+)
+
+EXAMPLE_DATA_B = Data(
+    data=DataFrame(data={
+        'name': ['Emil', 'Frida', 'Gustav'],
+        'sex':  ['m', 'f', 'x'],
+        'height': [1.80, 1.30, numpy.nan],
+    }),
+    metadata=EXAMPLE_METADATA
+)
+
+
+def test_encode():
+    index = RealRowIndex(EXAMPLE_DATA_A)
+    points = index.encode(EXAMPLE_DATA_B)
+    # scaled height, its missing indicator, one-hot sex (m, f):
+    assert points.shape == (3, 4)
+    assert numpy.allclose(points[:, 0], [1.0, -1.5, 0.0])
+    assert numpy.allclose(points[:, 1], [0.0, 0.0, 1.0])
+    assert numpy.allclose(points[2, 2:], 0.0)  # unknown category
+    # different categories are at distance 1:
+    assert numpy.isclose(numpy.linalg.norm(index.points[0] - index.points[3]) ** 2,
+                         1.0 + ((1.80 - 1.78) / 0.2) ** 2)
+
+
+def test_distance_to_closest_record():
+    index = RealRowIndex(EXAMPLE_DATA_A)
+    points = index.encode(EXAMPLE_DATA_B)
+    brute_force = numpy.linalg.norm(points[:, None, :] - index.points[None, :, :], axis=2)
+    for n_jobs in [1, 2]:
+        distances = distance_to_closest_record(EXAMPLE_DATA_A, EXAMPLE_DATA_B, n_jobs=n_jobs)
+        assert numpy.allclose(distances, brute_force.min(axis=1))
+    assert distances[0] == 0.0  # Emil copies Albert
+
+    ratios = nearest_neighbour_distance_ratio(EXAMPLE_DATA_A, EXAMPLE_DATA_B)
+    assert numpy.all((ratios >= 0) & (ratios <= 1))
+    assert ratios[0] == 0.0
+
+
+def test_scores():
+    assert dcr_score(EXAMPLE_DATA_A, EXAMPLE_DATA_A) == 0.0
+    assert dcr_score(EXAMPLE_DATA_A, EXAMPLE_DATA_B) == 2 / 3
+    # the distances among the real rows are kept in the shared index:
+    index = real_row_index(EXAMPLE_DATA_A)
+    assert index.nearest_other_distances() is index.nearest_other_distances()
+    assert 0.0 <= nndr_score(EXAMPLE_DATA_A, EXAMPLE_DATA_B) <= 1.0
@@ -0,0 +1,59 @@
+import numpy
+import sdmetrics.reports.single_table
+from pandas import DataFrame
+
+from ASyH import Metadata
+from ASyH.data import Data
+from ASyH.metrics import quality
+
+
+EXAMPLE_METADATA = Metadata(metadata={
+    'columns': {
+        'a': {'sdtype': 'numerical'},
+        'b': {'sdtype': 'numerical'},
+        'c': {'sdtype': 'numerical'},
+        'sex': {'sdtype': 'categorical'},
+        'smoker': {'sdtype': 'boolean'},
+        'zip': {'sdtype': 'categorical'},
+    },
+})
+
+
+def example_data(seed, n_rows):
+    rng = numpy.random.default_rng(seed)
+    base = rng.normal(size=n_rows)
+    return Data(data=DataFrame(data={
+        'a': base,
+        'b': seed * base + rng.normal(0.0, 0.5, n_rows),
+        'c': rng.integers(0, 10, n_rows),
+        'sex': rng.choice(['m', 'f', 'd'][:2 + seed], n_rows),
+        'smoker': rng.random(n_rows) < 0.3,
+        'zip': rng.integers(0, 400, n_rows).astype(str),
+    }), metadata=EXAMPLE_METADATA)
+
+
+def test_quality_score():
+    real, synth = example_data(0, 500), example_data(1, 400)
+    report = sdmetrics.reports.single_table.QualityReport()
+    report.generate(real.data, synth.data, EXAMPLE_METADATA.metadata, verbose=False)
+    expected = report.get_properties().set_index('Property')['Score']
+
+    properties = quality.quality_properties(real, synth)
+    for name in ['Column Shapes', 'Column Pair Trends']:
+        assert numpy.isclose(properties[name], expected[name])
+    assert numpy.isclose(quality.quality_score(real, synth), report.get_score())
+
+
+def test_quality_score_large_tables():
+    real, synth = example_data(0, 500), example_data(1, 400)
+    expected = quality.column_pair_trends(real, synth)
+    # all contingency tables counted sparsely, one pair at a time:
+    real = Data(real.data, metadata=EXAMPLE_METADATA)
+    max_pair_cells, quality.MAX_PAIR_CELLS = quality.MAX_PAIR_CELLS, 1
+    try:
+        quality.precompute(real)
+        results = quality.column_pair_trends(real, synth)
+    finally:
+        quality.MAX_PAIR_CELLS = max_pair_cells
+    assert results.keys() == expected.keys()
+    assert numpy.allclose(list(results.values()), list(expected.values()))
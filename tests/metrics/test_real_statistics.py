@@ -0,0 +1,66 @@
+import pickle
+
+import numpy
+import scipy.stats
+from pandas import DataFrame
+
+from ASyH import Metadata
+from ASyH.data import Data
+from ASyH.metrics import quality
+from ASyH.metrics.bivariate_statistics import pearson_correlations, pearsonr_comparison
+from ASyH.metrics.real_statistics import precompute, real_statistics
+from ASyH.metrics.univariate_statistics import cstest, kstest
+
+
+EXAMPLE_METADATA = Metadata(metadata={
+    'columns': {
+        'a': {'sdtype': 'numerical'},
+        'b': {'sdtype': 'numerical'},
+        'sex': {'sdtype': 'categorical'},
+    },
+})
+
+
+def example_data(seed):
+    rng = numpy.random.default_rng(seed)
+    base = rng.normal(size=200)
+    return Data(data=DataFrame(data={
+        'a': base,
+        'b': base + rng.normal(0.0, 0.5, 200),
+        'sex': rng.choice(['m', 'f'], 200),
+    }), metadata=EXAMPLE_METADATA)
+
+
+def test_real_statistics_cached():
+    real, synth = example_data(0), example_data(1)
+    precompute(real, [kstest, cstest, pearsonr_comparison])
+    statistics = real_statistics(real)
+    assert numpy.array_equal(statistics.sorted_values('a'), numpy.sort(real.data['a']))
+    assert statistics.category_counts('sex') == dict(real.data['sex'].value_counts())
+
+    # the scoring functions use the cached results:
+    real.cache['real_statistics'][('matrix', pearson_correlations, ('a', 'b'))] = \
+        numpy.zeros((2, 2))
+    assert pearsonr_comparison(real, synth)['(a, b)'] > 0.5
+    expected = scipy.stats.kstest(real.data['a'], synth.data['a']).pvalue
+    assert numpy.isclose(kstest(real, synth)[0], expected)
+    assert 'sex' in cstest(real, synth)
+
+    # and travel with the data to the pipeline workers:
+    copied = pickle.loads(pickle.dumps(real))
+    assert copied.cache.keys() == real.cache.keys()
+
+    real.set_metadata(EXAMPLE_METADATA)
+    assert real.cache == {}
+
+
+def test_precompute_used_statistics():
+    real = example_data(0)
+    precompute(real, [kstest])
+    assert set(real.cache['real_statistics']) == {('sorted_values', 'a'), ('sorted_values', 'b')}
+    # ASyH's quality score shares the sorted values:
+    precompute(real, [quality.quality_score])
+    assert ('sorted_values', 'a') in real.cache['real_statistics']
+    assert not any(key[0].startswith('quality_sorted') for key in real.cache['real_statistics'])
+    assert numpy.isclose(quality.quality_score(real, example_data(1)),
+                         quality.quality_score(example_data(0), example_data(1)))
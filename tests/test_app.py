@@ -0,0 +1,53 @@
+import time
+
+import pandas
+import pytest
+
+from ASyH.App import Application
+from ASyH.data import Data
+from ASyH.hook import PreprocessHook
+
+
+def test_halving_rounds():
+    app = Application(selection='successive_halving', halving_eta=2)
+    assert app._halving_rounds(1) == 0
+    assert app._halving_rounds(2) == 1
+    assert app._halving_rounds(4) == 2
+    assert app._halving_rounds(5) == 3
+    app = Application(selection='successive_halving', halving_eta=3)
+    assert app._halving_rounds(5) == 2
+
+
+def test_halving_time_budget():
+    app = Application(selection='successive_halving', halving_eta=2, max_workers=4,
+                      time_budget=700.0)
+    # two rounds of 4 and 2 candidates, then the winner:
+    costs = app._stage_costs(4)
+    assert costs == [0.25, 0.5, 1.0]
+    app._deadline = time.monotonic() + 700.0
+    assert app._pipeline_budget(4, share=costs[0] / sum(costs)) == pytest.approx(100.0, abs=1.0)
+    assert app._pipeline_budget(1) == pytest.approx(700.0, abs=1.0)
+
+
+def test_unknown_selection():
+    with pytest.raises(AssertionError):
+        Application(selection='best_guess')
+
+
+def test_preprocessing_runs_once():
+    calls = []
+
+    def double(data):
+        calls.append(data)
+        return Data(data.data * 2, metadata=data.metadata)
+
+    app = Application()
+    app._preprocessing_hook = PreprocessHook()
+    app.add_preprocessing(double)
+    data = Data(pandas.DataFrame({'x': [1.0, 2.0]}))
+    prepared = app._prepare(data)
+    assert prepared.data['x'].tolist() == [2.0, 4.0]
+    assert app._prepare(Data(data.data.copy())) is prepared
+    assert len(calls) == 1
+    assert app._prepare(Data(data.data + 1)) is not prepared
+    assert len(calls) == 2
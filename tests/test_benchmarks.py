@@ -0,0 +1,31 @@
+from benchmarks.generator import clinical_table
+from benchmarks.suite import BENCHMARKS, compare
+
+
+def test_clinical_table():
+    data = clinical_table(rows=500, columns=10, categorical_share=0.3, datetime_share=0.2,
+                          cardinality=4, missing=0.1)
+    assert data.data.shape == (500, 10)
+    assert len(data.metadata.variables_by_type('categorical')) == 3
+    assert len(data.metadata.variables_by_type('datetime')) == 2
+    assert data.data['cat_0'].dropna().isin(['c0', 'c1', 'c2', 'c3']).all()
+    assert data.data.iloc[:, 0].notna().all()
+    assert 0.05 < data.data.iloc[:, 1:].isna().mean().mean() < 0.15
+    # reproducible:
+    assert clinical_table(rows=500, columns=10, seed=1).data.equals(
+        clinical_table(rows=500, columns=10, seed=1).data)
+    codes = clinical_table(rows=500, columns=10, numeric_codes=True).data['cat_0']
+    assert codes.dtype == float
+
+
+def test_compare():
+    def results(times):
+        return {'benchmarks': {name: {'min_wall_time': time} for name, time in times.items()}}
+
+    baseline = results({'a': 1.0, 'b': 2.0, 'c': 1.0})
+    current = results({'a': 1.05, 'b': 3.0, 'd': 1.0})
+    current['benchmarks']['c'] = {'error': 'Traceback ...'}
+    comparison = compare(baseline, current, tolerance=0.1)
+    assert comparison['ratios'] == {'a': 1.05, 'b': 1.5}
+    assert comparison['regressions'] == ['b']
+    assert 'models.TVAE.fit' in BENCHMARKS and 'report.generate' in BENCHMARKS
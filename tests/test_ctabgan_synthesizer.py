@@ -0,0 +1,32 @@
+import numpy as np
+
+from ASyH.ctabgan_synthesizer import Cond, Sampler
+
+
+# a continuous column (value and 2 modes) and a categorical column (3 options):
+OUTPUT_INFO = [(1, 'tanh', 'no_g'), (2, 'softmax'), (3, 'softmax')]
+DATA = np.array([[0.1, 1, 0, 0, 0, 1],
+                 [0.2, 0, 1, 1, 0, 0],
+                 [0.3, 1, 0, 1, 0, 0],
+                 [0.4, 1, 0, 0, 0, 1]], dtype=float)
+
+
+def test_sampler_rows_match_condition():
+    sampler = Sampler(DATA, OUTPUT_INFO)
+    col = np.array([0, 0, 1, 1] * 50)
+    opt = np.array([0, 1, 0, 2] * 50)
+    rows = sampler.sample(len(col), col, opt)
+    starts = np.array([1, 3])
+    assert np.all(rows[np.arange(len(col)), starts[col] + opt] == 1)
+
+
+def test_cond_vectors():
+    cond = Cond(DATA, OUTPUT_INFO)
+    vec, mask, idx, opt = cond.sample_train(100)
+    assert np.all(vec.sum(axis=1) == 1)
+    assert np.all(mask[np.arange(100), idx] == 1)
+    assert np.all(vec[np.arange(100), cond.interval[idx, 0] + opt] == 1)
+    vec = cond.sample(1000)
+    assert np.all(vec.sum(axis=1) == 1)
+    # the middle option of the categorical column never occurs:
+    assert vec[:, 3].sum() == 0
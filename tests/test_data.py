@@ -1,4 +1,5 @@
 from os.path import dirname, join
+import pickle
 from random import randint
 import pandas
 import pytest
@@ -92,3 +93,28 @@ def test_write_synthetic_data(input_dataframe, tmp_path):
     # pandas.testing.assert_frame_equal() does not have this problem (with its
     # default arguments)
     pandas.testing.assert_frame_equal(read_csv_object.data, input_dataframe)
+
+
+def test_shared_data(input_dataframe, input_metadata):
+    data_object = ASyH.data.SharedData(input_dataframe, metadata=input_metadata)
+    try:
+        pandas.testing.assert_frame_equal(data_object.data, input_dataframe)
+        assert data_object.metadata == input_metadata
+        numeric = input_dataframe.select_dtypes('number').columns[0]
+        with pytest.raises(ValueError):
+            data_object.data[numeric].to_numpy()[0] = 0
+    finally:
+        data_object.unlink()
+
+
+def test_pickle_shared_data(input_dataframe):
+    data_object = ASyH.data.SharedData(input_dataframe)
+    try:
+        pickled = pickle.dumps(data_object)
+        # only the names of the shared memory blocks are pickled:
+        assert len(pickled) < len(pickle.dumps(input_dataframe))
+        attached = pickle.loads(pickled)
+        pandas.testing.assert_frame_equal(attached.data, input_dataframe)
+        attached.close()
+    finally:
+        data_object.unlink()
@@ -0,0 +1,148 @@
+import os
+import time
+
+import pandas
+
+from ASyH.data import Data, SharedData
+from ASyH.dispatch import concurrent_dispatch, cpu_slots, dispatch, worker_plan, \
+    FAILED, FINISHED, TIMED_OUT
+from ASyH.utils import available_cpus
+
+
+class FakeModel:
+    def __init__(self, trained=False):
+        self.trained = trained
+
+
+class FakePipeline:
+    '''Stand-in for ASyH.pipeline.Pipeline: "trains" its model and returns a
+    fixed score.'''
+
+    def __init__(self, score):
+        self._score = score
+        self.model = FakeModel()
+
+    def run(self):
+        self.model = FakeModel(trained=True)
+        return self._score
+
+
+class DataPipeline(FakePipeline):
+    '''Scores the sum of its input data.'''
+
+    def __init__(self, input_data):
+        super().__init__(0.0)
+        self.input_data = input_data
+
+    def run(self):
+        assert isinstance(self.input_data, SharedData)
+        self._score = float(self.input_data.data['x'].sum())
+        return super().run()
+
+
+class TorchPipeline(FakePipeline):
+    '''"Trains" a model holding a torch tensor, like the GAN/VAE models.'''
+
+    def run(self):
+        import torch
+        self.model = FakeModel(trained=True)
+        self.model.weights = torch.ones(3)
+        return self._score
+
+
+class CrashingPipeline(FakePipeline):
+    def run(self):
+        os._exit(1)
+
+
+class FailingPipeline(FakePipeline):
+    def run(self):
+        raise ValueError('no luck')
+
+
+class SlowPipeline(FakePipeline):
+    def run(self):
+        time.sleep(60)
+        return super().run()
+
+
+def test_concurrent_dispatch_returns_scores():
+    pipelines = [FakePipeline(0.25), FakePipeline(0.75)]
+    assert concurrent_dispatch(*pipelines) == [0.25, 0.75]
+
+
+def test_concurrent_dispatch_hands_back_fitted_models():
+    pipelines = [FakePipeline(0.5), FakePipeline(0.5)]
+    concurrent_dispatch(*pipelines)
+    assert all(p.model.trained for p in pipelines)
+
+
+def test_dispatch_hands_back_torch_models():
+    pipelines = [TorchPipeline(0.5)]
+    results = dispatch(*pipelines)
+    assert results[0].status == FINISHED
+    assert pipelines[0].model.weights.sum().item() == 3.0
+
+
+def test_concurrent_dispatch_crashed_child():
+    pipelines = [CrashingPipeline(1.0), FakePipeline(0.5)]
+    assert concurrent_dispatch(*pipelines) == [0.0, 0.5]
+    assert not pipelines[0].model.trained
+    assert pipelines[1].model.trained
+
+
+def test_concurrent_dispatch_bounded_pool():
+    pipelines = [FakePipeline(i / 10) for i in range(5)]
+    results = concurrent_dispatch(*pipelines, max_workers=2, threads_per_worker=1)
+    assert results == [0.0, 0.1, 0.2, 0.3, 0.4]
+
+
+def test_worker_plan():
+    cpus = len(available_cpus())
+    assert worker_plan(3, max_workers=1, threads_per_worker=2) == (1, 2)
+    workers, threads = worker_plan(100)
+    assert workers == cpus
+    assert threads == 1
+    workers, threads = worker_plan(1)
+    assert (workers, threads) == (1, cpus)
+
+
+def test_cpu_slots():
+    cpus = available_cpus()
+    slots = cpu_slots(len(cpus), 1)
+    assert [slot.pop() for slot in slots] == cpus
+
+
+def test_dispatch_structured_results():
+    pipelines = [FakePipeline(0.5), FailingPipeline(1.0), CrashingPipeline(1.0)]
+    results = dispatch(*pipelines)
+    assert [r.status for r in results] == [FINISHED, FAILED, FAILED]
+    assert results[0].score == 0.5
+    assert results[1].score is None
+    assert 'no luck' in results[1].error
+    assert all(r.elapsed >= 0.0 for r in results)
+
+
+def test_dispatch_pipeline_timeout():
+    pipelines = [SlowPipeline(1.0), FakePipeline(0.5)]
+    start = time.monotonic()
+    results = dispatch(*pipelines, timeout=1.0)
+    assert time.monotonic() - start < 30
+    assert [r.status for r in results] == [TIMED_OUT, FINISHED]
+    assert not pipelines[0].model.trained
+
+
+def test_dispatch_total_timeout():
+    pipelines = [SlowPipeline(1.0), FakePipeline(0.5)]
+    start = time.monotonic()
+    results = dispatch(*pipelines, max_workers=1, total_timeout=1.0)
+    assert time.monotonic() - start < 30
+    assert [r.status for r in results] == [TIMED_OUT, TIMED_OUT]
+
+
+def test_dispatch_shared_data():
+    data = Data(pandas.DataFrame({'x': [1.0, 2.0, 3.0], 'y': ['a', 'b', 'c']}))
+    pipelines = [DataPipeline(data), DataPipeline(data)]
+    results = dispatch(*pipelines, share_data=True)
+    assert [r.score for r in results] == [6.0, 6.0]
+    assert all(p.input_data is data for p in pipelines)
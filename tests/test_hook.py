@@ -0,0 +1,52 @@
+import time
+
+from sdmetrics.errors import IncomputableMetricError
+
+from ASyH.hook import ScoringHook
+
+
+def difference(real_data, synthetic_data):
+    return real_data - synthetic_data
+
+
+def incomputable(real_data, synthetic_data):
+    raise IncomputableMetricError()
+
+
+def slow(real_data, synthetic_data):
+    time.sleep(2.0)
+    return 0.0
+
+
+def test_scoring_hook_concurrent():
+    sequential = ScoringHook()
+    concurrent = ScoringHook(max_workers=3)
+    for hook in [sequential, concurrent]:
+        for func in [difference, incomputable, slow]:
+            hook.add(func)
+    assert sequential.execute(3, 1) == concurrent.execute(3, 1) \
+        == {'difference': 2, 'slow': 0.0}
+    assert concurrent.timings.keys() == {'difference', 'slow'}
+    assert concurrent.timings['slow'] >= 2.0
+
+
+def test_scoring_hook_timeout():
+    hook = ScoringHook(max_workers=2, timeout=0.5)
+    hook.add(slow)
+    hook.add(difference)
+    start = time.monotonic()
+    assert hook.execute(3, 1) == {'difference': 2}
+    assert time.monotonic() - start < 1.5
+
+
+def test_scoring_hook_timeout_sequential():
+    # a single function, one at a time: still stopped after the timeout
+    hook = ScoringHook(timeout=0.5)
+    hook.add(slow)
+    start = time.monotonic()
+    assert hook.execute(3, 1) == {}
+    assert time.monotonic() - start < 1.5
+    hook.add(difference)
+    hook.add(incomputable)
+    assert hook.execute(3, 1) == {'difference': 2}
+    assert hook.timings.keys() == {'difference'}
@@ -0,0 +1,39 @@
+import json
+import time
+
+from ASyH.instrumentation import Instrumentation, measure, write_chrome_trace, write_json
+
+
+def busy(seconds):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+    return seconds
+
+
+def test_instrumentation(tmp_path):
+    instrumentation = Instrumentation()
+    with instrumentation.stage('training'):
+        busy(0.05)
+    result, record = measure(busy, 0.02)
+    instrumentation.add('busy', record, category='scoring')
+    assert result == 0.02
+
+    training, scoring = instrumentation.records
+    assert training['name'] == 'training' and training['category'] == 'stage'
+    assert training['wall_time'] >= 0.05 and training['cpu_time'] >= 0.05
+    assert scoring['start'] >= training['start'] + training['wall_time']
+    assert instrumentation.wall_times() == {'training': training['wall_time']}
+    assert instrumentation.wall_times('scoring') == {'busy': scoring['wall_time']}
+
+    runs = {'TVAE': instrumentation, 'CTGAN': Instrumentation()}
+    write_json(runs, tmp_path / 'runs.json')
+    with open(tmp_path / 'runs.json', encoding='utf-8') as f:
+        assert json.load(f)['TVAE']['records'] == instrumentation.records
+    write_chrome_trace(runs, tmp_path / 'trace.json')
+    with open(tmp_path / 'trace.json', encoding='utf-8') as f:
+        events = json.load(f)['traceEvents']
+    assert [event['name'] for event in events] == ['training', 'busy', 'process_name']
+    assert events[0]['ph'] == 'X' and events[0]['pid'] == 0
+    assert events[0]['dur'] == training['wall_time'] * 1e6
+    assert events[2]['args'] == {'name': 'TVAE'}
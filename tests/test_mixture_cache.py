@@ -0,0 +1,106 @@
+import os
+import time
+
+import ctgan.data_transformer
+import numpy as np
+import pandas
+
+import ASyH.transformer_ctabgan
+from ASyH.data import Data
+from ASyH.metadata import Metadata
+from ASyH.mixture_cache import TVAE, CachedDataTransformer, MixtureCache, SharedNormalizers
+from ASyH.transformer_ctabgan import DataTransformer
+
+
+def test_key():
+    values = np.arange(10.0)
+    assert MixtureCache.key(values, n=10) == MixtureCache.key(values.copy(), n=10)
+    assert MixtureCache.key(values, n=10) != MixtureCache.key(values, n=5)
+    assert MixtureCache.key(values, n=10) != MixtureCache.key(values + 1, n=10)
+
+
+def test_get_put_clear(tmp_path):
+    cache = MixtureCache(str(tmp_path))
+    assert cache.get('missing') is None
+    cache.put('model', {'weights': [0.5, 0.5]})
+    assert cache.get('model') == {'weights': [0.5, 0.5]}
+    assert [entry.key for entry in cache.entries()] == ['model']
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_lru_eviction(tmp_path):
+    cache = MixtureCache(str(tmp_path))
+    for key in ['a', 'b', 'c']:
+        cache.put(key, np.zeros(100))
+    # make 'a' the least recently used, then use 'b':
+    for age, key in enumerate(['c', 'b', 'a']):
+        path = os.path.join(str(tmp_path), key + MixtureCache.SUFFIX)
+        os.utime(path, (time.time() - 100 * (age + 1),) * 2)
+    cache.get('b')
+    entry_size = cache.entries()[0].size
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+    assert sorted(entry.key for entry in cache.entries()) == ['b', 'c']
+
+
+def test_ctabgan_transformer_reuses_cached_mixtures(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    frame = pandas.DataFrame({'x': rng.normal(0.0, 1.0, 500),
+                              'y': rng.normal(5.0, 2.0, 500)})
+    cache = MixtureCache(str(tmp_path))
+
+    def fit(mixture_cache):
+        transformer = DataTransformer(train_data=frame, categorical_list=[],
+                                      mixed_dict={}, general_list=[],
+                                      non_categorical_list=[0, 1], n_clusters=3,
+                                      n_jobs=1, mixture_cache=mixture_cache)
+        transformer.fit()
+        return transformer
+
+    first = fit(cache)
+    assert len(cache.entries()) == 2
+
+    def no_fitting(*args):
+        raise AssertionError('mixture fitted again')
+    monkeypatch.setattr(ASyH.transformer_ctabgan, 'fit_mixture', no_fitting)
+    second = fit(cache)
+    assert np.allclose(first.model[0].means_, second.model[0].means_)
+    assert second.components == first.components
+
+
+def test_shared_normalizers(monkeypatch):
+    rng = np.random.default_rng(0)
+    frame = pandas.DataFrame({'x': rng.normal(0.0, 1.0, 200),
+                              'y': rng.normal(5.0, 2.0, 200),
+                              'c': rng.choice(['a', 'b'], 200)})
+    metadata = Metadata({'columns': {'x': {'sdtype': 'numerical'},
+                                     'y': {'sdtype': 'numerical'},
+                                     'c': {'sdtype': 'categorical'}}})
+    normalizers = SharedNormalizers().fit(Data(frame, metadata=metadata), max_workers=1)
+    assert len(normalizers) == 2
+
+    def no_fitting(*args):
+        raise AssertionError('normalizer fitted again')
+    monkeypatch.setattr(ctgan.data_transformer.DataTransformer, '_fit_continuous', no_fitting)
+    transformer = CachedDataTransformer(cache=normalizers)
+    transformer.fit(frame[['x', 'y']])
+    assert transformer.output_dimensions > 2
+
+
+def test_data_transformer_per_model():
+    frame = pandas.DataFrame({'x': np.random.default_rng(0).normal(0.0, 1.0, 200)})
+    transformer = CachedDataTransformer()
+    model = TVAE()
+    model.data_transformer = transformer
+    # what TVAE.fit() does:
+    model.transformer = ctgan.data_transformer.DataTransformer()
+    assert model.transformer is transformer
+    other = TVAE()
+    other.transformer = ctgan.data_transformer.DataTransformer()
+    assert other.transformer is not transformer
+    # not refitted to the same table:
+    transformer.fit(frame)
+    assert transformer.fit_seconds > 0.0
+    transformer.fit(frame)
+    assert transformer.fit_seconds == 0.0
@@ -1,5 +1,6 @@
 from os.path import dirname, join
 import pytest
+import sdv
 
 import ASyH.models
 import ASyH.data
@@ -47,6 +48,21 @@ def test_train_synthesize_tvae_model(input_data):
     m.synthesize()
 
 
+def test_train_tvae_model_within_budget(input_data):
+    """Testing that the training within a time budget fits the ctgan
+    DataTransformer once, for the epoch measurement, and not again for the
+    training with the affordable epochs.
+    """
+    m = ASyH.models.TVAEModel()
+    m.set_epochs(3)
+    m.set_time_budget(3600.0)
+    m._train(input_data)
+    assert m._trained
+    assert m._sdv_model._model_kwargs['epochs'] == 3
+    assert m._sdv_model._model.transformer is m._sdv_model.data_transformer
+    assert m._sdv_model.data_transformer.fit_seconds == 0.0
+
+
 def test_construct_ctgan_model():
     """Testing initialization of the CTGAN model"""
     m = ASyH.models.CTGANModel()
@@ -122,6 +138,18 @@ def test_train_synthesize_gaussian_copula_model(input_data):
     m.synthesize()
 
 
+def test_tune_gaussian_copula_distributions(input_data):
+    """Testing the per-column tuning of the GaussianCopula distributions."""
+    m = ASyH.models.GaussianCopulaModel()
+    m.tuning_rows = 200
+    args = m._tune_GCM_distributions(input_data)
+    distributions = sdv.single_table.GaussianCopulaSynthesizer._DISTRIBUTIONS
+    numerical = input_data.metadata.variables_by_type('numerical')
+    assert set(args['numerical_distributions']) <= set(numerical)
+    assert set(args['numerical_distributions'].values()) <= set(distributions)
+    assert args.get('default_distribution', 'beta') in distributions
+
+
 def test_construct_forest_flow_model():
     """Testing initialization of the CTGAN model"""
     m = ASyH.models.ForestFlowModel()
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas
+
+from ASyH.data import Data
+from ASyH.metadata import Metadata
+from ASyH.models import CTGANModel, GaussianCopulaModel, TVAEModel
+from ASyH.processing import compatible, derive_processor, differing_fields
+
+
+def example_data():
+    rng = np.random.default_rng(0)
+    frame = pandas.DataFrame({'x': rng.normal(0.0, 1.0, 200),
+                              'n': rng.integers(0, 100, 200),
+                              'c': rng.choice(['a', 'b', 'c'], 200)})
+    metadata = Metadata({'columns': {'x': {'sdtype': 'numerical'},
+                                     'n': {'sdtype': 'numerical'},
+                                     'c': {'sdtype': 'categorical'}}})
+    return Data(frame, metadata=metadata)
+
+
+def test_derive_processor():
+    data = example_data()
+    base = TVAEModel().create_data_processor(data)
+    base.fit(data.data)
+    processor = GaussianCopulaModel().create_data_processor(data)
+    assert compatible(base, processor)
+    assert differing_fields(base, processor) == ['c']
+
+    derived = derive_processor(base, processor, data.data)
+    transformed = derived.transform(data.data)
+    processor.fit(data.data)
+    expected = processor.transform(data.data)
+    assert list(transformed.columns) == list(expected.columns)
+    assert np.allclose(transformed[['x', 'n']], expected[['x', 'n']])
+    # the categorical column is encoded as float now, it is not in the base:
+    assert transformed['c'].dtype.kind == 'f'
+    assert base.transform(data.data)['c'].dtype.kind == 'O'
+
+
+def test_model_with_shared_processor():
+    data = example_data()
+    base = TVAEModel().create_data_processor(data)
+    base.fit(data.data)
+    model = CTGANModel(data=data, override_args={'epochs': 1})
+    model.set_data_processor(derive_processor(base, model.create_data_processor(data),
+                                              data.data))
+    model.fit()
+    synthetic = model.synthesize(50)
+    assert list(synthetic.columns) == list(data.data.columns)
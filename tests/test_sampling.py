@@ -0,0 +1,67 @@
+import numpy
+import pandas
+
+from ASyH.data import Data
+from ASyH.metadata import Metadata
+from ASyH.sampling import allocate, bootstrap_interval, overlapping, strata_column, \
+    stratified_sample
+
+
+def example_data(n_rows=10000):
+    rng = numpy.random.default_rng(0)
+    frame = pandas.DataFrame({'x': rng.normal(0.0, 1.0, n_rows),
+                              'c': rng.choice(['a', 'b', 'c'], n_rows, p=[0.7, 0.2, 0.1])})
+    metadata = Metadata({'columns': {'x': {'sdtype': 'numerical'},
+                                     'c': {'sdtype': 'categorical'}}})
+    return Data(frame, metadata=metadata)
+
+
+def test_stratified_sample():
+    data = example_data()
+    sample = stratified_sample(data, 1000)
+    assert len(sample.data) == 1000
+    shares = sample.data['c'].value_counts(normalize=True)
+    expected = data.data['c'].value_counts(normalize=True)
+    assert numpy.allclose(shares[expected.index], expected, atol=0.002)
+    # the same subsample for all pipelines:
+    assert stratified_sample(data, 1000) is sample
+    assert stratified_sample(data, 20000) is data
+
+
+def test_stratified_sample_small_strata():
+    data = example_data()
+    # an identifier-like column is not stratified by:
+    data.data['id'] = [f'p{i}' for i in range(len(data.data))]
+    data.metadata.columns['id'] = {'sdtype': 'categorical'}
+    assert strata_column(data) == 'c'
+    assert len(stratified_sample(data, 1000, column='id').data) == 1000
+    # rare values keep at least one row:
+    data.data.loc[:4, 'c'] = 'rare'
+    sample = stratified_sample(data, 100)
+    assert len(sample.data) == 100
+    assert (sample.data['c'] == 'rare').sum() == 1
+
+
+def test_allocate():
+    assert allocate([700, 200, 100], 10).tolist() == [7, 2, 1]
+    assert allocate([996, 2, 2], 10).tolist() == [8, 1, 1]
+    sizes = allocate([5, 3, 3, 3], 3)
+    assert sizes[0] == 1 and sizes.sum() == 3 and sizes.max() == 1
+    assert allocate([1] * 50, 20).sum() == 20
+
+
+def test_bootstrap_interval():
+    data = example_data(2000)
+
+    def mean_x(real_data, synthetic_data):
+        return synthetic_data.data['x'].mean()
+
+    low, high = bootstrap_interval(mean_x, data, data, n_samples=200)
+    assert low < data.data['x'].mean() < high
+    # about 2 standard errors each way:
+    assert 0.05 < high - low < 0.12
+    assert overlapping((low, high), (high, high + 1.0))
+    assert not overlapping((low, high), (high + 0.1, high + 1.0))
+    # placed around the score even if smaller samples score lower:
+    low, high = bootstrap_interval(lambda real, synth: -1.0 / len(synth.data), data, data)
+    assert low <= -1.0 / 2000 <= high
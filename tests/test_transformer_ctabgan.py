@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas
+
+from ASyH.transformer_ctabgan import DataTransformer, ordered_onehot, sample_modes
+
+
+def test_sample_modes():
+    probs = np.array([[1.0, 0.0, 0.0],
+                      [0.0, 1.0, 0.0],
+                      [0.0, 0.0, 1.0],
+                      [0.5, 0.5, 0.0]])
+    uniform = np.array([0.99, 0.5, 0.5, 0.75])
+    assert sample_modes(probs, uniform).tolist() == [0, 1, 2, 1]
+
+
+def test_sample_modes_distribution():
+    rng = np.random.default_rng(0)
+    probs = np.tile([0.2, 0.5, 0.3], (100000, 1))
+    selected = sample_modes(probs, rng.random(len(probs)))
+    frequencies = np.bincount(selected, minlength=3) / len(selected)
+    assert np.allclose(frequencies, [0.2, 0.5, 0.3], atol=0.01)
+
+
+def test_ordered_onehot():
+    selected = np.array([2, 2, 0, 2, 0, 1])
+    onehot = np.zeros([len(selected), 3])
+    onehot[np.arange(len(selected)), selected] = 1
+    reordered, order = ordered_onehot(onehot)
+    assert order.tolist() == [2, 0, 1]
+    assert np.array_equal(reordered, onehot[:, [2, 0, 1]])
+    from_indices, order_from_indices = ordered_onehot(selected, 3)
+    assert np.array_equal(order_from_indices, order)
+    assert np.array_equal(from_indices, reordered)
+
+
+def test_inverse_transform_validity():
+    transformer = DataTransformer(train_data=pandas.DataFrame({'x': [0.0], 'c': [5]}),
+                                  categorical_list=[1], mixed_dict={},
+                                  general_list=[], non_categorical_list=[],
+                                  n_clusters=2)
+    transformer.meta = [{'name': 0, 'type': 'continuous', 'min': -5.0, 'max': 5.0},
+                        {'name': 1, 'type': 'categorical', 'size': 2, 'i2s': [5, 7]}]
+    transformer.model = [SimpleNamespace(means_=np.array([[0.0], [10.0]]),
+                                         covariances_=np.array([[[1.0]], [[4.0]]])),
+                         None]
+    transformer.components = [[True, True], None]
+    transformer.ordering = [np.array([1, 0]), None]
+    # value, one-hot mode (in the order of transformer.ordering), one-hot category:
+    data = np.array([[0.25, 0.0, 1.0, 0.9, 0.1],
+                     [0.25, 1.0, 0.0, 0.2, 0.8]])
+    data_t, valid = transformer.inverse_transform(data)
+    assert np.allclose(data_t, [[1.0, 5.0], [12.0, 7.0]])
+    assert valid.tolist() == [True, False]
+
+
+def test_fit_parallel_subsampled():
+    rng = np.random.default_rng(0)
+    frame = pandas.DataFrame({'x': np.concatenate([rng.normal(0.0, 1.0, 3000),
+                                                   rng.normal(20.0, 1.0, 3000)]),
+                              'm': np.where(rng.random(6000) < 0.3, 0.0,
+                                            rng.normal(50.0, 5.0, 6000))})
+    transformer = DataTransformer(train_data=frame, categorical_list=[],
+                                  mixed_dict={1: [0.0]}, general_list=[],
+                                  non_categorical_list=[0], n_clusters=5,
+                                  n_jobs=2, max_fit_rows=1000)
+    transformer.fit()
+    assert len(transformer.model) == 2
+    assert isinstance(transformer.model[1], tuple)
+    # both modes of the bimodal column are in use:
+    assert sum(transformer.components[0]) >= 2
+    assert transformer.output_dim == 1 + sum(transformer.components[0]) \
+        + 1 + sum(transformer.components[1]) + 1
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas
+import pytest
+
+from ASyH.utils import Utils, available_cpus, default_workers
+
+
+def discretize_column_per_row(df, col_name, col_maps):
+    '''The former per-row implementation of Utils.discretize_column.'''
+    discrete_values = np.array(list(col_maps[col_name].keys()))
+    df[col_name] = df[col_name].apply(lambda val: (val/max(df[col_name]) * max(discrete_values)))
+    df[col_name] = df[col_name].apply(lambda val: Utils.find_closest(val, discrete_values))
+    df[col_name] = df[col_name].apply(lambda val: col_maps[col_name][val])
+    return df
+
+
+@pytest.fixture
+def forest_output():
+    rng = np.random.default_rng(0)
+    return pandas.DataFrame({'sex': rng.uniform(0.0, 1.0, 500),
+                             'grade': rng.uniform(-0.5, 4.5, 500),
+                             'ties': rng.integers(0, 7, 500) / 2.0,
+                             'age': rng.normal(50.0, 10.0, 500)})
+
+
+@pytest.fixture
+def col_maps():
+    return {'sex': {0: 'female', 1: 'male'},
+            'grade': {i: label for i, label in enumerate('ABCDE')},
+            'ties': {0: 10, 1: 20, 2: 30, 3: 40}}
+
+
+def test_nearest_codes():
+    values = np.array([-1.0, 0.0, 0.5, 0.6, 1.5, 2.0, 9.0, np.nan, np.inf])
+    codes = [0, 1, 2]
+    assert Utils.nearest_codes(values, codes).tolist() == [0, 0, 0, 1, 1, 2, 2, 0, 0]
+    assert Utils.nearest_codes(values[:3], [5]).tolist() == [0, 0, 0]
+
+
+def test_discretize_column(forest_output, col_maps):
+    for col in col_maps:
+        expected = discretize_column_per_row(forest_output.copy(), col, col_maps)
+        result = Utils.discretize_column(forest_output.copy(), col, col_maps)
+        pandas.testing.assert_frame_equal(result, expected)
+
+
+def test_discretize_cols(forest_output, col_maps):
+    expected = forest_output.copy()
+    for col in col_maps:
+        expected = discretize_column_per_row(expected, col, col_maps)
+    result = Utils.discretize_cols(forest_output.copy(), col_maps.keys(), col_maps)
+    pandas.testing.assert_frame_equal(result, expected)
+    assert Utils.discretize_cols(forest_output, [], col_maps) is forest_output
+
+
+def test_default_workers(monkeypatch):
+    cpus = len(available_cpus())
+    monkeypatch.delenv('OMP_NUM_THREADS', raising=False)
+    assert default_workers() == cpus
+    # workers x threads do not exceed the CPUs:
+    monkeypatch.setenv('OMP_NUM_THREADS', '2')
+    assert default_workers() == max(1, cpus // 2)
+    monkeypatch.setenv('OMP_NUM_THREADS', str(2 * cpus))
+    assert default_workers() == 1